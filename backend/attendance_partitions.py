@@ -0,0 +1,363 @@
+"""
+Phân vùng bảng attendance_logs theo tháng và lưu trữ các kỳ học đã kết thúc.
+
+    python attendance_partitions.py ensure --months-ahead 3
+    python attendance_partitions.py migrate
+    python attendance_partitions.py archive --before 2025-01-01 [--drop]
+
+Lệnh migrate nâng cấp DB tạo bởi phiên bản cũ (chạy lại nhiều lần không sao): chuyển attendance_logs
+sang bảng phân vùng (chỉ Postgres) và thêm cột status cho attendance_daily_summaries (cả SQLite).
+
+Trên Postgres, attendance_logs là bảng PARTITION BY RANGE (timestamp) với mỗi tháng
+một partition và một partition DEFAULT cho dữ liệu ngoài khoảng. Trên SQLite (test/benchmark)
+bảng giữ nguyên, chỉ có index (student_id, timestamp) để truy vấn theo khoảng ngày.
+App tự tạo partition cho các tháng sắp tới khi khởi động và mỗi PARTITION_MAINTENANCE_INTERVAL giây;
+log của tháng đã lỡ rơi vào DEFAULT được chuyển sang partition của tháng khi tạo.
+"""
+import os
+import time
+import argparse
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, func, insert, inspect, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+TABLE = "attendance_logs"
+DEFAULT_PARTITION = f"{TABLE}_default"
+MONTHS_BEHIND = 12
+MONTHS_AHEAD = 3
+# Chu kỳ (giây) app tự tạo partition cho các tháng sắp tới; 0 để tắt (chỉ dùng lệnh `ensure`).
+MAINTENANCE_INTERVAL = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "86400"))
+
+_PARTITIONED_TABLE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id SERIAL,
+    timestamp TIMESTAMP NOT NULL,
+    status VARCHAR,
+    note VARCHAR,
+    student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp)
+"""
+
+_INDEX_DDL = f"CREATE INDEX IF NOT EXISTS ix_attendance_logs_student_timestamp ON {TABLE} (student_id, timestamp)"
+
+
+def is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year}m{month.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[date]:
+    try:
+        year, month = name[len(TABLE) + 2:].split("m")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name"), {"name": TABLE}
+    ).scalar() == "p"
+
+
+def ensure_partitions(conn, first_month: date, last_month: date):
+    if not is_postgres(conn):
+        return
+    # Mọi worker đều chạy khi khởi động (start_maintainer): tuần tự hoá DDL.
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": TABLE})
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    month = month_start(first_month)
+    while month <= last_month:
+        _create_month_partition(conn, month)
+        month = add_months(month, 1)
+
+
+def _create_month_partition(conn, month: date):
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    # Tháng đã lọt ra ngoài cửa sổ MONTHS_AHEAD mà chưa được tạo thì log của nó nằm trong DEFAULT,
+    # và Postgres từ chối CREATE ... PARTITION OF. Tạo bảng riêng, chuyển các dòng đó sang rồi mới gắn vào.
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= '{start}' AND timestamp < '{end}' RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )).rowcount
+    conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    if moved:
+        logger.warning(f"Đã chuyển {moved} dòng từ {DEFAULT_PARTITION} sang {name}.")
+
+
+def _default_window() -> Tuple[date, date]:
+    this_month = month_start(models.get_vietnam_time_naive().date())
+    return add_months(this_month, -MONTHS_BEHIND), add_months(this_month, MONTHS_AHEAD)
+
+
+def maintain_partitions(bind=engine):
+    """Tạo partition cho cửa sổ MONTHS_BEHIND..MONTHS_AHEAD tính từ tháng hiện tại."""
+    with bind.begin() as conn:
+        if is_postgres(conn) and is_partitioned(conn):
+            ensure_partitions(conn, *_default_window())
+
+
+def start_maintainer(interval: int = MAINTENANCE_INTERVAL) -> Optional[threading.Thread]:
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                maintain_partitions()
+            except Exception as e:
+                logger.error(f"Lỗi khi tạo partition attendance_logs: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="partition-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+def create_schema(bind=engine):
+    """Thay cho Base.metadata.create_all: tạo attendance_logs dạng phân vùng trên Postgres."""
+    with bind.begin() as conn:
+        if is_postgres(conn):
+            others = [t for t in Base.metadata.sorted_tables if t.name != TABLE]
+            Base.metadata.create_all(conn, tables=others)
+            exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": TABLE}).scalar()
+            if exists is None:
+                conn.execute(text(_PARTITIONED_TABLE_DDL))
+                conn.execute(text(_INDEX_DDL))
+            if is_partitioned(conn):
+                ensure_partitions(conn, *_default_window())
+            else:
+                logger.warning("attendance_logs chưa được phân vùng, chạy `python attendance_partitions.py migrate`.")
+        else:
+            Base.metadata.create_all(conn)
+
+
+def migrate_summary_status(bind=engine) -> bool:
+    """
+    Thêm cột status cho attendance_daily_summaries của DB tạo trước khi ô điểm danh có thể được
+    đánh dấu vắng/ghi chú; các ngày đã lưu trữ nhận 'PRESENT'. Trả về False nếu cột đã có.
+    """
+    with bind.begin() as conn:
+        columns = {column["name"] for column in inspect(conn).get_columns("attendance_daily_summaries")}
+        if "status" in columns:
+            return False
+        conn.execute(text(
+            f"ALTER TABLE attendance_daily_summaries ADD COLUMN status VARCHAR NOT NULL DEFAULT '{models.ATTENDANCE_PRESENT}'"
+        ))
+    logger.info("Đã thêm cột status cho attendance_daily_summaries.")
+    return True
+
+
+def migrate_to_partitioned(bind=engine):
+    """Chuyển bảng attendance_logs thường (tạo bởi phiên bản cũ) sang bảng phân vùng."""
+    with bind.begin() as conn:
+        if not is_postgres(conn) or is_partitioned(conn):
+            return
+        legacy = f"{TABLE}_legacy"
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS ix_attendance_logs_student_timestamp RENAME TO ix_attendance_logs_legacy_student_timestamp"))
+        conn.execute(text(_PARTITIONED_TABLE_DDL))
+        conn.execute(text(_INDEX_DDL))
+
+        oldest, newest = conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {legacy}")).one()
+        first, last = _default_window()
+        if oldest is not None:
+            first = min(first, month_start(oldest.date()))
+            last = max(last, month_start(newest.date()))
+        ensure_partitions(conn, first, last)
+
+        conn.execute(text(
+            f"INSERT INTO {TABLE} (id, timestamp, status, note, student_id) "
+            f"SELECT id, COALESCE(timestamp, now()), status, note, student_id FROM {legacy}"
+        ))
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+    logger.info("Đã chuyển attendance_logs sang bảng phân vùng theo tháng.")
+
+
+def is_check_in(status):
+    """Điều kiện SQL: dòng là lượt điểm danh, không phải dòng đánh dấu (status NULL là log cũ)."""
+    return or_(status.is_(None), status.notin_(models.MARKER_STATUSES))
+
+
+def cell_priority(status):
+    """Thứ tự chọn dòng đại diện cho một ô: đánh dấu vắng, rồi lượt điểm danh (theo giờ), rồi dòng chỉ có ghi chú."""
+    return case((status == models.ATTENDANCE_ABSENT, 0), (status == models.ATTENDANCE_NOTE, 2), else_=1)
+
+
+def marker_note(status, note):
+    """Ghi chú của dòng đánh dấu (NULL với lượt điểm danh); ghi chú của ô ưu tiên dòng này."""
+    return case((status.in_(models.MARKER_STATUSES), note))
+
+
+def _ranked_cells(*conditions):
+    """
+    Các dòng log thoả `conditions`, đánh số theo ô (sinh viên, ngày): rn = 1 là dòng đại diện của ô
+    (dòng đánh dấu vắng, hoặc lượt điểm danh đầu tiên, hoặc dòng chỉ có ghi chú), note là ghi chú của ô.
+    """
+    log = models.AttendanceLog
+    day = (log.student_id, func.date(log.timestamp))
+    return (
+        select(
+            log.student_id,
+            func.date(log.timestamp).label("class_date"),
+            log.timestamp,
+            log.status,
+            func.coalesce(func.max(marker_note(log.status, log.note)).over(partition_by=day), log.note).label("note"),
+            func.row_number().over(partition_by=day, order_by=(cell_priority(log.status), log.timestamp)).label("rn"),
+        )
+        .where(*conditions)
+        .subquery()
+    )
+
+
+def archive_before(db: Session, before: date, drop: bool = False) -> int:
+    """
+    Gộp log trước ngày `before` thành một dòng mỗi sinh viên mỗi ngày trong
+    attendance_daily_summaries (giữ trạng thái vắng/ghi chú do giáo viên đánh dấu),
+    rồi tách (detach) các partition đã đóng. Trả về số dòng tóm tắt mới.
+    """
+    log = models.AttendanceLog
+    cutoff = datetime.combine(before, datetime.min.time())
+
+    ranked = _ranked_cells(log.timestamp < cutoff)
+    status = case((ranked.c.status.in_(models.MARKER_STATUSES), ranked.c.status), else_=models.ATTENDANCE_PRESENT)
+    first_per_day = select(
+        ranked.c.student_id, ranked.c.class_date, ranked.c.timestamp, ranked.c.note, status
+    ).where(ranked.c.rn == 1)
+
+    dialect_insert = postgresql.insert if is_postgres(db.bind) else sqlite.insert
+    summary = models.AttendanceDailySummary.__table__
+    stmt = dialect_insert(summary).from_select(
+        ["student_id", "class_date", "check_in_time", "note", "status"], first_per_day
+    ).on_conflict_do_nothing(index_elements=[summary.c.student_id, summary.c.class_date])
+    archived = db.execute(stmt).rowcount
+
+    if is_postgres(db.bind) and is_partitioned(db.connection()):
+        partitions = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :name"
+        ), {"name": TABLE}).scalars().all()
+        for name in partitions:
+            month = _partition_month(name)
+            if month is None or add_months(month, 1) > before:
+                continue
+            db.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+            if drop:
+                db.execute(text(f"DROP TABLE {name}"))
+            logger.info(f"Đã tách partition {name}{' và xoá' if drop else ''}.")
+
+    # Phần còn lại (partition DEFAULT, tháng bị cắt giữa chừng, hoặc SQLite) xoá theo khoảng.
+    db.query(log).filter(log.timestamp < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return archived
+
+
+def load_first_checkins(
+    db: Session, student_ids: Iterable[int], start_date: date, end_date: date, include_absent: bool = False
+) -> Dict[Tuple[int, date], Tuple[Optional[datetime], Optional[str]]]:
+    """
+    Lượt điểm danh đầu tiên mỗi (sinh viên, ngày) trong [start_date, end_date], kèm ghi chú của ô.
+    Ô bị đánh dấu vắng không có mặt trong kết quả dù có lượt điểm danh; include_absent=True để
+    lấy cả các ô vắng có dòng đánh dấu (timestamp None), vd. để hiện ghi chú trên bảng.
+    Điều kiện theo khoảng timestamp giúp Postgres chỉ quét các partition liên quan;
+    ngày đã lưu trữ được lấy từ attendance_daily_summaries.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {}
+
+    # Chỉ lấy dòng đại diện mỗi ngày ngay trong SQL, không kéo mọi log trong khoảng về Python.
+    log = models.AttendanceLog
+    ranked = _ranked_cells(
+        log.student_id.in_(student_ids),
+        log.timestamp >= datetime.combine(start_date, datetime.min.time()),
+        log.timestamp < datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+    )
+    rows = db.execute(
+        select(ranked.c.student_id, ranked.c.timestamp, ranked.c.status, ranked.c.note).where(ranked.c.rn == 1)
+    )
+    cells = {}
+    for student_id, timestamp, status, note in rows:
+        cells[(student_id, timestamp.date())] = (status, timestamp, note)
+
+    summary = models.AttendanceDailySummary
+    archived = (
+        db.query(summary.student_id, summary.class_date, summary.status, summary.check_in_time, summary.note)
+        .filter(
+            summary.student_id.in_(student_ids),
+            summary.class_date >= start_date,
+            summary.class_date <= end_date,
+        )
+        .all()
+    )
+    for student_id, class_date, status, check_in_time, note in archived:
+        cells.setdefault((student_id, class_date), (status, check_in_time, note))
+
+    first_checkins = {}
+    for key, (status, timestamp, note) in cells.items():
+        if status not in models.MARKER_STATUSES:
+            first_checkins[key] = (timestamp, note)
+        elif include_absent:
+            first_checkins[key] = (None, note)
+    return first_checkins
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Quản lý phân vùng và lưu trữ attendance_logs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure = commands.add_parser("ensure", help="Tạo trước partition cho các tháng sắp tới.")
+    ensure.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+
+    commands.add_parser("migrate", help="Chuyển bảng cũ sang bảng phân vùng, thêm cột status cho bảng tóm tắt.")
+
+    archive = commands.add_parser("archive", help="Lưu trữ các kỳ học kết thúc trước một ngày.")
+    archive.add_argument("--before", type=date.fromisoformat, required=True)
+    archive.add_argument("--drop", action="store_true", help="Xoá luôn partition sau khi tách.")
+
+    args = parser.parse_args()
+    if args.command == "ensure":
+        this_month = month_start(models.get_vietnam_time_naive().date())
+        with engine.begin() as conn:
+            ensure_partitions(conn, this_month, add_months(this_month, args.months_ahead))
+    elif args.command == "migrate":
+        migrate_to_partitioned()
+        migrate_summary_status()
+    elif args.command == "archive":
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            count = archive_before(db, args.before, drop=args.drop)
+            logger.info(f"Đã lưu trữ {count} ngày điểm danh trước {args.before}.")
+        finally:
+            db.close()
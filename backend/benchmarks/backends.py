@@ -0,0 +1,166 @@
+"""
+So sánh các backend nhận dạng trên cùng một bộ ảnh local.
+
+Bộ ảnh có dạng <gallery>/<người>/*.jpg: ảnh đầu tiên (theo tên) của mỗi người là ảnh
+đăng ký, các ảnh còn lại là ảnh thử.
+
+    python -m benchmarks.backends --gallery ~/faces \\
+        --backend deepface --backend onnx:models/facenet.onnx --backend onnx:models/facenet.int8.onnx \\
+        --threads 4 --output backends.json
+
+Với ``--parity``, mọi ảnh được cắt mặt một lần bằng backend đầu tiên (thường là "deepface") rồi
+đưa cùng crop đó vào từng backend; báo cáo khoảng cách cosine giữa embedding của mỗi backend và
+backend đầu tiên. Các backend dùng chung ngưỡng Facenet (0.40) nên độ lệch tối đa phải không quá
+PARITY_TOLERANCE (0.05, khoảng 1/8 ngưỡng); model int8 lệch nhiều hơn fp32 nhưng vẫn phải nằm trong
+mức này.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import inference_backends  # noqa: E402
+from recognition import IMAGE_EXTENSIONS  # noqa: E402
+from benchmarks.run import git_commit, percentile, summarize  # noqa: E402
+
+
+PARITY_TOLERANCE = 0.05
+
+
+def load_gallery(root: Path):
+    references, probes = [], []
+    for person_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        images = sorted(p for p in person_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        if len(images) < 2:
+            continue
+        references.append((person_dir.name, images[0]))
+        probes.extend((person_dir.name, image) for image in images[1:])
+    return references, probes
+
+
+def evaluate(backend, references, probes, concurrency):
+    start = time.perf_counter()
+    ref_vectors = [backend.embed_reference(str(path)) for _, path in references]
+    enroll_seconds = time.perf_counter() - start
+
+    ref_matrix = np.vstack(ref_vectors)
+    ref_matrix = ref_matrix / np.linalg.norm(ref_matrix, axis=1, keepdims=True)
+    ref_names = [name for name, _ in references]
+
+    probe_images = [(name, cv2.imread(str(path))) for name, path in probes]
+
+    def run_probe(item):
+        name, img = item
+        t0 = time.perf_counter()
+        embedding = backend.embed(backend.detect(img))
+        latency = (time.perf_counter() - t0) * 1000
+        distances = 1.0 - ref_matrix @ (embedding / max(float(np.linalg.norm(embedding)), 1e-12))
+        best = int(np.argmin(distances))
+        accepted = distances[best] <= backend.distance_threshold
+        return latency, accepted and ref_names[best] == name, accepted and ref_names[best] != name
+
+    backend.embed(backend.detect(probe_images[0][1]))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run_probe, probe_images))
+    duration = time.perf_counter() - start
+
+    latencies = [r[0] for r in results]
+    correct = sum(1 for r in results if r[1])
+    false_accepts = sum(1 for r in results if r[2])
+    total = len(results)
+    return {
+        "model_version": backend.model_version,
+        "distance_threshold": backend.distance_threshold,
+        "enroll_ms_per_image": round(enroll_seconds * 1000 / len(references), 3),
+        "latency": summarize([round(v, 3) for v in latencies]),
+        "throughput_per_s": round(total / duration, 2),
+        "accuracy": round(correct / total, 4),
+        "false_accept_rate": round(false_accepts / total, 4),
+        "false_reject_rate": round((total - correct - false_accepts) / total, 4),
+    }
+
+
+def _unit(vectors):
+    matrix = np.vstack(vectors)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def parity(backends, images, tolerance=PARITY_TOLERANCE):
+    """So embedding của từng backend với backend đầu tiên trên cùng các crop khuôn mặt."""
+    specs = list(backends)
+    reference = backends[specs[0]]
+    crops = [reference.detect(img) for img in images]
+    expected = _unit([reference.embed(crop) for crop in crops])
+
+    report = {}
+    for spec in specs[1:]:
+        actual = _unit([backends[spec].embed(crop) for crop in crops])
+        distances = sorted(float(d) for d in 1.0 - np.sum(expected * actual, axis=1))
+        report[spec] = {
+            "reference": specs[0],
+            "crops": len(crops),
+            "mean_distance": round(sum(distances) / len(distances), 5),
+            "p95_distance": round(percentile(distances, 95), 5),
+            "max_distance": round(distances[-1], 5),
+            "tolerance": tolerance,
+            "within_tolerance": distances[-1] <= tolerance,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="So sánh tốc độ và độ chính xác của các backend nhận dạng.")
+    parser.add_argument("--gallery", type=Path, required=True)
+    parser.add_argument("--backend", action="append", required=True, help='"deepface", "deepface:<model_name>" hoặc "onnx:<model.onnx>"; lặp lại để so sánh.')
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads cho ONNX Runtime (0 = mặc định).")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--parity", action="store_true", help="Báo cáo độ lệch embedding của từng backend so với backend đầu tiên.")
+    parser.add_argument("--parity-tolerance", type=float, default=PARITY_TOLERANCE)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+    if args.parity and len(args.backend) < 2:
+        parser.error("--parity cần ít nhất hai --backend.")
+
+    references, probes = load_gallery(args.gallery)
+    if not references or not probes:
+        parser.error("Bộ ảnh cần ít nhất một người có từ 2 ảnh trở lên.")
+
+    backends, results = {}, {}
+    for spec in args.backend:
+        backend = inference_backends.create_backend(spec, intra_op_threads=args.threads)
+        backend.warm_up()
+        backends[spec] = backend
+        results[spec] = evaluate(backend, references, probes, args.concurrency)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "platform": platform.platform(),
+        "gallery": {"identities": len(references), "probes": len(probes)},
+        "config": {"threads": args.threads, "concurrency": args.concurrency},
+        "backends": results,
+    }
+    if args.parity:
+        images = [cv2.imread(str(path)) for _, path in references + probes]
+        report["parity"] = parity(backends, images, args.parity_tolerance)
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Bộ benchmark tải cho backend.
+
+Chạy từ thư mục backend:
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --scenario all --output bench.json
+
+Mặc định dùng SQLite trong thư mục tạm và embedding giả lập (không cần TensorFlow).
+Dùng --database-url để chạy với Postgres local, --model real để đo cả Facenet.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else None,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+    }
+
+
+def run_workload(operations, total_requests, concurrency, rng_seed):
+    """
+    operations: danh sách (trọng số, nhãn, hàm nhận client-rng và trả về status code).
+    """
+    weights = [op[0] for op in operations]
+    latencies = {op[1]: [] for op in operations}
+    errors = {op[1]: 0 for op in operations}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker(worker_id):
+        rng = random.Random(rng_seed + worker_id)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            _, label, call = rng.choices(operations, weights=weights)[0]
+            start = time.perf_counter()
+            status_code = call(rng)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies[label].append(round(elapsed, 3))
+                if status_code >= 400:
+                    errors[label] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    duration = time.perf_counter() - start
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "requests": len(all_latencies),
+        "errors": sum(errors.values()),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(all_latencies) / duration, 2) if duration else None,
+        "latency": summarize(all_latencies),
+        "by_operation": {
+            label: dict(summarize(values), errors=errors[label]) for label, values in latencies.items()
+        },
+    }
+
+
+def morning_rush(client, school, rng_seed, args):
+    """Nhiều trạm cùng gửi ảnh điểm danh trong giờ vào lớp."""
+    targets = [
+        (entry["classroom_id"], code, image)
+        for entry in school
+        for code, image in entry["images"].items()
+    ]
+
+    def recognize(rng):
+        classroom_id, code, image = rng.choice(targets)
+        response = client.post(
+            "/api/recognize",
+            data={"classroom_id": str(classroom_id)},
+            files={"file": ("face.jpg", image, "image/jpeg")},
+        )
+        return response.status_code
+
+    return run_workload([(1, "recognize", recognize)], args.requests, args.concurrency, rng_seed)
+
+
+def dashboard_browsing(client, school, rng_seed, args):
+    """Giáo viên và admin mở bảng tổng hợp, bảng điểm danh; thỉnh thoảng đăng nhập lại."""
+    from benchmarks import synthetic
+
+    teacher_tokens = synthetic.login_teachers(client, school)
+    admin_token = synthetic.login_admin(client)
+    classroom_ids = [entry["classroom_id"] for entry in school]
+
+    def teacher_get(path):
+        def call(rng):
+            token = rng.choice(teacher_tokens)
+            return client.get(path, headers={"Authorization": f"Bearer {token}"}).status_code
+        return call
+
+    def admin_get(path_template):
+        def call(rng):
+            path = path_template.format(classroom_id=rng.choice(classroom_ids))
+            return client.get(path, headers={"Authorization": f"Bearer {admin_token}"}).status_code
+        return call
+
+    def login(rng):
+        return client.post("/api/admin/login", json={"username": "admin", "password": "1"}).status_code
+
+    operations = [
+        (4, "teacher_summary", teacher_get("/api/teacher/attendance-summary")),
+        (4, "teacher_grid", teacher_get("/api/teacher/attendance-grid")),
+        (2, "admin_summary", admin_get("/api/admin/attendance-summary/{classroom_id}")),
+        (2, "admin_grid", admin_get("/api/admin/attendance-grid/{classroom_id}")),
+        (1, "login", login),
+    ]
+    return run_workload(operations, args.requests, args.concurrency, rng_seed)
+
+
+SCENARIOS = {
+    "morning_rush": morning_rush,
+    "dashboard_browsing": dashboard_browsing,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tải cho backend điểm danh.")
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--database-url", default=None, help="Mặc định: SQLite trong thư mục tạm.")
+    parser.add_argument("--workdir", default=None, help="Thư mục chứa database/images. Mặc định: thư mục tạm.")
+    parser.add_argument("--base-url", default=None, help="Gửi request tới server đang chạy thay vì chạy app trong tiến trình.")
+    parser.add_argument("--classrooms", type=int, default=5)
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=15)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--model", choices=["synthetic", "real"], default="synthetic")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-startup", action="store_true", help="Bỏ qua đo thời gian import/khởi động.")
+    parser.add_argument("--output", default=None, help="Ghi kết quả JSON ra file (mặc định: stdout).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    output_path = Path(args.output).resolve() if args.output else None
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="attendance-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    database_url = args.database_url or f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["DATABASE_URL"] = database_url
+    os.chdir(workdir)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import main as app_main
+    from database import SessionLocal
+    import seed
+    from benchmarks import synthetic
+    from benchmarks.startup import measure_startup
+
+    if args.model == "synthetic":
+        synthetic.install_synthetic_embeddings()
+
+    if args.base_url:
+        import httpx
+        client_cm = httpx.Client(base_url=args.base_url, timeout=60)
+    else:
+        from fastapi.testclient import TestClient
+        client_cm = TestClient(app_main.app)
+
+    seed.init_db(with_demo_data=False)
+    startup = None if args.skip_startup else measure_startup(database_url, workdir)
+
+    rng = random.Random(args.seed)
+    results = {}
+    with client_cm as client:
+        db = SessionLocal()
+        try:
+            school = synthetic.build_school(db, app_main.IMAGE_DB_PATH, args.classrooms, args.students, args.sessions, rng)
+        finally:
+            db.close()
+
+        names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+        for name in names:
+            results[name] = SCENARIOS[name](client, school, args.seed, args)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": database_url.split("@")[-1],
+        "config": {
+            "classrooms": args.classrooms,
+            "students_per_classroom": args.students,
+            "sessions": args.sessions,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "model": args.model,
+            "seed": args.seed,
+            "base_url": args.base_url,
+        },
+        "startup": startup,
+        "scenarios": results,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if output_path:
+        output_path.write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
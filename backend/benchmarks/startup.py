@@ -0,0 +1,49 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t2 = time.perf_counter()
+    client.get("/")
+    t3 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "startup_s": t2 - t1,
+    "first_request_s": t3 - t2,
+    "tensorflow_loaded": "tensorflow" in sys.modules,
+    "generativeai_loaded": "google.generativeai" in sys.modules,
+}))
+"""
+
+
+def measure_startup(database_url: str, workdir: Path, repeats: int = 3) -> dict:
+    """Đo thời gian import main.py và khởi động app trong tiến trình Python mới."""
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONPATH=str(BACKEND_DIR))
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, "-c", _PROBE], cwd=workdir, env=env, text=True)
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {
+        key: round(statistics.median(run[key] for run in runs) * 1000, 3)
+        for key in ("import_s", "startup_s", "first_request_s")
+    }
+    return {
+        "repeats": repeats,
+        "import_ms": result["import_s"],
+        "startup_ms": result["startup_s"],
+        "first_request_ms": result["first_request_s"],
+        "tensorflow_loaded": runs[-1]["tensorflow_loaded"],
+        "generativeai_loaded": runs[-1]["generativeai_loaded"],
+    }
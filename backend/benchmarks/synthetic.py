@@ -0,0 +1,101 @@
+import hashlib
+import random
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+from sqlalchemy.orm import Session
+
+import models
+import recognition
+import security
+import seed
+
+BENCH_PASSWORD = "bench"
+EMBEDDING_SIZE = 128
+
+
+def build_school(db: Session, image_root: Path, num_classrooms: int, students_per_classroom: int, num_sessions: int, rng: random.Random) -> List[dict]:
+    """
+    Tạo N lớp học giả lập, mỗi lớp có giáo viên, sinh viên có ảnh tham chiếu, lịch học
+    và log điểm danh theo đúng logic seed mặc định (60% đúng giờ, 20% muộn, 20% vắng).
+    """
+    hashed_password = security.hash_password(BENCH_PASSWORD)
+    school = []
+    for i in range(num_classrooms):
+        classroom = models.Classroom(name=f"Bench #{i + 1}-{rng.randrange(10**9)}")
+        db.add(classroom)
+        db.flush()
+
+        teacher_username = f"bench_teacher_{classroom.id}"
+        db.add(models.Teacher(
+            username=teacher_username,
+            hashed_password=hashed_password,
+            classroom_id=classroom.id,
+        ))
+
+        names = [f"Student {classroom.id}-{n}" for n in range(students_per_classroom)]
+        students = seed.seed_classroom_data(db, classroom, student_names=names, num_sessions=num_sessions, rng=rng)
+        images = write_reference_images(image_root, classroom.id, students, rng.randrange(2**32))
+        school.append({"classroom_id": classroom.id, "teacher_username": teacher_username, "images": images})
+
+    db.commit()
+    return school
+
+
+def synthetic_face(rng: np.random.Generator, size: int = 160) -> np.ndarray:
+    """Ảnh có độ sáng và độ nét vừa phải để đi qua bộ lọc chất lượng."""
+    base = rng.integers(60, 190, size=(size // 8, size // 8, 3), dtype=np.uint8)
+    img = cv2.resize(base, (size, size), interpolation=cv2.INTER_NEAREST)
+    noise = rng.integers(-20, 20, size=img.shape)
+    return np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def write_reference_images(image_root: Path, classroom_id: int, students: List[models.Student], seed_value: int) -> dict:
+    rng = np.random.default_rng(seed_value)
+    folder = image_root / str(classroom_id)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    images = {}
+    for student in students:
+        path = folder / f"{student.student_code}_bench.jpg"
+        _, encoded = cv2.imencode(".jpg", synthetic_face(rng))
+        path.write_bytes(encoded.tobytes())
+        student.reference_image_path = str(path)
+        images[student.student_code] = encoded.tobytes()
+    return images
+
+
+def _embedding_for(img: np.ndarray) -> np.ndarray:
+    digest = hashlib.sha1(np.ascontiguousarray(img).tobytes()).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+    return rng.standard_normal(EMBEDDING_SIZE).astype(np.float32)
+
+
+def install_synthetic_embeddings():
+    """
+    Thay model bằng embedding băm từ nội dung ảnh, để đo chi phí của phần còn lại
+    của pipeline (decode, lọc chất lượng, so khớp, DB) mà không cần TensorFlow.
+    """
+    recognition.detect_face = lambda img, backend=None: img
+    recognition.embed_face = lambda face_img, backend=None: _embedding_for(face_img)
+    recognition.embed_reference_image = lambda path, backend=None: _embedding_for(cv2.imread(str(path)))
+
+
+def login_teachers(client, school) -> List[str]:
+    tokens = []
+    for entry in school:
+        response = client.post(
+            "/api/teacher/login",
+            json={"username": entry["teacher_username"], "password": BENCH_PASSWORD},
+        )
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+def login_admin(client, username: str = "admin", password: str = "1") -> str:
+    response = client.post("/api/admin/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
@@ -0,0 +1,127 @@
+"""
+Xoá lớp và sinh viên bằng một câu DELETE; giáo viên, sinh viên, log điểm danh, lịch học, thống kê
+tuần... của lớp được DB xoá theo nhờ ON DELETE CASCADE, không nạp từng dòng lên ORM.
+File ảnh và embedding được dọn trong background task sau khi commit.
+
+    python cascade_deletes.py migrate
+
+Lệnh migrate thêm ON DELETE CASCADE cho DB Postgres tạo bởi phiên bản cũ. DB SQLite (test/benchmark)
+cũ cần tạo lại bằng `python seed.py`.
+"""
+import shutil
+import logging
+import argparse
+from pathlib import Path
+from typing import Iterable, List
+
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session
+
+import models
+import rollups
+import gallery_cache
+import change_tracking
+import embedding_store
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+# (bảng, cột khoá ngoại, bảng được tham chiếu)
+CASCADE_FOREIGN_KEYS = [
+    ("teachers", "classroom_id", "classrooms"),
+    ("students", "classroom_id", "classrooms"),
+    ("schedules", "classroom_id", "classrooms"),
+    ("attendance_logs", "student_id", "students"),
+    ("attendance_daily_summaries", "student_id", "students"),
+]
+
+
+def delete_classroom(db: Session, classroom_id: int) -> bool:
+    """Xoá lớp cùng mọi dữ liệu của lớp. Trả về False nếu lớp không tồn tại. Không commit."""
+    deleted = db.execute(
+        delete(models.Classroom).where(models.Classroom.id == classroom_id),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    if not deleted:
+        return False
+    change_tracking.mark_changed(db, [
+        change_tracking.TABLE_CLASSROOMS,
+        change_tracking.TABLE_TEACHERS,
+        change_tracking.classroom_scope(classroom_id),
+    ])
+    return True
+
+
+def delete_students(db: Session, classroom_id: int, student_ids: Iterable[int]) -> List[str]:
+    """
+    Xoá sinh viên của một lớp cùng log điểm danh của họ và tính lại thống kê tuần của lớp.
+    Trả về đường dẫn ảnh gốc của các sinh viên đã xoá. Không commit.
+    """
+    student = models.Student
+    image_paths = db.execute(
+        delete(student)
+        .where(student.classroom_id == classroom_id, student.id.in_(list(student_ids)))
+        .returning(student.reference_image_path),
+        execution_options={"synchronize_session": False},
+    ).scalars().all()
+    if image_paths:
+        change_tracking.mark_changed(db, [change_tracking.classroom_scope(classroom_id)])
+        rollups.rebuild_classroom(db, classroom_id)
+    return image_paths
+
+
+def remove_files(paths: Iterable[str], root: Path):
+    """Chỉ xoá file nằm trong thư mục ảnh (dữ liệu mẫu dùng đường dẫn giả như placeholder.jpg)."""
+    root = root.resolve()
+    for path in paths:
+        if not path:
+            continue
+        resolved = Path(path).resolve()
+        if root not in resolved.parents:
+            continue
+        try:
+            resolved.unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"Lỗi khi xóa file ảnh {path}: {e}")
+
+
+def remove_classroom_files(classroom_id: int, image_folder: Path):
+    gallery_cache.galleries.discard(classroom_id)
+    shutil.rmtree(image_folder, ignore_errors=True)
+    embedding_store.remove_classroom(classroom_id)
+    logger.info(f"Đã dọn ảnh và embedding của lớp {classroom_id}.")
+
+
+def migrate(bind=engine):
+    """Đổi các khoá ngoại trong CASCADE_FOREIGN_KEYS sang ON DELETE CASCADE (Postgres)."""
+    with bind.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            logger.warning("Chỉ hỗ trợ Postgres; DB SQLite cũ cần tạo lại bằng `python seed.py`.")
+            return
+        for table, column, referenced in CASCADE_FOREIGN_KEYS:
+            # Chỉ lấy ràng buộc trên chính bảng (với bảng phân vùng là bảng cha), partition tự đi theo.
+            constraints = conn.execute(text(
+                "SELECT conname, confdeltype FROM pg_constraint "
+                "WHERE contype = 'f' AND conrelid = CAST(:table AS regclass) "
+                "AND confrelid = CAST(:referenced AS regclass)"
+            ), {"table": table, "referenced": referenced}).all()
+            if constraints and all(deltype == "c" for _, deltype in constraints):
+                continue
+            for name, _ in constraints:
+                conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey "
+                f"FOREIGN KEY ({column}) REFERENCES {referenced}(id) ON DELETE CASCADE"
+            ))
+            logger.info(f"{table}.{column}: đã chuyển sang ON DELETE CASCADE.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Khoá ngoại ON DELETE CASCADE cho việc xoá hàng loạt.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Thêm ON DELETE CASCADE cho DB tạo bởi phiên bản cũ.")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate()
@@ -0,0 +1,127 @@
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+# Bộ đếm thay đổi theo phạm vi, lưu trong DB để mọi worker thấy cùng một giá trị:
+#   table:classrooms, table:teachers  -> danh sách cho admin
+#   classroom:<id>                    -> sinh viên, lịch học, log điểm danh của lớp
+TABLE_CLASSROOMS = "table:classrooms"
+TABLE_TEACHERS = "table:teachers"
+
+# Thay đổi chỉ ở các cột này không làm dữ liệu trả về cho dashboard khác đi.
+_IGNORED_ATTRIBUTES = {
+    models.Teacher: {"current_session_id", "hashed_password"},
+    models.Student: {"reference_image_path"},
+}
+
+# Các phạm vi đã đổi trong transaction hiện tại, tăng một lần lúc commit.
+_PENDING_KEY = "change_tracking.pending_scopes"
+
+
+def classroom_scope(classroom_id: int) -> str:
+    return f"classroom:{classroom_id}"
+
+
+def _only_ignored_changes(obj) -> bool:
+    ignored = _IGNORED_ATTRIBUTES.get(type(obj))
+    if not ignored:
+        return False
+    state = inspect(obj)
+    changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
+    return bool(changed) and changed <= ignored
+
+
+def _scopes_for(session: Session, obj, deleted: bool = False) -> set:
+    if isinstance(obj, models.Classroom):
+        # Danh sách giáo viên chỉ có classroom_id; giáo viên chỉ đổi khi lớp bị xoá (cascade).
+        scopes = {TABLE_CLASSROOMS, classroom_scope(obj.id)}
+        return scopes | {TABLE_TEACHERS} if deleted else scopes
+    if isinstance(obj, models.Teacher):
+        return {TABLE_TEACHERS}
+    if isinstance(obj, (models.Student, models.Schedule)):
+        return {classroom_scope(obj.classroom_id)}
+    if isinstance(obj, models.AttendanceLog):
+        student = obj.student or session.get(models.Student, obj.student_id)
+        return {classroom_scope(student.classroom_id)} if student else set()
+    return set()
+
+
+def bump(connection, scopes: Iterable[str]):
+    """Tăng bộ đếm cho các phạm vi ngay trong transaction của connection."""
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    table = models.ChangeCounter.__table__
+    stmt = dialect_insert(table).values([{"scope": scope, "version": 1} for scope in scopes])
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.scope], set_={"version": table.c.version + 1})
+    connection.execute(stmt)
+
+
+def mark_changed(session: Session, scopes: Iterable[str]):
+    """
+    Ghi nhận phạm vi đã đổi; bộ đếm được tăng một lần khi session commit. Dùng trực tiếp khi
+    ghi bằng câu lệnh SQL hàng loạt (không qua after_flush).
+    """
+    session.info.setdefault(_PENDING_KEY, set()).update(scopes)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_after_flush(session, flush_context):
+    scopes = set()
+    for obj in session.new:
+        scopes |= _scopes_for(session, obj)
+    for obj in session.deleted:
+        scopes |= _scopes_for(session, obj, deleted=True)
+    for obj in session.dirty:
+        if session.is_modified(obj) and not _only_ignored_changes(obj):
+            scopes |= _scopes_for(session, obj)
+    if scopes:
+        mark_changed(session, scopes)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _bump_before_commit(session):
+    # Dòng bộ đếm của lớp bị mọi lượt điểm danh của lớp cập nhật: tăng ở cuối transaction để khoá
+    # dòng chỉ giữ trong lúc commit. commit() chỉ tự flush sau sự kiện này nên flush trước để gom đủ.
+    session.flush()
+    scopes = session.info.pop(_PENDING_KEY, None)
+    if scopes:
+        bump(session.connection(), scopes)
+
+
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _discard_pending(session, transaction):
+    # Rollback hoặc đóng session: thay đổi không được ghi nên không tăng bộ đếm.
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def current_etag(db: Session, scopes: Iterable[str]) -> str:
+    scopes = sorted(set(scopes))
+    rows = dict(
+        db.query(models.ChangeCounter.scope, models.ChangeCounter.version)
+        .filter(models.ChangeCounter.scope.in_(scopes))
+        .all()
+    )
+    return '"' + ";".join(f"{scope}={rows.get(scope, 0)}" for scope in scopes) + '"'
+
+
+def not_modified(request: Request, response: Response, db: Session, *scopes: str) -> Optional[Response]:
+    """
+    Trả về 304 nếu If-None-Match khớp phiên bản hiện tại; nếu không thì gắn ETag vào response
+    và trả về None để endpoint tiếp tục truy vấn. Phải gọi trước khi đọc dữ liệu.
+    """
+    etag = current_etag(db, scopes)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
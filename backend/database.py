@@ -1,13 +1,43 @@
 import os
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# Bản sao chỉ đọc cho các endpoint báo cáo; không đặt thì đọc luôn từ primary.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Client gửi header này ngay sau khi ghi (vd. sửa ghi chú) để đọc từ primary,
+# tránh thấy dữ liệu cũ khi bản sao còn trễ.
+READ_YOUR_WRITES_HEADER = "x-read-your-writes"
+
+
+def _connect_args(url: str) -> dict:
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+
+def _create_engine(url: str):
+    engine = create_engine(url, connect_args=_connect_args(url))
+    if url.startswith("sqlite"):
+        # SQLite mặc định bỏ qua khoá ngoại, kể cả ON DELETE CASCADE dùng khi xoá lớp/sinh viên.
+        @event.listens_for(engine, "connect")
+        def _enable_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+    return engine
+
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+
+if READ_DATABASE_URL:
+    read_engine = _create_engine(READ_DATABASE_URL)
+else:
+    read_engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
@@ -16,4 +46,14 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db(request: Request):
+    if request.headers.get(READ_YOUR_WRITES_HEADER):
+        db = SessionLocal()
+    else:
+        db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
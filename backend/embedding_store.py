@@ -0,0 +1,144 @@
+import os
+import re
+import json
+import fcntl
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+# Mỗi lớp có một thư mục chứa các phiên bản embedding bất biến cho từng model
+# (<model>-v{N}.npy + .json) và file CURRENT-<model> trỏ tới phiên bản mới nhất.
+# Worker map file .npy ở chế độ chỉ đọc, nên mọi worker dùng chung page cache.
+# File ACTIVE_BACKEND ở thư mục gốc cho biết model nào đang được dùng để nhận dạng.
+EMBEDDING_DB_PATH = Path(os.getenv("EMBEDDING_DB_PATH", "database/embeddings"))
+ACTIVE_BACKEND_FILE = "ACTIVE_BACKEND"
+KEEP_VERSIONS = 3
+
+
+class PublishedGallery:
+    def __init__(self, version: int, student_codes: list, sources: list, model: str, embeddings: np.ndarray):
+        self.version = version
+        self.student_codes = student_codes
+        self.sources = sources
+        self.model = model
+        self.embeddings = embeddings
+
+
+def _classroom_dir(classroom_id: int) -> Path:
+    return EMBEDDING_DB_PATH / str(classroom_id)
+
+
+def model_slug(model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9.]+", "_", model).strip("_")
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _publish_lock(classroom_id: int):
+    folder = _classroom_dir(classroom_id)
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield folder
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def current_version(classroom_id: int, model: str) -> Optional[int]:
+    try:
+        return int((_classroom_dir(classroom_id) / f"CURRENT-{model_slug(model)}").read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load(classroom_id: int, model: str, version: int) -> PublishedGallery:
+    folder = _classroom_dir(classroom_id)
+    prefix = f"{model_slug(model)}-v{version}"
+    meta = json.loads((folder / f"{prefix}.json").read_text(encoding="utf-8"))
+    embeddings = np.load(folder / f"{prefix}.npy", mmap_mode="r")
+    return PublishedGallery(version, meta["student_codes"], [tuple(s) for s in meta["sources"]], meta["model"], embeddings)
+
+
+def publish(
+    classroom_id: int,
+    image_paths: list,
+    student_code_for: Callable[[Path], str],
+    embed: Callable[[str], np.ndarray],
+    model: str,
+) -> int:
+    """
+    Tạo phiên bản mới từ danh sách ảnh tham chiếu. Ảnh không đổi (cùng đường dẫn và mtime)
+    được dùng lại embedding của phiên bản trước, nên chỉ ảnh mới đăng ký phải chạy model.
+    """
+    slug = model_slug(model)
+    with _publish_lock(classroom_id) as folder:
+        previous_version = current_version(classroom_id, model)
+        reusable = {}
+        if previous_version is not None:
+            previous = load(classroom_id, model, previous_version)
+            reusable = {source: previous.embeddings[i] for i, source in enumerate(previous.sources)}
+
+        sources, student_codes, vectors = [], [], []
+        for path in image_paths:
+            source = (str(path), os.path.getmtime(path))
+            vector = reusable.get(source)
+            if vector is None:
+                vector = embed(str(path))
+                vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+            sources.append(source)
+            student_codes.append(student_code_for(Path(path)))
+            vectors.append(np.asarray(vector, dtype=np.float32))
+
+        embeddings = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+        version = (previous_version or 0) + 1
+        np.save(folder / f"{slug}-v{version}.npy", embeddings)
+        meta = {"student_codes": student_codes, "sources": sources, "model": model}
+        _write_atomic(folder / f"{slug}-v{version}.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        _write_atomic(folder / f"CURRENT-{slug}", str(version).encode())
+
+        _remove_old_versions(folder, slug, version)
+        return version
+
+
+def _remove_old_versions(folder: Path, slug: str, latest: int):
+    # Trên Linux, worker đang map phiên bản cũ vẫn đọc được sau khi file bị xoá.
+    for path in folder.glob(f"{slug}-v*.npy"):
+        try:
+            version = int(path.stem[len(slug) + 2:])
+        except ValueError:
+            continue
+        if version <= latest - KEEP_VERSIONS:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+
+
+def remove_classroom(classroom_id: int):
+    """Xoá mọi phiên bản embedding của một lớp đã bị xoá."""
+    shutil.rmtree(_classroom_dir(classroom_id), ignore_errors=True)
+
+
+def active_backend() -> Optional[dict]:
+    """{"spec": ..., "model_version": ...} của backend đang phục vụ nhận dạng, hoặc None."""
+    try:
+        return json.loads((EMBEDDING_DB_PATH / ACTIVE_BACKEND_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def set_active_backend(spec: str, model: str):
+    EMBEDDING_DB_PATH.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps({"spec": spec, "model_version": model}).encode("utf-8")
+    _write_atomic(EMBEDDING_DB_PATH / ACTIVE_BACKEND_FILE, payload)
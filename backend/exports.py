@@ -0,0 +1,150 @@
+import io
+import csv
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional
+
+import xlsxwriter
+from sqlalchemy import and_, func, select, union_all
+
+import models
+import attendance_partitions
+from database import ReadSessionLocal
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+COLUMNS = ["classroom_id", "classroom_name", "student_code", "student_name", "class_date", "status", "check_in_time", "note"]
+
+
+def _first_checkins_subquery(classroom_ids: Optional[List[int]], start_date: Optional[date], end_date: Optional[date]):
+    log = models.AttendanceLog
+    summary = models.AttendanceDailySummary
+
+    log_query = select(
+        log.student_id.label("student_id"),
+        func.date(log.timestamp).label("class_date"),
+        log.timestamp.label("check_in_time"),
+        log.status.label("status"),
+        log.note.label("note"),
+    )
+    summary_query = select(
+        summary.student_id.label("student_id"),
+        summary.class_date.label("class_date"),
+        summary.check_in_time.label("check_in_time"),
+        summary.status.label("status"),
+        summary.note.label("note"),
+    )
+    if classroom_ids:
+        # Lọc trước khi đánh số ROW_NUMBER để xuất một lớp không phải xếp hạng log của cả trường.
+        student_ids = select(models.Student.id).where(models.Student.classroom_id.in_(classroom_ids))
+        log_query = log_query.where(log.student_id.in_(student_ids))
+        summary_query = summary_query.where(summary.student_id.in_(student_ids))
+    if start_date:
+        log_query = log_query.where(log.timestamp >= datetime.combine(start_date, datetime.min.time()))
+        summary_query = summary_query.where(summary.class_date >= start_date)
+    if end_date:
+        log_query = log_query.where(log.timestamp < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        summary_query = summary_query.where(summary.class_date <= end_date)
+
+    # Dòng đại diện của ô và ghi chú của ô chọn giống attendance_partitions.load_first_checkins.
+    daily = union_all(log_query, summary_query).subquery()
+    day = (daily.c.student_id, daily.c.class_date)
+    ranked = select(
+        daily.c.student_id,
+        daily.c.class_date,
+        daily.c.check_in_time,
+        daily.c.status,
+        func.coalesce(
+            func.max(attendance_partitions.marker_note(daily.c.status, daily.c.note)).over(partition_by=day),
+            daily.c.note,
+        ).label("note"),
+        func.row_number().over(
+            partition_by=day,
+            order_by=(attendance_partitions.cell_priority(daily.c.status), daily.c.check_in_time),
+        ).label("rn"),
+    ).subquery()
+    return select(
+        ranked.c.student_id, ranked.c.class_date, ranked.c.check_in_time, ranked.c.status, ranked.c.note
+    ).where(ranked.c.rn == 1).subquery()
+
+
+def build_export_query(classroom_ids: Optional[List[int]], start_date: Optional[date], end_date: Optional[date]):
+    """Một truy vấn duy nhất: lịch học x sinh viên, nối trái với lượt điểm danh đầu tiên trong ngày."""
+    schedule, student, classroom = models.Schedule, models.Student, models.Classroom
+    first = _first_checkins_subquery(classroom_ids, start_date, end_date)
+
+    query = (
+        select(
+            classroom.id, classroom.name, student.student_code, student.name,
+            schedule.class_date, first.c.check_in_time, first.c.status, first.c.note,
+        )
+        .select_from(schedule)
+        .join(classroom, classroom.id == schedule.classroom_id)
+        .join(student, student.classroom_id == schedule.classroom_id)
+        .outerjoin(first, and_(first.c.student_id == student.id, first.c.class_date == schedule.class_date))
+        .order_by(classroom.id, student.name, student.id, schedule.class_date)
+    )
+    if classroom_ids:
+        query = query.where(schedule.classroom_id.in_(classroom_ids))
+    if start_date:
+        query = query.where(schedule.class_date >= start_date)
+    if end_date:
+        query = query.where(schedule.class_date <= end_date)
+    return query
+
+
+def iter_export_rows(classroom_ids: Optional[List[int]], start_date: Optional[date], end_date: Optional[date]) -> Iterator[list]:
+    # Session riêng vì dependency đã đóng trước khi StreamingResponse chạy; đọc từ bản sao nếu có.
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(
+            build_export_query(classroom_ids, start_date, end_date).execution_options(yield_per=BATCH_SIZE)
+        )
+        for classroom_id, classroom_name, student_code, student_name, class_date, check_in_time, cell_status, note in result:
+            if isinstance(check_in_time, str):
+                check_in_time = datetime.fromisoformat(check_in_time)
+            if check_in_time and cell_status not in models.MARKER_STATUSES:
+                on_time_threshold = check_in_time.replace(hour=8, minute=5, second=0)
+                status = "PRESENT" if check_in_time <= on_time_threshold else "LATE"
+                check_in = check_in_time.strftime('%H:%M:%S')
+            else:
+                status, check_in = "ABSENT", None
+            yield [classroom_id, classroom_name, student_code, student_name, class_date.isoformat(), status, check_in, note]
+    finally:
+        db.close()
+
+
+def stream_csv(rows: Iterator[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(rows: Iterator[list]) -> Iterator[bytes]:
+    """
+    XLSX là file zip nên phải ghi xong mới gửi; xlsxwriter ở chế độ constant_memory
+    ghi từng dòng ra file tạm nên bộ nhớ vẫn không phụ thuộc số dòng.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        workbook = xlsxwriter.Workbook(tmp, {"constant_memory": True, "in_memory": False})
+        sheet = workbook.add_worksheet("attendance")
+        sheet.write_row(0, 0, COLUMNS)
+        for index, row in enumerate(rows, start=1):
+            sheet.write_row(index, 0, row)
+        workbook.close()
+
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,154 @@
+import os
+import json
+import math
+import threading
+from collections import Counter
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# Ngưỡng chất lượng ảnh khuôn mặt, có thể ghi đè qua biến môi trường.
+MIN_FACE_SIZE = int(os.getenv("FACE_MIN_SIZE", "64"))
+MIN_SHARPNESS = float(os.getenv("FACE_MIN_SHARPNESS", "60"))
+MIN_BRIGHTNESS = float(os.getenv("FACE_MIN_BRIGHTNESS", "50"))
+MAX_BRIGHTNESS = float(os.getenv("FACE_MAX_BRIGHTNESS", "215"))
+MAX_YAW_RATIO = float(os.getenv("FACE_MAX_YAW_RATIO", "0.35"))
+MAX_ROLL_DEGREES = float(os.getenv("FACE_MAX_ROLL_DEGREES", "25"))
+
+# Ảnh được thu nhỏ về cạnh này trước khi đo độ nét/độ sáng để chi phí cố định (< 1ms).
+ANALYSIS_SIZE = 96
+
+REASON_UNREADABLE = "UNREADABLE_IMAGE"
+REASON_TOO_SMALL = "FACE_TOO_SMALL"
+REASON_TOO_BLURRY = "TOO_BLURRY"
+REASON_TOO_DARK = "TOO_DARK"
+REASON_TOO_BRIGHT = "TOO_BRIGHT"
+REASON_BAD_POSE = "BAD_POSE"
+
+# Các lý do có thể khắc phục bằng cách gửi lại một khung hình khác.
+RETRYABLE_REASONS = {REASON_TOO_BLURRY, REASON_TOO_DARK, REASON_TOO_BRIGHT, REASON_BAD_POSE, REASON_TOO_SMALL}
+
+_rejection_counts = Counter()
+_passed_count = 0
+_lock = threading.Lock()
+
+
+class QualityResult:
+    def __init__(self, ok: bool, reason: Optional[str] = None, metrics: Optional[dict] = None):
+        self.ok = ok
+        self.reason = reason
+        self.metrics = metrics or {}
+
+    @property
+    def retryable(self) -> bool:
+        return self.reason in RETRYABLE_REASONS
+
+    def to_detail(self) -> dict:
+        return {
+            "code": "FACE_QUALITY_REJECTED",
+            "reason": self.reason,
+            "retry": self.retryable,
+            "metrics": self.metrics,
+        }
+
+
+def decode_image(data: bytes) -> Optional[np.ndarray]:
+    if not data:
+        return None
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def parse_landmarks(raw: Optional[str]) -> Optional[dict]:
+    """
+    Đọc keypoints do trạm gửi lên (MediaPipe: rightEye, leftEye, noseTip, ...),
+    toạ độ tính theo ảnh crop. Trả về dict tên -> (x, y) hoặc None nếu không hợp lệ.
+    """
+    if not raw:
+        return None
+    try:
+        items = json.loads(raw)
+        if isinstance(items, dict):
+            items = [dict(v, name=k) for k, v in items.items()]
+        return {p["name"]: (float(p["x"]), float(p["y"])) for p in items if "name" in p}
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def estimate_pose(landmarks: dict) -> Optional[dict]:
+    right_eye = landmarks.get("rightEye")
+    left_eye = landmarks.get("leftEye")
+    nose = landmarks.get("noseTip")
+    if not right_eye or not left_eye or not nose:
+        return None
+
+    dx = left_eye[0] - right_eye[0]
+    dy = left_eye[1] - right_eye[1]
+    eye_distance = math.hypot(dx, dy)
+    if eye_distance < 1e-6:
+        return None
+
+    roll = math.degrees(math.atan2(dy, dx))
+    if roll > 90:
+        roll -= 180
+    elif roll < -90:
+        roll += 180
+
+    # Độ lệch của mũi so với trung điểm hai mắt, chuẩn hoá theo khoảng cách hai mắt.
+    mid_x = (left_eye[0] + right_eye[0]) / 2
+    mid_y = (left_eye[1] + right_eye[1]) / 2
+    yaw_ratio = ((nose[0] - mid_x) * dx + (nose[1] - mid_y) * dy) / (eye_distance ** 2)
+
+    return {"roll": round(roll, 1), "yaw_ratio": round(yaw_ratio, 3)}
+
+
+def assess_face_quality(img: Optional[np.ndarray], landmarks: Optional[dict] = None) -> QualityResult:
+    if img is None or img.size == 0:
+        return _record(QualityResult(False, REASON_UNREADABLE))
+
+    height, width = img.shape[:2]
+    metrics = {"width": width, "height": height}
+    if min(width, height) < MIN_FACE_SIZE:
+        return _record(QualityResult(False, REASON_TOO_SMALL, metrics))
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    scale = ANALYSIS_SIZE / max(width, height)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+    brightness = float(gray.mean())
+    metrics["brightness"] = round(brightness, 1)
+    if brightness < MIN_BRIGHTNESS:
+        return _record(QualityResult(False, REASON_TOO_DARK, metrics))
+    if brightness > MAX_BRIGHTNESS:
+        return _record(QualityResult(False, REASON_TOO_BRIGHT, metrics))
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    metrics["sharpness"] = round(sharpness, 1)
+    if sharpness < MIN_SHARPNESS:
+        return _record(QualityResult(False, REASON_TOO_BLURRY, metrics))
+
+    if landmarks:
+        pose = estimate_pose(landmarks)
+        if pose:
+            metrics.update(pose)
+            if abs(pose["roll"]) > MAX_ROLL_DEGREES or abs(pose["yaw_ratio"]) > MAX_YAW_RATIO:
+                return _record(QualityResult(False, REASON_BAD_POSE, metrics))
+
+    return _record(QualityResult(True, metrics=metrics))
+
+
+def _record(result: QualityResult) -> QualityResult:
+    global _passed_count
+    with _lock:
+        if result.ok:
+            _passed_count += 1
+        else:
+            _rejection_counts[result.reason] += 1
+    return result
+
+
+def get_quality_stats() -> dict:
+    with _lock:
+        return {"passed": _passed_count, "rejected": dict(_rejection_counts)}
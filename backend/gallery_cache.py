@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import metrics
+import models
+from database import ReadSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Ngân sách bộ nhớ cho gallery của mỗi worker; vượt quá thì đẩy lớp ít dùng nhất ra.
+GALLERY_CACHE_BYTES = int(float(os.getenv("GALLERY_CACHE_MB", "256")) * 1024 * 1024)
+# Chu kỳ nạp trước gallery của các lớp có lịch học hôm nay (giây); 0 để tắt.
+PRELOAD_INTERVAL = int(os.getenv("GALLERY_PRELOAD_INTERVAL", "600"))
+
+
+def gallery_size(gallery) -> int:
+    """Ước lượng: ma trận embedding cộng mã sinh viên và đường dẫn ảnh (chuỗi Python ~50 byte overhead)."""
+    metadata = sum(len(code) + 50 for code in gallery.student_codes)
+    metadata += sum(len(path) + 80 for path, _ in gallery.sources)
+    return int(gallery.embeddings.nbytes) + metadata
+
+
+class BudgetExceeded(Exception):
+    """Gallery cần nạp không còn vừa ngân sách của cache (chỉ khi nạp không được đẩy lớp khác ra)."""
+
+
+class GalleryCache:
+    def __init__(self, budget_bytes: int = GALLERY_CACHE_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, classroom_id: int) -> bool:
+        with self._lock:
+            return classroom_id in self._entries
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident_bytes
+
+    def peek(self, classroom_id: int):
+        """Như get nhưng không đánh dấu là vừa dùng."""
+        with self._lock:
+            return self._entries.get(classroom_id)
+
+    def get(self, classroom_id: int):
+        with self._lock:
+            gallery = self._entries.get(classroom_id)
+            if gallery is not None:
+                self._entries.move_to_end(classroom_id)
+            return gallery
+
+    def put(self, classroom_id: int, gallery, evict: bool = True):
+        """Thêm/thay gallery của lớp. evict=False: ném BudgetExceeded thay vì đẩy lớp khác ra."""
+        size = gallery_size(gallery)
+        with self._lock:
+            if not evict and self._resident_bytes - self._sizes.get(classroom_id, 0) + size > self.budget_bytes:
+                raise BudgetExceeded(f"Gallery lớp {classroom_id} ({size} byte) vượt ngân sách cache.")
+            self._resident_bytes -= self._sizes.get(classroom_id, 0)
+            self._entries[classroom_id] = gallery
+            self._entries.move_to_end(classroom_id)
+            self._sizes[classroom_id] = size
+            self._resident_bytes += size
+            # Luôn giữ lại lớp vừa nạp, kể cả khi riêng nó đã vượt ngân sách.
+            while self._resident_bytes > self.budget_bytes and len(self._entries) > 1:
+                evicted, _ = self._entries.popitem(last=False)
+                self._resident_bytes -= self._sizes.pop(evicted)
+                metrics.GALLERY_EVICTIONS.inc()
+            self._update_gauges()
+
+    def discard(self, classroom_id: int):
+        with self._lock:
+            if self._entries.pop(classroom_id, None) is not None:
+                self._resident_bytes -= self._sizes.pop(classroom_id)
+            self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.GALLERY_RESIDENT_BYTES.set(self._resident_bytes)
+        metrics.GALLERY_RESIDENT_CLASSROOMS.set(len(self._entries))
+
+
+galleries = GalleryCache()
+
+
+def scheduled_classroom_ids(day) -> list:
+    db = ReadSessionLocal()
+    try:
+        rows = db.query(models.Schedule.classroom_id).filter(models.Schedule.class_date == day).distinct()
+        return [classroom_id for (classroom_id,) in rows]
+    finally:
+        db.close()
+
+
+def preload_scheduled(warm: Callable[[int], bool]) -> int:
+    """
+    Nạp trước gallery của các lớp có lịch học hôm nay, để lượt điểm danh đầu tiên buổi sáng
+    không phải chờ nạp. Dừng ở lớp đầu tiên không còn vừa ngân sách, không đẩy lớp nào ra khỏi cache.
+    """
+    today = models.get_vietnam_time_naive().date()
+    loaded = 0
+    for classroom_id in scheduled_classroom_ids(today):
+        # warm trả về True nếu phải nạp từ đĩa (lớp chưa có trong cache hoặc đã có phiên bản mới),
+        # và ném BudgetExceeded nếu gallery đó không vừa.
+        try:
+            warmed = warm(classroom_id)
+        except BudgetExceeded as e:
+            logger.warning(f"Cache gallery đã đầy, dừng nạp trước: {e}")
+            break
+        if warmed:
+            metrics.GALLERY_PRELOADS.inc()
+            loaded += 1
+    return loaded
+
+
+def start_preloader(warm: Callable[[int], bool], interval: int = PRELOAD_INTERVAL) -> Optional[threading.Thread]:
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                loaded = preload_scheduled(warm)
+                if loaded:
+                    logger.info(f"Đã nạp trước gallery của {loaded} lớp có lịch học hôm nay.")
+            except Exception as e:
+                logger.error(f"Lỗi khi nạp trước gallery: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="gallery-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,179 @@
+"""
+Sửa hàng loạt ô của bảng điểm danh (ghi chú, đánh dấu có mặt/vắng) trong một transaction.
+
+Một ô là lượt điểm danh đầu tiên trong ngày của sinh viên, giống cách bảng hiển thị. Sửa ô không
+xoá lượt điểm danh nào; trạng thái do giáo viên đặt nằm ở dòng đánh dấu lúc 0h của ô (xem models):
+- ghi chú được ghi vào dòng đánh dấu nếu có, không thì vào lượt đầu tiên; ô vắng thì thêm dòng
+  NOTE chỉ mang ghi chú, ô vẫn vắng,
+- PRESENT: dòng đánh dấu thành lượt thủ công lúc 0h; ô không có dòng đánh dấu mà vắng hoặc đi
+  muộn được thêm lượt thủ công lúc 0h, thành lượt đầu tiên và đúng giờ,
+- ABSENT: thêm (hoặc chuyển dòng đánh dấu thành) dòng ABSENT giữ ghi chú của ô, các lượt điểm danh
+  vẫn còn nhưng không được tính.
+Ngày đã lưu trữ (có dòng trong attendance_daily_summaries) được sửa thẳng trên dòng tóm tắt.
+
+Mọi truy vấn lọc theo student_id và khoảng timestamp [0h, 0h hôm sau) để dùng được index
+(student_id, timestamp) và chỉ chạm các partition liên quan.
+"""
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import bindparam, case, func, insert, select, update
+from sqlalchemy.orm import Session
+
+import models
+import rollups
+import change_tracking
+
+MAX_EDITS = 2000
+
+PRESENT = models.ATTENDANCE_PRESENT
+ABSENT = models.ATTENDANCE_ABSENT
+NOTE = models.ATTENDANCE_NOTE
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def unknown_students(db: Session, classroom_id: int, student_ids: Iterable[int]) -> List[int]:
+    student_ids = set(student_ids)
+    found = set(db.execute(
+        select(models.Student.id).where(models.Student.classroom_id == classroom_id, models.Student.id.in_(student_ids))
+    ).scalars())
+    return sorted(student_ids - found)
+
+
+def _cell_logs(db: Session, cells: set) -> dict:
+    """
+    {(student_id, ngày): {"check_in": dòng, "marker": dòng}} với dòng = (id, timestamp, status, note)
+    của lượt điểm danh đầu tiên và của dòng đánh dấu trong ngày (nếu có) cho các ô cần sửa.
+    """
+    log = models.AttendanceLog
+    days = [day for _, day in cells]
+    is_marker = case((log.status.in_(models.MARKER_STATUSES), 1), else_=0)
+    ranked = (
+        select(
+            log.id, log.student_id, log.timestamp, log.status, log.note, is_marker.label("is_marker"),
+            func.row_number().over(
+                partition_by=(log.student_id, func.date(log.timestamp), is_marker),
+                order_by=log.timestamp,
+            ).label("rn"),
+        )
+        .where(
+            log.student_id.in_({student_id for student_id, _ in cells}),
+            log.timestamp >= day_bounds(min(days))[0],
+            log.timestamp < day_bounds(max(days))[1],
+        )
+        .subquery()
+    )
+    rows = db.execute(
+        select(ranked.c.id, ranked.c.student_id, ranked.c.timestamp, ranked.c.status, ranked.c.note, ranked.c.is_marker)
+        .where(ranked.c.rn == 1)
+    )
+    cell_logs = {}
+    for log_id, student_id, timestamp, status, note, marker in rows:
+        key = (student_id, timestamp.date())
+        if key in cells:
+            cell_logs.setdefault(key, {"check_in": None, "marker": None})
+            cell_logs[key]["marker" if marker else "check_in"] = (log_id, timestamp, status, note)
+    return cell_logs
+
+
+def _archived_cells(db: Session, cells: set) -> dict:
+    """{(student_id, ngày): (id, status, check_in_time, note)} của các ô đã lưu trữ."""
+    summary = models.AttendanceDailySummary
+    days = [day for _, day in cells]
+    rows = db.execute(
+        select(summary.id, summary.student_id, summary.class_date, summary.status, summary.check_in_time, summary.note)
+        .where(
+            summary.student_id.in_({student_id for student_id, _ in cells}),
+            summary.class_date >= min(days),
+            summary.class_date <= max(days),
+        )
+    )
+    return {
+        (student_id, class_date): (summary_id, status, check_in_time, note)
+        for summary_id, student_id, class_date, status, check_in_time, note in rows
+        if (student_id, class_date) in cells
+    }
+
+
+def apply_edits(db: Session, classroom_id: int, edits: List[dict]) -> List[Tuple[int, date]]:
+    """
+    Áp các sửa đổi {student_id, class_date, note, status} (note/status None = giữ nguyên) của một lớp
+    và commit. Sửa cùng một ô nhiều lần thì lần cuối được áp. Trả về các ô đã sửa.
+    """
+    edits = {(e["student_id"], e["class_date"]): e for e in edits}
+    cell_logs = _cell_logs(db, set(edits))
+    archived = _archived_cells(db, set(edits))
+
+    log_updates, summary_updates, inserts = [], [], []
+    for (student_id, day), edit in edits.items():
+        logs = cell_logs.get((student_id, day))
+        if logs is None and (student_id, day) in archived:
+            summary_id, status, check_in_time, note = archived[(student_id, day)]
+            if edit["status"] == ABSENT:
+                status = ABSENT
+            elif edit["status"] == PRESENT:
+                status = PRESENT
+                if not rollups.is_on_time(check_in_time):
+                    check_in_time = day_bounds(day)[0]
+            summary_updates.append({
+                "summary_id": summary_id,
+                "new_status": status,
+                "new_check_in_time": check_in_time,
+                "new_note": edit["note"] if edit["note"] is not None else note,
+            })
+            continue
+
+        check_in, marker = (logs["check_in"], logs["marker"]) if logs else (None, None)
+        if marker is not None and marker[3] is not None:
+            current_note = marker[3]
+        else:
+            current_note = check_in[3] if check_in else None
+        note = edit["note"] if edit["note"] is not None else current_note
+
+        if marker is not None:
+            # Dòng đánh dấu lúc 0h: PRESENT biến nó thành lượt đúng giờ, ABSENT giữ nó là dòng đánh dấu vắng.
+            status = edit["status"] or marker[2]
+            log_updates.append({"log_id": marker[0], "log_timestamp": marker[1], "new_status": status, "new_note": note})
+        elif edit["status"] == ABSENT:
+            inserts.append({"student_id": student_id, "timestamp": day_bounds(day)[0], "status": ABSENT, "note": note})
+        elif edit["status"] == PRESENT and (check_in is None or not rollups.is_on_time(check_in[1])):
+            inserts.append({"student_id": student_id, "timestamp": day_bounds(day)[0], "status": PRESENT, "note": note})
+        elif check_in is not None:
+            if edit["note"] is not None:
+                log_updates.append({"log_id": check_in[0], "log_timestamp": check_in[1], "new_status": check_in[2], "new_note": note})
+        elif note:
+            # Ghi chú cho ô vắng: dòng NOTE không phải lượt điểm danh, ô vẫn vắng.
+            inserts.append({"student_id": student_id, "timestamp": day_bounds(day)[0], "status": NOTE, "note": note})
+
+    if log_updates:
+        # Kèm timestamp để Postgres chỉ cập nhật trong partition chứa dòng đó.
+        table = models.AttendanceLog.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("log_id"), table.c.timestamp == bindparam("log_timestamp"))
+            .values(status=bindparam("new_status"), note=bindparam("new_note")),
+            log_updates,
+        )
+    if summary_updates:
+        table = models.AttendanceDailySummary.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("summary_id"))
+            .values(
+                status=bindparam("new_status"),
+                check_in_time=bindparam("new_check_in_time"),
+                note=bindparam("new_note"),
+            ),
+            summary_updates,
+        )
+    if inserts:
+        db.execute(insert(models.AttendanceLog).values(inserts))
+
+    change_tracking.mark_changed(db, [change_tracking.classroom_scope(classroom_id)])
+    rollups.refresh_weeks(db, classroom_id, {day for _, day in edits})
+    db.commit()
+    return list(edits)
@@ -0,0 +1,225 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import embedding_store
+
+FACENET_INPUT_SIZE = (160, 160)
+
+# Ngưỡng khoảng cách cosine DeepFace công bố cho từng model; embedding của các model
+# có phân bố khác nhau nên đổi model thì phải đổi ngưỡng theo.
+DEEPFACE_COSINE_THRESHOLDS = {
+    "VGG-Face": 0.68,
+    "Facenet": 0.40,
+    "Facenet512": 0.30,
+    "ArcFace": 0.68,
+    "Dlib": 0.07,
+    "SFace": 0.593,
+    "OpenFace": 0.10,
+    "DeepFace": 0.23,
+    "DeepID": 0.015,
+    "GhostFaceNet": 0.65,
+}
+
+
+class InferenceBackend:
+    """Giao diện chung cho phát hiện khuôn mặt và tính embedding."""
+
+    name = "base"
+    # Gắn vào các phiên bản embedding đã publish; đổi model thì phải tính lại gallery.
+    model_version = "base"
+    distance_threshold = DEEPFACE_COSINE_THRESHOLDS["Facenet"]
+
+    def warm_up(self):
+        pass
+
+    def detect(self, img: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed(self, face_img: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_reference(self, path: str) -> np.ndarray:
+        img = cv2.imread(path)
+        if img is None:
+            raise ValueError(f"Không đọc được ảnh tham chiếu: {path}")
+        return self.embed(self.detect(img))
+
+
+def facenet_input(face_img: np.ndarray, target_size=FACENET_INPUT_SIZE) -> np.ndarray:
+    """
+    Tiền xử lý mặc định của DeepFace.represent (normalization="base"): ảnh BGR đổi sang RGB,
+    thu nhỏ giữ tỉ lệ rồi đệm 0 cho đủ kích thước, chia 255. Không trừ trung bình/chia độ lệch
+    chuẩn, nên backend ONNX dùng được ngưỡng DeepFace công bố cho Facenet.
+    """
+    rgb = face_img[:, :, ::-1]
+    height, width = target_size
+    factor = min(height / rgb.shape[0], width / rgb.shape[1])
+    resized = cv2.resize(rgb, (max(1, int(rgb.shape[1] * factor)), max(1, int(rgb.shape[0] * factor))))
+    pad_h, pad_w = height - resized.shape[0], width - resized.shape[1]
+    padded = np.pad(
+        resized,
+        ((pad_h // 2, pad_h - pad_h // 2), (pad_w // 2, pad_w - pad_w // 2), (0, 0)),
+        "constant",
+    )
+    if padded.shape[:2] != (height, width):
+        padded = cv2.resize(padded, (width, height))
+    padded = padded.astype(np.float32)
+    if padded.max() > 1:
+        padded /= 255.0
+    return padded
+
+
+def _largest_box_crop(img: np.ndarray, boxes) -> np.ndarray:
+    if len(boxes) == 0:
+        return img
+    x, y, w, h = max(boxes, key=lambda b: b[2] * b[3])
+    x, y = max(0, int(x)), max(0, int(y))
+    crop = img[y:y + int(h), x:x + int(w)]
+    return crop if crop.size else img
+
+
+class DeepFaceBackend(InferenceBackend):
+    name = "deepface"
+
+    def __init__(self, model_name: str = "Facenet", detector_backend: str = "opencv"):
+        if model_name not in DEEPFACE_COSINE_THRESHOLDS:
+            raise ValueError(
+                f"Model DeepFace không hợp lệ: {model_name} (hỗ trợ: {', '.join(DEEPFACE_COSINE_THRESHOLDS)})"
+            )
+        self.model_name = model_name
+        self.distance_threshold = DEEPFACE_COSINE_THRESHOLDS[model_name]
+        self.detector_backend = detector_backend
+        # "-aligned": embedding cũ (ảnh tham chiếu căn chỉnh, ảnh chụp không) không được dùng lại.
+        self.model_version = f"{model_name}/deepface-aligned"
+
+    def warm_up(self):
+        from deepface import DeepFace
+
+        DeepFace.build_model(self.model_name)
+
+    def detect(self, img: np.ndarray) -> np.ndarray:
+        from deepface import DeepFace
+
+        # Căn chỉnh theo mắt như DeepFace.find trước đây; ảnh tham chiếu cũng đi qua hàm này
+        # (InferenceBackend.embed_reference) nên gallery và ảnh chụp được xử lý giống hệt nhau.
+        faces = DeepFace.extract_faces(
+            img_path=img,
+            detector_backend=self.detector_backend,
+            enforce_detection=False,
+            align=True,
+        )
+        if not faces:
+            return img
+        largest = max(faces, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
+        # extract_faces trả về ảnh RGB dạng float trong [0, 1]; embed() nhận ảnh BGR uint8 như cv2.
+        face = np.clip(np.asarray(largest["face"]) * 255.0, 0, 255).astype(np.uint8)
+        return face[:, :, ::-1] if face.size else img
+
+    def embed(self, face_img: np.ndarray) -> np.ndarray:
+        from deepface import DeepFace
+
+        # normalization để mặc định ("base"); OnnxFacenetBackend lặp lại đúng bước này (facenet_input).
+        result = DeepFace.represent(
+            img_path=face_img,
+            model_name=self.model_name,
+            detector_backend="skip",
+            enforce_detection=False,
+        )
+        return np.asarray(result[0]["embedding"], dtype=np.float32)
+
+
+class OnnxFacenetBackend(InferenceBackend):
+    """
+    Facenet chạy bằng ONNX Runtime trên CPU (model xuất bằng onnx_export.py, có thể đã
+    lượng tử hoá int8). Phát hiện khuôn mặt dùng Haar cascade của OpenCV, cùng thuật toán
+    với detector "opencv" của DeepFace, nên không cần nạp TensorFlow. Ảnh đầu vào được tiền xử
+    lý giống DeepFaceBackend (facenet_input) nên dùng chung ngưỡng Facenet; độ lệch embedding so
+    với DeepFace đo bằng ``python -m benchmarks.backends --parity``.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        # "-base": embedding cũ (chuẩn hoá theo từng ảnh, lệch với DeepFace) không được dùng lại.
+        self.model_version = f"Facenet/onnx-base/{os.path.basename(model_path)}"
+        self._cascades = threading.local()
+
+    def _cascade(self):
+        cascade = getattr(self._cascades, "cascade", None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            self._cascades.cascade = cascade
+        return cascade
+
+    def detect(self, img: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        boxes = self._cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=10)
+        return _largest_box_crop(img, boxes)
+
+    def embed(self, face_img: np.ndarray) -> np.ndarray:
+        output = self.session.run(None, {self.input_name: facenet_input(face_img)[np.newaxis, ...]})[0]
+        return np.asarray(output[0], dtype=np.float32)
+
+
+_backends = {}
+_lock = threading.Lock()
+
+
+def create_backend(spec: str, intra_op_threads: int = 0, inter_op_threads: int = 0) -> InferenceBackend:
+    """
+    spec: "deepface" (Facenet), "deepface:<model_name>" (vd. "deepface:ArcFace") hoặc
+    "onnx:<đường dẫn model .onnx>". Spec sai hoặc model không nạp được báo ValueError.
+    """
+    if spec == "deepface":
+        return DeepFaceBackend()
+    if spec.startswith("deepface:"):
+        return DeepFaceBackend(spec[len("deepface:"):])
+    if spec.startswith("onnx:"):
+        model_path = spec[len("onnx:"):]
+        if not os.path.isfile(model_path):
+            raise ValueError(f"Không tìm thấy model ONNX: {model_path}")
+        try:
+            return OnnxFacenetBackend(model_path, intra_op_threads, inter_op_threads)
+        except Exception as e:
+            raise ValueError(f"Không nạp được model ONNX {model_path}: {e}") from e
+    raise ValueError(f"Backend nhận dạng không hợp lệ: {spec}")
+
+
+def backend_for(spec: str) -> InferenceBackend:
+    backend = _backends.get(spec)
+    if backend is None:
+        with _lock:
+            backend = _backends.get(spec)
+            if backend is None:
+                backend = create_backend(
+                    spec,
+                    int(os.getenv("INFERENCE_INTRA_OP_THREADS", "0")),
+                    int(os.getenv("INFERENCE_INTER_OP_THREADS", "0")),
+                )
+                _backends[spec] = backend
+    return backend
+
+
+def active_spec() -> str:
+    # Sau khi job tính lại embedding (reindex.py) hoàn tất, ACTIVE_BACKEND ghi đè biến môi trường
+    # để mọi worker cùng chuyển sang model mới một lúc.
+    active = embedding_store.active_backend()
+    return active["spec"] if active else os.getenv("INFERENCE_BACKEND", "deepface")
+
+
+def get_backend() -> InferenceBackend:
+    return backend_for(active_spec())
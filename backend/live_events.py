@@ -0,0 +1,98 @@
+import json
+import asyncio
+import threading
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Optional
+
+# Pub/sub trong tiến trình cho bảng điểm danh trực tiếp (SSE). Mỗi sự kiện chỉ được
+# mã hoá một lần rồi đẩy vào hàng đợi của từng subscriber trên event loop, nên số người
+# xem không làm tăng số truy vấn DB. Chỉ subscriber cùng worker với request ghi mới nhận
+# được sự kiện; client luôn có thể tải lại bảng khi nhận "resync".
+QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+
+
+def encode_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n".encode("utf-8")
+
+
+RESYNC = encode_event("resync", {})
+
+
+class Subscription:
+    def __init__(self, classroom_id: int):
+        self.classroom_id = classroom_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, classroom_id: int) -> Subscription:
+        subscription = Subscription(classroom_id)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers[classroom_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.classroom_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.classroom_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, classroom_id: int, event: str, data: dict):
+        """Gọi được từ cả threadpool của endpoint sync lẫn event loop."""
+        with self._lock:
+            if classroom_id not in self._subscribers or self._loop is None:
+                return
+            loop = self._loop
+        payload = encode_event(event, data)
+        try:
+            loop.call_soon_threadsafe(self._deliver, classroom_id, payload)
+        except RuntimeError:
+            # Event loop đã đóng (đang tắt server).
+            pass
+
+    def _deliver(self, classroom_id: int, payload: bytes):
+        with self._lock:
+            subscribers = list(self._subscribers.get(classroom_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Client quá chậm: bỏ các sự kiện còn lại, báo client tải lại cả bảng.
+                subscription.overflowed = True
+
+    async def stream(self, subscription: Subscription, is_disconnected: Callable) -> AsyncIterator[bytes]:
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            while not await is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if subscription.overflowed:
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.overflowed = False
+                    yield RESYNC
+                    continue
+                yield payload
+        finally:
+            self.unsubscribe(subscription)
+
+
+broker = Broker()
@@ -2,29 +2,44 @@ import os
 import shutil
 from pathlib import Path
 from datetime import datetime, timedelta, date
-from typing import List, Optional  
+from typing import List, Literal, Optional, Tuple  
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status, Form 
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status, Form, Response, BackgroundTasks, Request, Query 
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Date
 
 from pydantic import BaseModel
-from deepface import DeepFace
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer 
 
 import uuid
+import threading
 import requests
 import logging
 import models
 import database
 import security
+import face_quality
+import metrics
+import profiling
+import change_tracking
+import attendance_partitions
+import exports
+import recognition
+import gallery_cache
+import cascade_deletes
+import reindex
+import inference_backends
+import live_events
+import offline_sync
+import rollups
+import grid_edits
 from models import Base, Teacher, Classroom, Student, AttendanceLog 
-from database import get_db, SessionLocal, engine
-
-from google import generativeai as genai
+from database import get_db, get_read_db, SessionLocal, engine, read_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,6 +54,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+metrics.install(app)
+metrics.collector.register_engine("primary", engine)
+if read_engine is not engine:
+    metrics.collector.register_engine("replica", read_engine)
+app.add_middleware(profiling.ProfilingMiddleware)
+profiling.sql_listeners.add_engine(engine)
+if read_engine is not engine:
+    profiling.sql_listeners.add_engine(read_engine)
 
 IMAGE_DB_PATH = Path("database/images")
 IMAGE_DB_PATH.mkdir(parents=True, exist_ok=True)
@@ -132,6 +155,7 @@ class DailyStatusLog(BaseModel):
 class StudentDetailsResponse(BaseModel):
     student_info: StudentResponse
     daily_logs: List[DailyStatusLog]
+    next_cursor: Optional[date] = None
         
 class PasswordConfirmationRequest(BaseModel):
     password: str
@@ -164,6 +188,24 @@ class NoteUpdateRequest(BaseModel):
     student_id: int
     class_date: date
     note: str
+
+class GridCellEdit(BaseModel):
+    student_id: int
+    class_date: date
+    note: Optional[str] = None
+    status: Optional[Literal["PRESENT", "ABSENT"]] = None
+
+class GridEditRequest(BaseModel):
+    classroom_id: Optional[int] = None
+    edits: List[GridCellEdit]
+
+class GridCellUpdate(BaseModel):
+    student_id: int
+    class_date: date
+    cell: GridCell
+
+class GridEditResponse(BaseModel):
+    cells: List[GridCellUpdate]
     
 class AdminClassroomCreate(BaseModel):
     name: str
@@ -172,27 +214,77 @@ class AdminTeacherCreate(BaseModel):
     username: str
     password: str
     classroom_id: int
+
+class StationCheckInEvent(BaseModel):
+    client_event_id: str
+    student_code: str
+    captured_at: datetime
+
+class StationSyncRequest(BaseModel):
+    station_id: str
+    classroom_id: int
+    events: List[StationCheckInEvent]
+
+class WeeklyOverviewRow(BaseModel):
+    classroom_id: int
+    classroom_name: str
+    week_start: date
+    session_count: int
+    student_count: int
+    on_time_count: int
+    late_count: int
+    absent_count: int
+    present_rate: float
+    on_time_rate: float
+    late_rate: float
+    absent_rate: float
+
+class ReindexRequest(BaseModel):
+    backend: str
+    resume: bool = True
     
-def generate_daily_status_logs(student: models.Student, db: Session) -> List[dict]:
-    schedules = db.query(models.Schedule)\
-                  .filter(models.Schedule.classroom_id == student.classroom_id)\
-                  .order_by(models.Schedule.class_date.desc())\
-                  .all()
-    
-    first_log_per_day = {}
-    for log in sorted(student.attendance_logs, key=lambda x: x.timestamp):
-        log_date = log.timestamp.date()
-        if log_date not in first_log_per_day:
-            first_log_per_day[log_date] = log
+DAILY_LOG_PAGE_SIZE = 30
+MAX_DAILY_LOG_PAGE_SIZE = 200
+
+def generate_daily_status_logs(
+    student: models.Student,
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[date] = None,
+    limit: int = DAILY_LOG_PAGE_SIZE,
+) -> Tuple[List[dict], Optional[date]]:
+    """
+    Một trang lịch sử điểm danh của sinh viên, buổi mới nhất trước. `cursor` là ngày cuối của
+    trang trước (keyset), nên mỗi trang chỉ đọc `limit` buổi học và log của đúng các ngày đó.
+    Trả về (các buổi, cursor của trang sau hoặc None nếu hết).
+    """
+    query = db.query(models.Schedule.class_date).filter(models.Schedule.classroom_id == student.classroom_id)
+    if start_date:
+        query = query.filter(models.Schedule.class_date >= start_date)
+    if end_date:
+        query = query.filter(models.Schedule.class_date <= end_date)
+    if cursor:
+        query = query.filter(models.Schedule.class_date < cursor)
+    class_dates = [d for (d,) in query.order_by(models.Schedule.class_date.desc()).limit(limit + 1)]
+
+    next_cursor = None
+    if len(class_dates) > limit:
+        class_dates = class_dates[:limit]
+        next_cursor = class_dates[-1]
+    if not class_dates:
+        return [], None
+
+    first_checkins = attendance_partitions.load_first_checkins(
+        db, [student.id], class_dates[-1], class_dates[0]
+    )
 
     daily_statuses = []
-    for schedule in schedules:
-        class_date = schedule.class_date
-        
-        log_entry = first_log_per_day.get(class_date)
+    for class_date in class_dates:
+        log_entry = first_checkins.get((student.id, class_date))
         
         if log_entry:
-            log_timestamp = log_entry.timestamp
+            log_timestamp, _ = log_entry
             on_time_threshold = log_timestamp.replace(hour=8, minute=5, second=0)
             status = "LATE" if log_timestamp > on_time_threshold else "PRESENT"
             check_in_time = log_timestamp.strftime('%H:%M:%S')
@@ -206,7 +298,7 @@ def generate_daily_status_logs(student: models.Student, db: Session) -> List[dic
             "check_in_time": check_in_time
         })
         
-    return daily_statuses
+    return daily_statuses, next_cursor
 
 
 def get_current_teacher(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -283,103 +375,13 @@ async def get_current_active_user(token: str = Depends(oauth2_scheme), db: Sessi
 
 @app.on_event("startup")
 def on_startup():
-    print("Application startup...")
-    Base.metadata.create_all(bind=engine)
-    print("Database tables checked/created.")
-
-    db = SessionLocal()
-    try:
-        admin_username = "admin"
-        if not db.query(models.Admin).filter(models.Admin.username == admin_username).first():
-            hashed_pass = security.hash_password("1")
-            new_admin = models.Admin(username=admin_username, hashed_password=hashed_pass)
-            db.add(new_admin)
-            print(f"Tạo tài khoản System Admin '{admin_username}' thành công!")
-
-        classroom_id_to_check = 1
-        classroom_name = f"Trạm Điểm Danh #{classroom_id_to_check}"
-        classroom = db.query(Classroom).filter(Classroom.id == classroom_id_to_check).first()
-        if not classroom:
-            classroom = Classroom(id=classroom_id_to_check, name=classroom_name)
-            db.add(classroom)
-            db.flush()
-            print(f"Tạo lớp học/trạm mặc định '{classroom_name}' với ID={classroom.id} thành công!")
-        
-        teacher_username = "teacher01"
-        if not db.query(Teacher).filter(Teacher.username == teacher_username).first():
-            hashed_pass = security.hash_password("1")
-            new_teacher = Teacher(
-                username=teacher_username,
-                hashed_password=hashed_pass,
-                classroom_id=classroom.id
-            )
-            db.add(new_teacher)
-            print(f"Tạo tài khoản Teacher '{teacher_username}' (pass: '1') và gán vào lớp '{classroom.name}' thành công!")
-
-        student_count = db.query(Student).filter(Student.classroom_id == classroom.id).count()
-        if student_count == 0:
-            print("Lớp học trống, tạo dữ liệu mẫu thực tế...")
-            
-            import random
-            import string
-
-            student_names = list(string.ascii_uppercase)
-            created_students = []
-            for i, name in enumerate(student_names):
-                new_student = Student(
-                    name=name,
-                    student_code=f"ID{1001 + i}",
-                    reference_image_path="placeholder.jpg",
-                    classroom_id=classroom.id
-                )
-                db.add(new_student)
-                created_students.append(new_student)
-            
-            db.flush() 
-            print(f"Đã tạo {len(created_students)} sinh viên mẫu (A-Z).")
-
-            today = (datetime.utcnow() + timedelta(hours=7)).date() 
-            scheduled_dates = []
-            for i in range(15 * 7): 
-                current_date = today - timedelta(days=i)
-                if current_date.weekday() == 2:
-                    scheduled_dates.append(current_date)
-                if len(scheduled_dates) >= 15:
-                    break
-            
-            for class_date in scheduled_dates:
-                db.add(models.Schedule(class_date=class_date, classroom_id=classroom.id))
-            
-            logger.info(f"Đã tạo lịch học cho {len(scheduled_dates)} buổi vào các ngày thứ Tư.")
-            
-            for class_date in scheduled_dates:
-                for student in created_students:
-                    rand_num = random.random()
-                    if rand_num < 0.6:
-                        hour, minute = 7, random.randint(30, 59)
-                        base_time = datetime.combine(class_date, datetime.min.time())
-                        check_in_time = base_time.replace(hour=hour, minute=minute)
-                        db.add(AttendanceLog(student_id=student.id, timestamp=check_in_time))
-                    elif rand_num < 0.8: 
-                        hour, minute = 8, random.randint(6, 59)
-                        base_time = datetime.combine(class_date, datetime.min.time())
-                        check_in_time = base_time.replace(hour=hour, minute=minute)
-                        db.add(AttendanceLog(student_id=student.id, timestamp=check_in_time, note="Đi muộn"))
-
-            
-            db.commit()
-            logger.info("Đã tạo dữ liệu điểm danh ngẫu nhiên theo tỷ lệ mới (60-20-20).")
-
-        db.commit()
-        logger.info("Initial data seeding complete.")
-        
-    except Exception as e:
-        logger.error(f"Lỗi trong quá trình khởi tạo dữ liệu: {e}")
-        db.rollback() 
-    
-    finally:
-        db.close() 
-        print("Database session closed.")
+    # Bảng và dữ liệu mặc định được tạo bằng `python seed.py`, không làm lúc khởi động.
+    if os.getenv("PRELOAD_RECOGNITION") == "1":
+        threading.Thread(target=recognition.warm_up, name="recognition-warm-up", daemon=True).start()
+    attendance_partitions.start_maintainer()
+    gallery_cache.start_preloader(
+        lambda classroom_id: recognition.preload_gallery(classroom_id, str(IMAGE_DB_PATH / str(classroom_id)))
+    )
 
 @app.get("/")
 def read_root():
@@ -428,12 +430,25 @@ def login_admin(request: AdminLoginRequest, db: Session = Depends(get_db)):
     return {"access_token": token, "token_type": "bearer", "user": {"username": admin.username}}
 
 @app.get("/api/students", response_model=List[StudentResponse])
-def get_all_students(current_teacher: models.Teacher = Depends(get_current_teacher), db: Session = Depends(get_db)):
+def get_all_students(request: Request, response: Response, current_teacher: models.Teacher = Depends(get_current_teacher), db: Session = Depends(get_db)):
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(current_teacher.classroom_id))
+    if cached:
+        return cached
     students = db.query(models.Student).filter(models.Student.classroom_id == current_teacher.classroom_id).all()
     return students
 
+def publish_classroom_gallery(classroom_id: int):
+    try:
+        folder = str(IMAGE_DB_PATH / str(classroom_id))
+        version = recognition.publish_gallery(classroom_id, folder)
+        reindex.publish_pending(classroom_id, folder)
+        logger.info(f"Đã cập nhật embedding lớp {classroom_id} lên phiên bản {version}.")
+    except Exception as e:
+        logger.error(f"Lỗi khi cập nhật embedding lớp {classroom_id}: {e}")
+
 @app.post("/api/students", status_code=status.HTTP_201_CREATED, response_model=StudentResponse)
 def register_student(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     student_code: str = Form(...),
     file: UploadFile = File(...),
@@ -461,27 +476,29 @@ def register_student(
     db.add(new_student)
     db.commit()
     db.refresh(new_student)
+    background_tasks.add_task(publish_classroom_gallery, classroom_id)
     return new_student
 
 @app.delete("/api/students/{student_code}", status_code=status.HTTP_200_OK)
 def delete_student(
     student_code: str, 
+    background_tasks: BackgroundTasks,
     current_teacher: models.Teacher = Depends(get_current_teacher), 
     db: Session = Depends(get_db)
 ):
-    db_student = db.query(models.Student).filter_by(
+    classroom_id = current_teacher.classroom_id
+    student_id = db.query(models.Student.id).filter_by(
         student_code=student_code,
-        classroom_id=current_teacher.classroom_id
-    ).first()
+        classroom_id=classroom_id
+    ).scalar()
 
-    if not db_student:
+    if student_id is None:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên trong lớp này.")
 
-    if db_student.reference_image_path and os.path.exists(db_student.reference_image_path):
-        os.remove(db_student.reference_image_path)
-
-    db.delete(db_student)
+    image_paths = cascade_deletes.delete_students(db, classroom_id, [student_id])
     db.commit()
+    background_tasks.add_task(cascade_deletes.remove_files, image_paths, IMAGE_DB_PATH)
+    background_tasks.add_task(publish_classroom_gallery, classroom_id)
     return {"message": f"Sinh viên có mã {student_code} đã được xóa thành công."}
 
 def _record_attendance_logic(student_code: str, classroom_id: int, db: Session):
@@ -490,9 +507,16 @@ def _record_attendance_logic(student_code: str, classroom_id: int, db: Session):
         return None 
 
     system_time = datetime.utcnow() + timedelta(hours=7)
-    latest_log = db.query(models.AttendanceLog)\
-                     .filter(models.AttendanceLog.student_id == student.id)\
-                     .order_by(models.AttendanceLog.timestamp.desc()).first()
+    day_start = datetime.combine(system_time.date(), datetime.min.time())
+    # Xét từ đầu ngày (hoặc 10 phút trước nếu vừa qua nửa đêm): cùng một truy vấn vừa chống ghi trùng,
+    # vừa cho biết đây có phải lượt đầu tiên trong ngày không và ô có bị giáo viên đánh dấu không,
+    # mà Postgres vẫn chỉ chạm partition tháng hiện tại.
+    recent_logs = db.query(models.AttendanceLog)\
+                     .filter(models.AttendanceLog.student_id == student.id,
+                             models.AttendanceLog.timestamp >= min(day_start, system_time - timedelta(minutes=10)))\
+                     .order_by(models.AttendanceLog.timestamp.desc()).all()
+    latest_log = next((log for log in recent_logs if log.status not in models.MARKER_STATUSES), None)
+    marker = next((log for log in recent_logs if log.status in models.MARKER_STATUSES and log.timestamp >= day_start), None)
 
     if latest_log and (system_time - latest_log.timestamp < timedelta(minutes=10)):
         return {
@@ -503,60 +527,93 @@ def _record_attendance_logic(student_code: str, classroom_id: int, db: Session):
 
     new_log = models.AttendanceLog(student_id=student.id, timestamp=system_time) 
     db.add(new_log)
+    # Ô đã bị đánh dấu vắng: vẫn lưu lượt điểm danh nhưng ô không đổi.
+    absent_override = marker is not None and marker.status == models.ATTENDANCE_ABSENT
+    if not absent_override and (latest_log is None or latest_log.timestamp < day_start):
+        rollups.record_first_check_in(db, classroom_id, system_time)
     db.commit()
     db.refresh(new_log)
+    if not absent_override:
+        publish_check_in(classroom_id, new_log.student_id, new_log.timestamp, marker.note if marker else None)
     return {
         "status": "RECORDED",
         "message": "Điểm danh thành công.",
         "log": new_log
     }
 
+@app.post("/api/stations/sync")
+def sync_station_check_ins(
+    request: StationSyncRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Nhận hàng loạt lượt điểm danh trạm đã lưu tạm khi mất mạng. Gửi lại cùng client_event_id
+    không ghi trùng; lượt cách lượt khác của cùng sinh viên dưới 10 phút bị bỏ qua (SKIPPED), lượt chụp
+    cũ hơn offline_sync.MAX_OFFLINE_AGE bị từ chối (INVALID_TIME).
+    Trạm đăng nhập bằng tài khoản giáo viên nên chỉ đồng bộ được cho lớp của giáo viên đó (admin: mọi lớp).
+    """
+    if isinstance(current_user, models.Teacher) and current_user.classroom_id != request.classroom_id:
+        raise HTTPException(status_code=403, detail="Trạm chỉ được đồng bộ điểm danh cho lớp của giáo viên đã đăng nhập.")
+    if len(request.events) > offline_sync.MAX_EVENTS:
+        raise HTTPException(status_code=413, detail=f"Mỗi lần đồng bộ tối đa {offline_sync.MAX_EVENTS} sự kiện.")
+    if not request.events:
+        return {"results": [], "counts": {}}
+    if db.get(models.Classroom, request.classroom_id) is None:
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy lớp học (ID: {request.classroom_id}).")
+
+    result = offline_sync.sync_check_ins(
+        db, request.station_id, request.classroom_id, [e.model_dump() for e in request.events]
+    )
+    # Đọc lại các ô như bảng điểm danh, để ô bị đánh dấu vắng hay có ghi chú hiển thị đúng.
+    cells = sorted({(row["student_id"], row["timestamp"].date()) for row in result.pop("recorded")})
+    if cells:
+        publish_cells(request.classroom_id, load_grid_cells(db, cells))
+    return result
+
 @app.post("/api/recognize")
 def recognize_face(
     classroom_id: int = Form(...), 
     file: UploadFile = File(...), 
+    landmarks: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
-    temp_dir = Path("temp")
-    temp_dir.mkdir(exist_ok=True)
-
-    # --- BẮT ĐẦU THAY ĐỔI ---
-    # Tạo tên file duy nhất để tránh xung đột
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    temp_file_path = temp_dir / unique_filename
-    # --- KẾT THÚC THAY ĐỔI ---
-
-    with open(temp_file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
     specific_db_path = str(IMAGE_DB_PATH / str(classroom_id))
 
     if not os.path.exists(specific_db_path) or not os.listdir(specific_db_path):
         raise HTTPException(status_code=404, detail=f"Trạm điểm danh (ID: {classroom_id}) chưa có dữ liệu sinh viên.")
 
+    with metrics.stage("upload_read"):
+        data = file.file.read()
+    with metrics.stage("decode"):
+        img = face_quality.decode_image(data)
+
+    # Lọc nhanh ảnh kém chất lượng (nhỏ, mờ, tối, nghiêng) trước khi chạy Facenet.
+    with metrics.stage("quality_gate"):
+        quality = face_quality.assess_face_quality(img, face_quality.parse_landmarks(landmarks))
+    if not quality.ok:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=quality.to_detail())
+
     try:
-        dfs = DeepFace.find(
-            img_path=str(temp_file_path),
-            db_path=specific_db_path, 
-            model_name='Facenet',
-            distance_metric='cosine',
-            enforce_detection=False,
-            silent=True
-        )
-        if not dfs or dfs[0].empty:
+        backend = recognition.active_backend()
+        with metrics.stage("detection"):
+            face_img = recognition.detect_face(img, backend)
+        with metrics.stage("embedding"):
+            embedding = recognition.embed_face(face_img, backend)
+        with metrics.stage("matching"):
+            match = recognition.find_best_match(classroom_id, specific_db_path, embedding, backend)
+        if match is None:
             raise HTTPException(status_code=404, detail="Không tìm thấy khuôn mặt nào khớp trong cơ sở dữ liệu.")
 
-        best_match = dfs[0].iloc[0]
-        identity_path = Path(best_match['identity'])
-        student_code = identity_path.stem.split('_')[0]
-        
-        student = db.query(models.Student).filter_by(student_code=student_code, classroom_id=classroom_id).first()
+        student_code, _ = match
+        with metrics.stage("db_lookup"):
+            student = db.query(models.Student).filter_by(student_code=student_code, classroom_id=classroom_id).first()
 
         if not student:
             raise HTTPException(status_code=404, detail="Sinh viên được nhận dạng nhưng không có trong CSDL của lớp.")
         
-        attendance_result = _record_attendance_logic(student.student_code, student.classroom_id, db)
+        with metrics.stage("attendance_write"):
+            attendance_result = _record_attendance_logic(student.student_code, student.classroom_id, db)
         
         response_data = {
             "student_name": student.name, 
@@ -577,12 +634,8 @@ def recognize_face(
     except Exception as e:
         logger.error(f"Lỗi không xác định trong quá trình nhận dạng: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Lỗi hệ thống trong quá trình nhận dạng: {str(e)}")
-    finally:
-        # Dọn dẹp file tạm
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
 
-async def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _admin_from_token(token: str, db: Session):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate admin credentials")
     try:
         payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
@@ -597,12 +650,25 @@ async def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = D
         raise credentials_exception
     return admin
 
+async def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return _admin_from_token(token, db)
+
+def get_current_report_admin(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
+    """
+    Như get_current_admin nhưng tra tài khoản trên cùng session đọc của endpoint báo cáo, nên
+    request không cần connection tới primary. Tài khoản admin gần như không đổi nên bản sao trễ
+    vài giây không ảnh hưởng. Giáo viên vẫn xác thực trên primary (get_current_teacher):
+    current_session_id đổi ở mỗi lần đăng nhập, bản sao trễ sẽ từ chối token vừa cấp.
+    """
+    return _admin_from_token(token, db)
+
 @app.post("/api/admin/analyze-attendance")
-def analyze_with_gemini(request: GeminiAnalysisRequest, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+def analyze_with_gemini(request: GeminiAnalysisRequest, db: Session = Depends(get_read_db), admin: models.Admin = Depends(get_current_report_admin)):
     logs = (
         db.query(models.AttendanceLog)
         .join(models.Student)
-        .filter(models.Student.classroom_id == request.classroom_id)
+        .filter(models.Student.classroom_id == request.classroom_id,
+                attendance_partitions.is_check_in(models.AttendanceLog.status))
         .order_by(models.AttendanceLog.timestamp.asc())
         .all()
     )
@@ -628,6 +694,8 @@ def analyze_with_gemini(request: GeminiAnalysisRequest, db: Session = Depends(ge
     )
 
     try:
+        from google import generativeai as genai
+
         genai.configure(api_key=request.api_key)
 
         model = genai.GenerativeModel('gemini-1.5-flash-latest')
@@ -645,12 +713,11 @@ def analyze_with_gemini(request: GeminiAnalysisRequest, db: Session = Depends(ge
         raise HTTPException(status_code=500, detail=f"Lỗi khi kết nối đến Gemini AI: {error_message}")
     
 @app.delete("/api/admin/classrooms/{classroom_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_classroom(classroom_id: int, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
-    db_classroom = db.query(models.Classroom).filter(models.Classroom.id == classroom_id).first()
-    if not db_classroom:
+def delete_classroom(classroom_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+    if not cascade_deletes.delete_classroom(db, classroom_id):
         raise HTTPException(status_code=404, detail="Lớp học không tồn tại.")
-    db.delete(db_classroom)
     db.commit()
+    background_tasks.add_task(cascade_deletes.remove_classroom_files, classroom_id, IMAGE_DB_PATH / str(classroom_id))
     return
 
 @app.delete("/api/admin/teachers/{teacher_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -670,16 +737,20 @@ def generate_attendance_summary(classroom_id: int, db: Session) -> List[dict]:
         return []
 
     students = db.query(models.Student).filter(models.Student.classroom_id == classroom_id).all()
+    scheduled_dates = [s.class_date for s in schedules]
+    first_checkins = attendance_partitions.load_first_checkins(
+        db, [s.id for s in students], min(scheduled_dates), max(scheduled_dates)
+    )
     
     summary_list = []
     for student in students:
         on_time_count = 0
         late_count = 0
-        logs_by_date = {log.timestamp.date(): log.timestamp for log in student.attendance_logs}
 
         for schedule in schedules:
-            log_timestamp = logs_by_date.get(schedule.class_date)
-            if log_timestamp:
+            log_entry = first_checkins.get((student.id, schedule.class_date))
+            if log_entry:
+                log_timestamp, _ = log_entry
                 on_time_threshold = log_timestamp.replace(hour=8, minute=5, second=0)
                 if log_timestamp <= on_time_threshold:
                     on_time_count += 1
@@ -711,31 +782,63 @@ def generate_attendance_summary(classroom_id: int, db: Session) -> List[dict]:
     return summary_list
 
 @app.get("/api/teacher/attendance-summary", response_model=List[AttendanceSummaryResponse]) 
-def get_teacher_attendance_summary(teacher: models.Teacher = Depends(get_current_teacher), db: Session = Depends(get_db)):
+def get_teacher_attendance_summary(request: Request, response: Response, teacher: models.Teacher = Depends(get_current_teacher), db: Session = Depends(get_read_db)):
     if not teacher.classroom_id:
         return []
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(teacher.classroom_id))
+    if cached:
+        return cached
     return generate_attendance_summary(teacher.classroom_id, db)
 
 @app.get("/api/admin/student-attendance-details/{student_id}", response_model=StudentDetailsResponse)
-def get_student_attendance_details(student_id: int, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+def get_student_attendance_details(
+    student_id: int,
+    request: Request,
+    response: Response,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[date] = None,
+    limit: int = Query(DAILY_LOG_PAGE_SIZE, ge=1, le=MAX_DAILY_LOG_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: models.Admin = Depends(get_current_report_admin)
+):
     student = db.query(models.Student).filter(models.Student.id == student_id).first()
     if not student:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên.")
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(student.classroom_id))
+    if cached:
+        return cached
         
-    daily_logs = generate_daily_status_logs(student, db)
-    return {"student_info": student, "daily_logs": daily_logs}
+    daily_logs, next_cursor = generate_daily_status_logs(student, db, start_date, end_date, cursor, limit)
+    return {"student_info": student, "daily_logs": daily_logs, "next_cursor": next_cursor}
 
 @app.get("/api/teacher/student-attendance-details/{student_id}", response_model=StudentDetailsResponse)
-def get_teacher_student_details(student_id: int, teacher: models.Teacher = Depends(get_current_teacher), db: Session = Depends(get_db)):
+def get_teacher_student_details(
+    student_id: int,
+    request: Request,
+    response: Response,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[date] = None,
+    limit: int = Query(DAILY_LOG_PAGE_SIZE, ge=1, le=MAX_DAILY_LOG_PAGE_SIZE),
+    teacher: models.Teacher = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
     student = db.query(models.Student).filter(models.Student.id == student_id, models.Student.classroom_id == teacher.classroom_id).first()
     if not student:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên hoặc sinh viên không thuộc lớp của bạn.")
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(teacher.classroom_id))
+    if cached:
+        return cached
     
-    daily_logs = generate_daily_status_logs(student, db)
-    return {"student_info": student, "daily_logs": daily_logs}
+    daily_logs, next_cursor = generate_daily_status_logs(student, db, start_date, end_date, cursor, limit)
+    return {"student_info": student, "daily_logs": daily_logs, "next_cursor": next_cursor}
 
 @app.get("/api/admin/classrooms/{classroom_id}/students", response_model=List[StudentResponse])
-def get_students_in_classroom_for_admin(classroom_id: int, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+def get_students_in_classroom_for_admin(classroom_id: int, request: Request, response: Response, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(classroom_id))
+    if cached:
+        return cached
     students = db.query(models.Student).filter(models.Student.classroom_id == classroom_id).all()
     return students
 
@@ -760,43 +863,50 @@ def update_student_info_for_admin(student_id: int, student_update: StudentUpdate
     return db_student
 
 @app.delete("/api/admin/students/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_student_for_admin(student_id: int, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
-    db_student = db.query(models.Student).filter(models.Student.id == student_id).first()
-    if not db_student:
+def delete_student_for_admin(student_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+    classroom_id = db.query(models.Student.classroom_id).filter(models.Student.id == student_id).scalar()
+    if classroom_id is None:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên.")
 
-    if db_student.reference_image_path and os.path.exists(db_student.reference_image_path):
-        try:
-            os.remove(db_student.reference_image_path)
-        except OSError as e:
-            print(f"Lỗi khi xóa file ảnh: {e}") 
-
-    db.delete(db_student)
+    image_paths = cascade_deletes.delete_students(db, classroom_id, [student_id])
     db.commit()
+    background_tasks.add_task(cascade_deletes.remove_files, image_paths, IMAGE_DB_PATH)
+    background_tasks.add_task(publish_classroom_gallery, classroom_id)
     return
 
 @app.get("/api/admin/classrooms", response_model=List[ClassroomResponse])
-def get_all_classrooms_for_admin(db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+def get_all_classrooms_for_admin(request: Request, response: Response, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
     """
     [Admin Only] Lấy danh sách tất cả các lớp học trong hệ thống.
     """
+    cached = change_tracking.not_modified(request, response, db, change_tracking.TABLE_CLASSROOMS)
+    if cached:
+        return cached
     classrooms = db.query(models.Classroom).order_by(models.Classroom.id).all()
     return classrooms
 
 @app.get("/api/admin/teachers", response_model=List[TeacherResponse])
-def get_all_teachers_for_admin(db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+def get_all_teachers_for_admin(request: Request, response: Response, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
     """
     [Admin Only] Lấy danh sách tất cả các giáo viên trong hệ thống.
     """
+    cached = change_tracking.not_modified(request, response, db, change_tracking.TABLE_TEACHERS)
+    if cached:
+        return cached
     teachers = db.query(models.Teacher).order_by(models.Teacher.id).all()
     return teachers
 
 @app.get("/api/admin/attendance-summary/{classroom_id}", response_model=List[AttendanceSummaryResponse])
 def get_admin_attendance_summary(
     classroom_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Admin = Depends(get_current_admin)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    admin: models.Admin = Depends(get_current_report_admin)
 ):
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(classroom_id))
+    if cached:
+        return cached
 
     summary = generate_attendance_summary(classroom_id, db)
     if not summary:
@@ -809,12 +919,53 @@ def confirm_admin_password(request: PasswordConfirmationRequest, admin: models.A
         raise HTTPException(status_code=403, detail="Mật khẩu xác nhận không chính xác.")
     return {"message": "Password confirmed successfully."}
 
+@app.get("/api/admin/recognition/quality-stats")
+def get_face_quality_stats(admin: models.Admin = Depends(get_current_admin)):
+    """
+    [Admin Only] Số ảnh đạt / bị loại ở bước lọc chất lượng, theo từng lý do.
+    """
+    return face_quality.get_quality_stats()
+
+@app.get("/api/admin/recognition/reindex")
+def get_reindex_status(admin: models.Admin = Depends(get_current_admin)):
+    """
+    [Admin Only] Model đang phục vụ nhận dạng và tiến độ của job tính lại embedding gần nhất.
+    """
+    return {"active_backend": inference_backends.active_spec(), "job": reindex.load_state()}
+
+@app.post("/api/admin/recognition/reindex", status_code=status.HTTP_202_ACCEPTED)
+def start_reindex(request: ReindexRequest, admin: models.Admin = Depends(get_current_admin)):
+    """
+    [Admin Only] Tính lại embedding của mọi lớp cho backend mới. Nhận dạng vẫn dùng model cũ
+    cho tới khi job xong hết các lớp.
+    """
+    try:
+        reindex.start_in_background(request.backend, IMAGE_DB_PATH, request.resume)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except reindex.ReindexRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Đã bắt đầu tính lại embedding.", "backend": request.backend}
+
+@app.get("/api/admin/profiles/{profile_id}")
+def get_request_profile(profile_id: str, format: str = "json", admin: models.Admin = Depends(get_current_admin)):
+    """
+    [Admin Only] Lấy kết quả profiling của một request (format=json cho thống kê SQL, folded cho flamegraph).
+    """
+    content = profiling.load_profile(profile_id, format)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy profile.")
+    media_type = "text/plain" if format == "folded" else "application/json"
+    return Response(content, media_type=media_type)
+
 
 @app.post("/api/admin/schedules", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
 def create_schedule_for_classroom(schedule: ScheduleCreate, classroom_id: int, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
     db_schedule = models.Schedule(class_date=schedule.class_date, classroom_id=classroom_id)
     try:
         db.add(db_schedule)
+        db.flush()
+        rollups.refresh_weeks(db, classroom_id, [schedule.class_date])
         db.commit()
         db.refresh(db_schedule)
         return db_schedule
@@ -823,7 +974,10 @@ def create_schedule_for_classroom(schedule: ScheduleCreate, classroom_id: int, d
         raise HTTPException(status_code=400, detail="Ngày học này đã tồn tại cho lớp.")
 
 @app.get("/api/admin/schedules/{classroom_id}", response_model=List[ScheduleResponse])
-def get_schedules_for_classroom(classroom_id: int, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+def get_schedules_for_classroom(classroom_id: int, request: Request, response: Response, db: Session = Depends(get_db), admin: models.Admin = Depends(get_current_admin)):
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(classroom_id))
+    if cached:
+        return cached
     schedules = db.query(models.Schedule).filter(models.Schedule.classroom_id == classroom_id).order_by(models.Schedule.class_date.desc()).all()
     return schedules
 
@@ -833,49 +987,47 @@ def delete_schedule(schedule_id: int, db: Session = Depends(get_db), admin: mode
     if not db_schedule:
         raise HTTPException(status_code=404, detail="Không tìm thấy lịch học.")
     db.delete(db_schedule)
+    db.flush()
+    rollups.refresh_weeks(db, db_schedule.classroom_id, [db_schedule.class_date])
     db.commit()
     return
 
-@app.get("/api/admin/attendance-grid/{classroom_id}", response_model=AttendanceGridResponse)
-def get_attendance_grid_data(
-    classroom_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Admin = Depends(get_current_admin)
+@app.get("/api/admin/overview/weekly", response_model=List[WeeklyOverviewRow])
+def get_weekly_overview(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    admin: models.Admin = Depends(get_current_report_admin)
 ):
+    """
+    [Admin Only] Tỉ lệ có mặt, đi muộn, vắng của mọi lớp theo từng tuần (mặc định 8 tuần gần nhất).
+    """
+    today = models.get_vietnam_time_naive().date()
+    end_date = end_date or today
+    start_date = start_date or rollups.week_start(end_date) - timedelta(weeks=rollups.OVERVIEW_WEEKS - 1)
+    return rollups.overview(db, start_date, end_date)
+
+@app.get("/api/admin/export/attendance")
+def export_attendance(
+    format: str = "csv",
+    classroom_ids: Optional[List[int]] = Query(None),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    admin: models.Admin = Depends(get_current_report_admin)
+):
+    """
+    [Admin Only] Xuất bảng điểm danh (một lớp, nhiều lớp hoặc toàn trường) dạng CSV/XLSX, gửi theo luồng.
+    """
+    if format not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="Định dạng chỉ hỗ trợ csv hoặc xlsx.")
 
-    schedules = db.query(models.Schedule).filter(models.Schedule.classroom_id == classroom_id).order_by(models.Schedule.class_date.desc()).all()
-    scheduled_dates = [s.class_date for s in schedules]
-
-    students = db.query(models.Student).filter(models.Student.classroom_id == classroom_id).order_by(models.Student.name).all()
-
-    attendance_data = []
-    for student in students:
-        logs = {log.timestamp.date(): log for log in student.attendance_logs}
-        
-        student_grid_data = {
-            "student_id": student.id,
-            "student_name": student.name,
-            "student_code": student.student_code,
-            "logs_by_date": {}
-        }
-        
-        for s_date in scheduled_dates:
-            log = logs.get(s_date)
-            if log:
-                on_time_threshold = log.timestamp.replace(hour=8, minute=5, second=0)
-                status = "PRESENT" if log.timestamp <= on_time_threshold else "LATE"
-                student_grid_data["logs_by_date"][s_date] = {
-                    "status": status,
-                    "note": log.note,
-                    "check_in_time": log.timestamp.strftime('%H:%M:%S')
-                }
-            else:
-                student_grid_data["logs_by_date"][s_date] = {"status": "ABSENT", "note": None, "check_in_time": None}
-        
-        attendance_data.append(student_grid_data)
-
-    return {"scheduled_dates": scheduled_dates, "attendance_data": attendance_data}
-
+    rows = exports.iter_export_rows(classroom_ids, start_date, end_date)
+    filename = f"attendance_{date.today().isoformat()}.{format}"
+    if format == "csv":
+        body, media_type = exports.stream_csv(rows), "text/csv; charset=utf-8"
+    else:
+        body, media_type = exports.stream_xlsx(rows), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 @app.post("/api/attendance-note", status_code=status.HTTP_200_OK)
 def update_attendance_note(
@@ -883,24 +1035,50 @@ def update_attendance_note(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    log = db.query(models.AttendanceLog).join(models.Student).filter(
-        models.Student.id == request.student_id,
-        db.func.date(models.AttendanceLog.timestamp) == request.class_date
-    ).first()
-
-    if log:
-        log.note = request.note
-    else:
-        new_log = models.AttendanceLog(
-            student_id=request.student_id,
-            timestamp=datetime.combine(request.class_date, datetime.min.time()),
-            note=request.note
-        )
-        db.add(new_log)
+    classroom_id = db.query(models.Student.classroom_id).filter(models.Student.id == request.student_id).scalar()
+    if classroom_id is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên.")
 
-    db.commit()
+    cells = grid_edits.apply_edits(db, classroom_id, [
+        {"student_id": request.student_id, "class_date": request.class_date, "note": request.note, "status": None}
+    ])
+    publish_cells(classroom_id, load_grid_cells(db, cells))
     return {"message": "Ghi chú đã được cập nhật thành công."}
 
+@app.post("/api/attendance-grid/edits", response_model=GridEditResponse)
+def edit_attendance_grid(
+    request: GridEditRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Sửa nhiều ô của bảng điểm danh trong một transaction (vd. cả buổi đi thực tế: ghi chú và đánh dấu có mặt).
+    Giáo viên chỉ sửa được lớp mình; admin phải truyền classroom_id. Trả về các ô sau khi sửa.
+    """
+    if isinstance(current_user, models.Teacher):
+        if request.classroom_id is not None and request.classroom_id != current_user.classroom_id:
+            raise HTTPException(status_code=403, detail="Giáo viên chỉ được sửa bảng điểm danh của lớp mình.")
+        classroom_id = current_user.classroom_id
+    elif request.classroom_id is None:
+        raise HTTPException(status_code=400, detail="Thiếu classroom_id.")
+    else:
+        classroom_id = request.classroom_id
+
+    if len(request.edits) > grid_edits.MAX_EDITS:
+        raise HTTPException(status_code=413, detail=f"Mỗi lần sửa tối đa {grid_edits.MAX_EDITS} ô.")
+    if not request.edits:
+        return {"cells": []}
+    if any(e.note is None and e.status is None for e in request.edits):
+        raise HTTPException(status_code=400, detail="Mỗi ô cần có ghi chú hoặc trạng thái mới.")
+    unknown = grid_edits.unknown_students(db, classroom_id, {e.student_id for e in request.edits})
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Sinh viên không thuộc lớp này: {unknown}")
+
+    cells = grid_edits.apply_edits(db, classroom_id, [e.model_dump() for e in request.edits])
+    updated = load_grid_cells(db, cells)
+    publish_cells(classroom_id, updated)
+    return {"cells": updated}
+
 @app.get("/api/teacher/my-classroom", response_model=ClassroomResponse)
 def get_teacher_classroom(
     current_teacher: models.Teacher = Depends(get_current_teacher),
@@ -912,11 +1090,16 @@ def get_teacher_classroom(
 
 @app.get("/api/teacher/attendance-grid", response_model=AttendanceGridResponse)
 def get_teacher_attendance_grid(
+    request: Request,
+    response: Response,
     teacher: models.Teacher = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     if not teacher.classroom_id:
         raise HTTPException(status_code=404, detail="Giáo viên này không phụ trách lớp nào.")
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(teacher.classroom_id))
+    if cached:
+        return cached
     
     return get_attendance_grid_data_logic(teacher.classroom_id, db)
 
@@ -924,21 +1107,108 @@ def get_teacher_attendance_grid(
 @app.get("/api/admin/attendance-grid/{classroom_id}", response_model=AttendanceGridResponse)
 def get_attendance_grid_data(
     classroom_id: int,
-    db: Session = Depends(get_db),
-    admin: models.Admin = Depends(get_current_admin)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    admin: models.Admin = Depends(get_current_report_admin)
 ):
+    cached = change_tracking.not_modified(request, response, db, change_tracking.classroom_scope(classroom_id))
+    if cached:
+        return cached
     return get_attendance_grid_data_logic(classroom_id, db)
 
+def grid_cell(log_timestamp: Optional[datetime], note: Optional[str]) -> dict:
+    if log_timestamp is None:
+        # Ô vắng có dòng đánh dấu (vắng hoặc chỉ có ghi chú).
+        return {"status": "ABSENT", "note": note, "check_in_time": None}
+    on_time_threshold = log_timestamp.replace(hour=8, minute=5, second=0)
+    status = "PRESENT" if log_timestamp <= on_time_threshold else "LATE"
+    return {"status": status, "note": note, "check_in_time": log_timestamp.strftime('%H:%M:%S')}
+
+def empty_cell() -> dict:
+    return {"status": "ABSENT", "note": None, "check_in_time": None}
+
+def load_grid_cells(db: Session, cells: List[Tuple[int, date]]) -> List[dict]:
+    """Trạng thái hiện tại của các ô (student_id, ngày), đọc như bảng điểm danh."""
+    days = [day for _, day in cells]
+    first_checkins = attendance_partitions.load_first_checkins(
+        db, list({student_id for student_id, _ in cells}), min(days), max(days), include_absent=True
+    )
+    return [
+        {
+            "student_id": student_id,
+            "class_date": day,
+            "cell": grid_cell(*first_checkins[(student_id, day)]) if (student_id, day) in first_checkins else empty_cell(),
+        }
+        for student_id, day in cells
+    ]
+
+def publish_cells(classroom_id: int, updated: List[dict]):
+    # Ô đã sửa thay thế hẳn ô trên dashboard (khác check_in chỉ áp dụng khi sớm hơn).
+    for row in updated:
+        live_events.broker.publish(classroom_id, "cell", {
+            "student_id": row["student_id"],
+            "class_date": row["class_date"].isoformat(),
+            "cell": row["cell"],
+        })
+
+def publish_check_in(classroom_id: int, student_id: int, timestamp: datetime, note: Optional[str] = None):
+    # Client chỉ áp dụng nếu ô đang vắng hoặc giờ mới sớm hơn, vì bảng hiển thị lượt đầu tiên trong ngày.
+    live_events.broker.publish(classroom_id, "check_in", {
+        "student_id": student_id,
+        "class_date": timestamp.date().isoformat(),
+        "cell": grid_cell(timestamp, note),
+    })
+
+def attendance_stream_response(request: Request, classroom_id: int) -> StreamingResponse:
+    subscription = live_events.broker.subscribe(classroom_id)
+    return StreamingResponse(
+        live_events.broker.stream(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/teacher/attendance-stream")
+async def stream_teacher_attendance(request: Request, token: str = Query(...)):
+    """
+    Sự kiện điểm danh trực tiếp (SSE) của lớp giáo viên phụ trách. EventSource không gửi được
+    header nên token nằm trong query; session DB chỉ mở lúc xác thực, không giữ suốt kết nối.
+    """
+    db = SessionLocal()
+    try:
+        teacher = await run_in_threadpool(get_current_teacher, token, db)
+        classroom_id = teacher.classroom_id
+    finally:
+        db.close()
+    if not classroom_id:
+        raise HTTPException(status_code=404, detail="Giáo viên này không phụ trách lớp nào.")
+    return attendance_stream_response(request, classroom_id)
+
+@app.get("/api/admin/classrooms/{classroom_id}/attendance-stream")
+async def stream_classroom_attendance_for_admin(classroom_id: int, request: Request, token: str = Query(...)):
+    """
+    [Admin Only] Sự kiện điểm danh trực tiếp (SSE) của một lớp.
+    """
+    db = SessionLocal()
+    try:
+        await get_current_admin(token, db)
+    finally:
+        db.close()
+    return attendance_stream_response(request, classroom_id)
+
 def get_attendance_grid_data_logic(classroom_id: int, db: Session):
     schedules = db.query(models.Schedule).filter(models.Schedule.classroom_id == classroom_id).order_by(models.Schedule.class_date.desc()).all()
     scheduled_dates = [s.class_date for s in schedules]
 
     students = db.query(models.Student).filter(models.Student.classroom_id == classroom_id).order_by(models.Student.name).all()
+    first_checkins = {}
+    if scheduled_dates:
+        first_checkins = attendance_partitions.load_first_checkins(
+            db, [s.id for s in students], scheduled_dates[-1], scheduled_dates[0], include_absent=True
+        )
 
     attendance_data = []
     for student in students:
-        logs = {log.timestamp.date(): log for log in student.attendance_logs}
-        
         student_grid_data = {
             "student_id": student.id,
             "student_name": student.name,
@@ -947,17 +1217,11 @@ def get_attendance_grid_data_logic(classroom_id: int, db: Session):
         }
         
         for s_date in scheduled_dates:
-            log = logs.get(s_date)
-            if log:
-                on_time_threshold = log.timestamp.replace(hour=8, minute=5, second=0)
-                status = "PRESENT" if log.timestamp <= on_time_threshold else "LATE"
-                student_grid_data["logs_by_date"][s_date] = {
-                    "status": status,
-                    "note": log.note,
-                    "check_in_time": log.timestamp.strftime('%H:%M:%S')
-                }
+            log_entry = first_checkins.get((student.id, s_date))
+            if log_entry:
+                student_grid_data["logs_by_date"][s_date] = grid_cell(*log_entry)
             else:
-                student_grid_data["logs_by_date"][s_date] = {"status": "ABSENT", "note": None, "check_in_time": None}
+                student_grid_data["logs_by_date"][s_date] = empty_cell()
         
         attendance_data.append(student_grid_data)
 
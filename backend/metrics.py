@@ -0,0 +1,140 @@
+import time
+from contextlib import contextmanager
+
+from fastapi import Response
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, REGISTRY
+
+import face_quality
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Thời gian xử lý request theo route.",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+RECOGNIZE_STAGE_LATENCY = Histogram(
+    "recognize_stage_duration_seconds",
+    "Thời gian từng bước của /api/recognize.",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+MODEL_INFERENCES = Counter(
+    "model_inferences_total",
+    "Số lần gọi model nhận dạng.",
+    ["model", "kind"],
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Số lần tra cứu cache, theo kết quả hit/miss.",
+    ["cache", "result"],
+)
+
+GALLERY_RESIDENT_BYTES = Gauge(
+    "gallery_cache_resident_bytes",
+    "Dung lượng ước tính của các gallery lớp đang nằm trong cache của worker.",
+)
+
+GALLERY_RESIDENT_CLASSROOMS = Gauge(
+    "gallery_cache_resident_classrooms",
+    "Số lớp có gallery đang nằm trong cache của worker.",
+)
+
+GALLERY_EVICTIONS = Counter(
+    "gallery_cache_evictions_total",
+    "Số gallery bị đẩy khỏi cache vì vượt ngân sách bộ nhớ.",
+)
+
+GALLERY_PRELOADS = Counter(
+    "gallery_cache_preloads_total",
+    "Số gallery được nạp trước theo lịch học.",
+)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        RECOGNIZE_STAGE_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+def cache_hit(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class _CallbackCollector:
+    """Xuất các chỉ số được đọc tại thời điểm scrape (pool DB, bộ lọc chất lượng...)."""
+
+    def __init__(self):
+        self._engines = {}
+
+    def register_engine(self, name: str, engine):
+        self._engines[name] = engine
+
+    def collect(self):
+        pool_gauge = GaugeMetricFamily("db_pool_connections", "Trạng thái connection pool.", labels=["engine", "state"])
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            for state, getter in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"), ("checked_in", "checkedin")):
+                fn = getattr(pool, getter, None)
+                if fn is not None:
+                    pool_gauge.add_metric([name, state], fn())
+        yield pool_gauge
+
+        stats = face_quality.get_quality_stats()
+        quality = CounterMetricFamily("face_quality_checks", "Kết quả bước lọc chất lượng ảnh.", labels=["result", "reason"])
+        quality.add_metric(["passed", ""], stats["passed"])
+        for reason, count in stats["rejected"].items():
+            quality.add_metric(["rejected", reason], count)
+        yield quality
+
+
+collector = _CallbackCollector()
+REGISTRY.register(collector)
+
+
+class RequestLatencyMiddleware:
+    """
+    Middleware ASGI ghi REQUEST_LATENCY tới khi gửi xong response. Stream SSE (text/event-stream)
+    mở tới khi client ngắt kết nối nên không được tính, tránh làm lệch histogram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        response = {"status": 500, "event_stream": False}
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                response["event_stream"] = content_type.startswith(b"text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            if not response["event_stream"]:
+                route_path = getattr(scope.get("route"), "path", "unmatched")
+                REQUEST_LATENCY.labels(scope["method"], route_path, str(response["status"])).observe(
+                    time.perf_counter() - start
+                )
+
+
+def install(app):
+    app.add_middleware(RequestLatencyMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Date 
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Date, Index 
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -14,8 +14,10 @@ class Classroom(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False)
     
-    teacher = relationship("Teacher", back_populates="classroom", uselist=False, cascade="all, delete-orphan")
-    students = relationship("Student", back_populates="classroom", cascade="all, delete-orphan")
+    # Xoá lớp được thực hiện bằng ON DELETE CASCADE trong DB (cascade_deletes.py); passive_deletes để
+    # ORM không nạp từng dòng con ra chỉ để xoá.
+    teacher = relationship("Teacher", back_populates="classroom", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    students = relationship("Student", back_populates="classroom", cascade="all, delete-orphan", passive_deletes=True)
 
 class Teacher(Base):
     __tablename__ = "teachers"
@@ -23,7 +25,7 @@ class Teacher(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     current_session_id = Column(String, nullable=True) 
-    classroom_id = Column(Integer, ForeignKey("classrooms.id"), unique=True, nullable=False)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), unique=True, nullable=False)
     classroom = relationship("Classroom", back_populates="teacher")
 
 class Student(Base):
@@ -33,31 +35,92 @@ class Student(Base):
     name = Column(String, nullable=False)
     reference_image_path = Column(String)
     
-    classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), index=True, nullable=False)
     classroom = relationship("Classroom", back_populates="students")
     
-    attendance_logs = relationship("AttendanceLog", back_populates="student", cascade="all, delete-orphan")
+    attendance_logs = relationship("AttendanceLog", back_populates="student", cascade="all, delete-orphan", passive_deletes=True)
+    daily_summaries = relationship("AttendanceDailySummary", back_populates="student", cascade="all, delete-orphan", passive_deletes=True)
     
     __table_args__ = (UniqueConstraint('student_code', 'classroom_id', name='_student_classroom_uc'),)
 
 
+# Trạng thái của dòng điểm danh. Ngoài lượt điểm danh (PRESENT), mỗi ô (sinh viên, ngày) có thể có một
+# dòng đánh dấu lúc 0h do giáo viên sửa bảng: ABSENT buộc ô là vắng dù có lượt điểm danh, NOTE chỉ mang
+# ghi chú của ô chưa có lượt nào. Dòng đánh dấu không phải lượt điểm danh.
+ATTENDANCE_PRESENT = "PRESENT"
+ATTENDANCE_ABSENT = "ABSENT"
+ATTENDANCE_NOTE = "NOTE"
+MARKER_STATUSES = (ATTENDANCE_ABSENT, ATTENDANCE_NOTE)
+
+
 class AttendanceLog(Base):
     __tablename__ = "attendance_logs"
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.datetime.now)
-    status = Column(String, default="PRESENT") 
+    status = Column(String, default=ATTENDANCE_PRESENT)
     note = Column(String, nullable=True)
     
-    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
     student = relationship("Student", back_populates="attendance_logs")
-    
+
+    # Trên Postgres bảng này được phân vùng theo tháng (xem attendance_partitions.py).
+    __table_args__ = (Index('ix_attendance_logs_student_timestamp', 'student_id', 'timestamp'),)
+
+# Lượt điểm danh đầu tiên mỗi ngày của các kỳ học đã lưu trữ khỏi attendance_logs.
+# status ABSENT/NOTE: ô được đánh dấu vắng / chỉ có ghi chú, như dòng đánh dấu trong attendance_logs.
+class AttendanceDailySummary(Base):
+    __tablename__ = "attendance_daily_summaries"
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    class_date = Column(Date, nullable=False)
+    check_in_time = Column(DateTime, nullable=False)
+    note = Column(String, nullable=True)
+    status = Column(String, nullable=False, default=ATTENDANCE_PRESENT, server_default=ATTENDANCE_PRESENT)
+    student = relationship("Student", back_populates="daily_summaries")
+
+    __table_args__ = (UniqueConstraint('student_id', 'class_date', name='_student_class_date_uc'),)
+
 class Schedule(Base):
     __tablename__ = "schedules"
     id = Column(Integer, primary_key=True, index=True)
     class_date = Column(Date, nullable=False)
-    classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
-    
-    __table_args__ = (UniqueConstraint('class_date', 'classroom_id', name='_class_date_classroom_uc'),)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), nullable=False)
     
+    __table_args__ = (
+        UniqueConstraint('class_date', 'classroom_id', name='_class_date_classroom_uc'),
+        # Lịch sử theo trang của một lớp: lọc classroom_id rồi duyệt class_date theo keyset.
+        Index('ix_schedules_classroom_date', 'classroom_id', 'class_date'),
+    )
+
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# Sự kiện điểm danh trạm gửi lại khi mất mạng; khoá (station_id, client_event_id) để gửi lại không ghi trùng.
+class StationSyncEvent(Base):
+    __tablename__ = "station_sync_events"
+    id = Column(Integer, primary_key=True, index=True)
+    station_id = Column(String, nullable=False)
+    client_event_id = Column(String, nullable=False)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), nullable=False)
+    student_code = Column(String, nullable=False)
+    captured_at = Column(DateTime, nullable=False)
+    status = Column(String, nullable=False)
+
+    __table_args__ = (UniqueConstraint('station_id', 'client_event_id', name='_station_client_event_uc'),)
+
+# Thống kê điểm danh theo lớp theo tuần (week_start là thứ Hai), cập nhật dần khi điểm danh
+# hoặc đổi lịch học; tính lại toàn bộ bằng `python rollups.py rebuild`.
+class ClassroomWeeklyRollup(Base):
+    __tablename__ = "classroom_weekly_rollups"
+    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    session_count = Column(Integer, nullable=False, default=0)
+    on_time_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index('ix_classroom_weekly_rollups_week', 'week_start', 'classroom_id'),)
+
 def get_vietnam_time_naive():
-    return datetime.datetime.utcnow() + datetime.timedelta(hours=7)
\ No newline at end of file
+    return datetime.datetime.utcnow() + datetime.timedelta(hours=7)
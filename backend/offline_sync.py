@@ -0,0 +1,188 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+import rollups
+import attendance_partitions
+import change_tracking
+
+# Cùng cửa sổ chống ghi trùng với _record_attendance_logic.
+DEDUPE_WINDOW = timedelta(minutes=10)
+MAX_EVENTS = 1000
+# Đồng hồ trạm có thể lệch một chút so với server.
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Trạm có thể mất mạng qua đêm hoặc cuối tuần; lượt chụp cũ hơn thế bị từ chối (không ghi bù điểm danh cũ).
+MAX_OFFLINE_AGE = timedelta(days=int(os.getenv("OFFLINE_SYNC_MAX_AGE_DAYS", "7")))
+
+RECORDED = "RECORDED"
+SKIPPED = "SKIPPED"
+UNKNOWN_STUDENT = "UNKNOWN_STUDENT"
+INVALID_TIME = "INVALID_TIME"
+# client_event_id đã được trạm gửi trước đó cho lớp khác.
+CLASSROOM_MISMATCH = "CLASSROOM_MISMATCH"
+PENDING = "PENDING"
+
+
+def to_local_naive(captured_at: datetime) -> datetime:
+    """Giờ có múi giờ được đổi sang giờ Việt Nam không múi giờ như cột timestamp; giờ không múi giờ giữ nguyên."""
+    if captured_at.tzinfo is None:
+        return captured_at
+    return captured_at.astimezone(timezone.utc).replace(tzinfo=None) + timedelta(hours=7)
+
+
+def _claim_events(db: Session, station_id: str, classroom_id: int, events: list) -> set:
+    """
+    Ghi nhận (station_id, client_event_id) trước khi xử lý. Sự kiện đã có từ lần gửi trước
+    (hoặc từ request song song) bị bỏ qua nhờ ON CONFLICT DO NOTHING; trả về các id vừa nhận.
+    """
+    table = models.StationSyncEvent.__table__
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = (
+        dialect_insert(table)
+        .values([
+            {
+                "station_id": station_id,
+                "client_event_id": e["client_event_id"],
+                "classroom_id": classroom_id,
+                "student_code": e["student_code"],
+                "captured_at": e["captured_at"],
+                "status": PENDING,
+            }
+            for e in events
+        ])
+        .on_conflict_do_nothing(index_elements=[table.c.station_id, table.c.client_event_id])
+        .returning(table.c.client_event_id)
+    )
+    return set(db.execute(stmt).scalars())
+
+
+def _select_new_check_ins(events: list, existing: dict) -> set:
+    """
+    Áp luật 10 phút của điểm danh trực tiếp theo thứ tự thời gian chụp. Lượt đã lưu có thể
+    nằm sau lượt offline (trạm nhận dạng trực tiếp được lại trước khi kịp đồng bộ), nên một
+    lượt bị bỏ nếu có lượt đã lưu cách nó dưới 10 phút về bất kỳ phía nào, hoặc có lượt vừa
+    chấp nhận trong lô dưới 10 phút trước nó.
+    """
+    by_student = defaultdict(list)
+    for e in events:
+        by_student[e["student_id"]].append(e)
+
+    accepted = set()
+    for student_id, student_events in by_student.items():
+        stored = existing.get(student_id, [])
+        timeline = []
+        for e in sorted(student_events, key=lambda e: e["captured_at"]):
+            t = e["captured_at"]
+            if any(abs(t - other) < DEDUPE_WINDOW for other in stored):
+                continue
+            if any(t - DEDUPE_WINDOW < other <= t for other in timeline):
+                continue
+            accepted.add(e["client_event_id"])
+            timeline.append(t)
+    return accepted
+
+
+def sync_check_ins(db: Session, station_id: str, classroom_id: int, events: List[dict]) -> dict:
+    """
+    Nhận một lô sự kiện {client_event_id, student_code, captured_at} từ trạm. Mỗi sự kiện
+    chỉ được xử lý một lần; gửi lại cả lô trả về cùng kết quả. Trả về trạng thái từng sự kiện
+    và các log vừa ghi (để đẩy lên bảng điểm danh trực tiếp).
+    """
+    # Trùng client_event_id trong cùng lô: giữ sự kiện đầu tiên.
+    unique_events = list({e["client_event_id"]: e for e in reversed(events)}.values())[::-1]
+    for e in unique_events:
+        e["captured_at"] = to_local_naive(e["captured_at"])
+
+    claimed = _claim_events(db, station_id, classroom_id, unique_events)
+    results = {}
+
+    sync_event = models.StationSyncEvent
+    replayed = [e["client_event_id"] for e in unique_events if e["client_event_id"] not in claimed]
+    if replayed:
+        rows = db.execute(
+            select(sync_event.client_event_id, sync_event.status).where(
+                sync_event.station_id == station_id,
+                sync_event.classroom_id == classroom_id,
+                sync_event.client_event_id.in_(replayed),
+            )
+        )
+        results.update({client_event_id: status for client_event_id, status in rows})
+        # Không trả trạng thái của sự kiện thuộc lớp khác.
+        results.update({client_event_id: CLASSROOM_MISMATCH for client_event_id in replayed if client_event_id not in results})
+
+    pending = [e for e in unique_events if e["client_event_id"] in claimed]
+    now = models.get_vietnam_time_naive()
+    earliest = now - MAX_OFFLINE_AGE
+    for e in pending:
+        if not earliest <= e["captured_at"] <= now + MAX_CLOCK_SKEW:
+            results[e["client_event_id"]] = INVALID_TIME
+    pending = [e for e in pending if e["client_event_id"] not in results]
+
+    codes = {e["student_code"] for e in pending}
+    students = {}
+    if codes:
+        students = dict(db.execute(
+            select(models.Student.student_code, models.Student.id)
+            .where(models.Student.classroom_id == classroom_id, models.Student.student_code.in_(codes))
+        ).all())
+    for e in pending:
+        e["student_id"] = students.get(e["student_code"])
+        if e["student_id"] is None:
+            results[e["client_event_id"]] = UNKNOWN_STUDENT
+    pending = [e for e in pending if e["client_event_id"] not in results]
+
+    inserted = []
+    if pending:
+        log = models.AttendanceLog
+        start = min(e["captured_at"] for e in pending) - DEDUPE_WINDOW
+        end = max(e["captured_at"] for e in pending) + DEDUPE_WINDOW
+        existing = defaultdict(list)
+        for student_id, timestamp in db.execute(
+            select(log.student_id, log.timestamp).where(
+                log.student_id.in_({e["student_id"] for e in pending}),
+                log.timestamp > start,
+                log.timestamp < end,
+                # Dòng đánh dấu lúc 0h của giáo viên không phải lượt điểm danh.
+                attendance_partitions.is_check_in(log.status),
+            )
+        ):
+            existing[student_id].append(timestamp)
+
+        accepted = _select_new_check_ins(pending, existing)
+        for e in pending:
+            results[e["client_event_id"]] = RECORDED if e["client_event_id"] in accepted else SKIPPED
+
+        inserted = [
+            {"student_id": e["student_id"], "timestamp": e["captured_at"], "status": "PRESENT", "note": None}
+            for e in pending if e["client_event_id"] in accepted
+        ]
+        if inserted:
+            db.execute(insert(log).values(inserted))
+            change_tracking.mark_changed(db, [change_tracking.classroom_scope(classroom_id)])
+            rollups.refresh_weeks(db, classroom_id, {row["timestamp"].date() for row in inserted})
+
+    by_status = defaultdict(list)
+    for client_event_id in claimed:
+        by_status[results[client_event_id]].append(client_event_id)
+    for status, client_event_ids in by_status.items():
+        db.execute(
+            update(sync_event)
+            .where(sync_event.station_id == station_id, sync_event.client_event_id.in_(client_event_ids))
+            .values(status=status)
+        )
+    db.commit()
+
+    counts = defaultdict(int)
+    for status in results.values():
+        counts[status] += 1
+    return {
+        "results": [{"client_event_id": e["client_event_id"], "status": results[e["client_event_id"]]} for e in unique_events],
+        "counts": dict(counts),
+        "recorded": inserted,
+    }
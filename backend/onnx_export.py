@@ -0,0 +1,50 @@
+"""
+Xuất Facenet của DeepFace sang ONNX và (tuỳ chọn) lượng tử hoá int8 cho backend ONNX Runtime.
+
+    pip install tf2onnx onnx
+    python onnx_export.py --output models/facenet.onnx --int8
+
+Sau đó chạy backend với INFERENCE_BACKEND=onnx:models/facenet.int8.onnx
+"""
+import argparse
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def export_facenet(output: Path, opset: int = 13) -> Path:
+    import tensorflow as tf
+    import tf2onnx
+    from deepface import DeepFace
+
+    client = DeepFace.build_model("Facenet")
+    keras_model = getattr(client, "model", client)
+    signature = (tf.TensorSpec((None, 160, 160, 3), tf.float32, name="input"),)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tf2onnx.convert.from_keras(keras_model, input_signature=signature, opset=opset, output_path=str(output))
+    logger.info(f"Đã xuất Facenet sang {output}")
+    return output
+
+
+def quantize_int8(model_path: Path) -> Path:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output = model_path.with_suffix(".int8.onnx")
+    quantize_dynamic(str(model_path), str(output), weight_type=QuantType.QInt8)
+    logger.info(f"Đã lượng tử hoá int8: {output}")
+    return output
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Xuất Facenet sang ONNX.")
+    parser.add_argument("--output", type=Path, default=Path("models/facenet.onnx"))
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--int8", action="store_true", help="Tạo thêm bản lượng tử hoá int8 (dynamic).")
+    args = parser.parse_args()
+
+    path = export_facenet(args.output, args.opset)
+    if args.int8:
+        quantize_int8(path)
@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+
+import anyio
+from jose import JWTError, jwt
+from sqlalchemy import event
+
+import security
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+# Chỉ giữ lại số profile mới nhất này trong PROFILE_DIR.
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2")) / 1000
+N_PLUS_ONE_THRESHOLD = 5
+MAX_STACK_DEPTH = 128
+
+_current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.stacks = Counter()
+        self.statements = []
+        self.started = time.perf_counter()
+        self.duration = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        """Không chặn: chỉ báo cho luồng lấy mẫu dừng; finish() chờ nó và ghi file."""
+        self.duration = time.perf_counter() - self.started
+        self._stop.set()
+
+    def finish(self) -> Path:
+        self._sampler.join()
+        path = self.save()
+        _prune_profiles()
+        return path
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id and _running_profile(frame) is self:
+                    self.stacks[_collapse(frame)] += 1
+
+    def record_statement(self, statement: str, duration: float):
+        self.statements.append((statement, duration))
+
+    def folded(self) -> str:
+        """Định dạng collapsed stack, dùng trực tiếp với flamegraph.pl / speedscope."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def sql_summary(self) -> dict:
+        grouped = defaultdict(lambda: {"count": 0, "total_ms": 0.0})
+        for statement, duration in self.statements:
+            entry = grouped[_normalize_sql(statement)]
+            entry["count"] += 1
+            entry["total_ms"] += duration * 1000
+        statements = [
+            {"sql": sql, "count": v["count"], "total_ms": round(v["total_ms"], 3)}
+            for sql, v in sorted(grouped.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        ]
+        return {
+            "total_count": len(self.statements),
+            "total_ms": round(sum(d for _, d in self.statements) * 1000, 3),
+            "statements": statements,
+            "suspected_n_plus_one": [s["sql"] for s in statements if s["count"] >= N_PLUS_ONE_THRESHOLD],
+        }
+
+    def save(self) -> Path:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        (PROFILE_DIR / f"{self.id}.folded").write_text(self.folded(), encoding="utf-8")
+        report = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round(self.duration * 1000, 3),
+            "sql": self.sql_summary(),
+        }
+        path = PROFILE_DIR / f"{self.id}.json"
+        path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        return path
+
+
+def _running_profile(frame) -> Optional[RequestProfile]:
+    """
+    Profile của request mà luồng đang chạy code cho nó, tìm từ frame trong cùng ra ngoài:
+    coroutine của ProfilingMiddleware (luồng event loop), hoặc contextvars.Context mà worker
+    threadpool của anyio / Handle của asyncio đang chạy. Luồng của request khác trả về profile khác.
+    """
+    while frame is not None:
+        code = frame.f_code
+        if code is _MIDDLEWARE_CODE:
+            return frame.f_locals.get("profile")
+        if code.co_name in ("run", "_run"):
+            local_vars = frame.f_locals
+            context = local_vars.get("context")
+            if context is None:
+                context = getattr(local_vars.get("self"), "_context", None)
+            if isinstance(context, contextvars.Context):
+                return context.get(_current_profile)
+        frame = frame.f_back
+    return None
+
+
+def _prune_profiles():
+    reports = sorted(PROFILE_DIR.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in reports[PROFILE_KEEP:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+_SQL_LITERALS = re.compile(r"'[^']*'|\b\d+\b")
+
+
+def _normalize_sql(statement: str) -> str:
+    return _SQL_LITERALS.sub("?", " ".join(statement.split()))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    starts = conn.info.get("profile_query_start")
+    if starts:
+        profile.record_statement(statement, time.perf_counter() - starts.pop())
+
+
+class _SqlListeners:
+    """Chỉ gắn listener vào engine khi có ít nhất một request đang được profile."""
+
+    def __init__(self):
+        self._engines = []
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def add_engine(self, engine):
+        self._engines.append(engine)
+
+    def acquire(self):
+        with self._lock:
+            self._active += 1
+            if self._active == 1:
+                for engine in self._engines:
+                    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+                    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                for engine in self._engines:
+                    event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+                    event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+sql_listeners = _SqlListeners()
+
+
+def _is_admin_token(authorization: Optional[bytes]) -> bool:
+    if not authorization or not authorization.lower().startswith(b"bearer "):
+        return False
+    try:
+        payload = jwt.decode(authorization[7:].decode(), security.SECRET_KEY, algorithms=[security.ALGORITHM])
+    except JWTError:
+        return False
+    return payload.get("role") == "admin"
+
+
+def _profiling_requested(scope) -> bool:
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get(PROFILE_QUERY_PARAM) == ["1"]:
+        return True
+    return any(name == PROFILE_HEADER and value.strip() == b"1" for name, value in scope["headers"])
+
+
+class ProfilingMiddleware:
+    """
+    Bật profiling cho từng request bằng header ``X-Profile: 1`` hoặc ``?profile=1``
+    kèm token admin. Kết quả lưu trong PROFILE_DIR, id trả về qua header ``X-Profile-Id``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _profiling_requested(scope):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        if not _is_admin_token(headers.get(b"authorization")):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        sql_listeners.acquire()
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.stop()
+            sql_listeners.release()
+            _current_profile.reset(token)
+            # Chờ luồng lấy mẫu và ghi file ngoài event loop.
+            await anyio.to_thread.run_sync(profile.finish)
+
+
+_MIDDLEWARE_CODE = ProfilingMiddleware.__call__.__code__
+
+
+def load_profile(profile_id: str, fmt: str = "json") -> Optional[str]:
+    if not re.fullmatch(r"[0-9a-f]{12}", profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.{'folded' if fmt == 'folded' else 'json'}"
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8")
+
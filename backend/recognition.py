@@ -0,0 +1,161 @@
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+import metrics
+import gallery_cache
+import embedding_store
+import inference_backends
+
+DISTANCE_METRIC = "cosine"
+# Ngưỡng của Facenet; khi so khớp dùng backend.distance_threshold của model đang phục vụ.
+DISTANCE_THRESHOLD = inference_backends.DEEPFACE_COSINE_THRESHOLDS["Facenet"]
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+# Chỉ một luồng nạp gallery từ đĩa tại một thời điểm; tra cache không cần khoá này.
+_load_lock = threading.Lock()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _student_code_from_path(path: Path) -> str:
+    return path.stem.split('_')[0]
+
+
+def list_reference_images(folder: str) -> list:
+    return sorted(
+        entry.path for entry in os.scandir(folder)
+        if entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def warm_up():
+    """Nạp model trước, để request nhận dạng đầu tiên không phải chờ."""
+    inference_backends.get_backend().warm_up()
+
+
+def active_backend() -> inference_backends.InferenceBackend:
+    """
+    Backend đang phục vụ. Một request nhận dạng nên lấy backend một lần rồi truyền xuống
+    các bước sau, để không bị trộn model nếu ACTIVE_BACKEND đổi giữa chừng.
+    """
+    return inference_backends.get_backend()
+
+
+def detect_face(img: np.ndarray, backend: Optional[inference_backends.InferenceBackend] = None) -> np.ndarray:
+    backend = backend or active_backend()
+    metrics.MODEL_INFERENCES.labels(backend.name, "detection").inc()
+    return backend.detect(img)
+
+
+def embed_face(face_img: np.ndarray, backend: Optional[inference_backends.InferenceBackend] = None) -> np.ndarray:
+    backend = backend or active_backend()
+    metrics.MODEL_INFERENCES.labels(backend.name, "embedding").inc()
+    return backend.embed(face_img)
+
+
+def embed_reference_image(path: str, backend: Optional[inference_backends.InferenceBackend] = None) -> np.ndarray:
+    backend = backend or active_backend()
+    metrics.MODEL_INFERENCES.labels(backend.name, "reference_embedding").inc()
+    return backend.embed_reference(path)
+
+
+def model_version() -> str:
+    return active_backend().model_version
+
+
+def publish_gallery(classroom_id: int, folder: str, backend: Optional[inference_backends.InferenceBackend] = None) -> int:
+    """Tạo phiên bản embedding mới của lớp cho model của `backend` (mặc định: backend đang phục vụ)."""
+    backend = backend or active_backend()
+    with metrics.stage("gallery_publish"):
+        return embedding_store.publish(
+            classroom_id,
+            list_reference_images(folder) if os.path.isdir(folder) else [],
+            _student_code_from_path,
+            lambda path: embed_reference_image(path, backend),
+            backend.model_version,
+        )
+
+
+def _is_current(gallery, model: str, version) -> bool:
+    return gallery is not None and gallery.model == model and gallery.version == version
+
+
+def get_gallery(
+    classroom_id: int, folder: str, backend: Optional[inference_backends.InferenceBackend] = None
+) -> embedding_store.PublishedGallery:
+    return _get_gallery(classroom_id, folder, backend)[0]
+
+
+def _get_gallery(classroom_id: int, folder: str, backend: Optional[inference_backends.InferenceBackend] = None):
+    """Trả về (gallery, True nếu vừa phải nạp từ đĩa)."""
+    backend = backend or active_backend()
+    model = backend.model_version
+    version = embedding_store.current_version(classroom_id, model)
+    gallery = gallery_cache.galleries.get(classroom_id)
+    if _is_current(gallery, model, version):
+        metrics.cache_hit("gallery", True)
+        return gallery, False
+
+    metrics.cache_hit("gallery", False)
+    with _load_lock:
+        gallery = gallery_cache.galleries.get(classroom_id)
+        version = embedding_store.current_version(classroom_id, model)
+        if version is None:
+            # Chỉ xảy ra với lớp chưa từng publish; khi đổi model, reindex.py tính sẵn
+            # embedding cho mọi lớp trước khi chuyển ACTIVE_BACKEND.
+            version = publish_gallery(classroom_id, folder, backend)
+        if _is_current(gallery, model, version):
+            return gallery, False
+        with metrics.stage("gallery_load"):
+            gallery = embedding_store.load(classroom_id, model, version)
+        gallery_cache.galleries.put(classroom_id, gallery)
+    return gallery, True
+
+
+def preload_gallery(classroom_id: int, folder: str) -> bool:
+    """
+    Nạp gallery vào cache và đọc hết ma trận để các trang mmap đã nằm trong page cache.
+    Không đi qua _get_gallery để không tính vào cache hit/miss của request, và không đẩy lớp
+    khác ra: ném gallery_cache.BudgetExceeded nếu gallery không vừa ngân sách.
+    Trả về True nếu đã nạp, False nếu cache đã có phiên bản hiện tại.
+    """
+    if not os.path.isdir(folder) or not os.listdir(folder):
+        return False
+    backend = active_backend()
+    model = backend.model_version
+    with _load_lock:
+        version = embedding_store.current_version(classroom_id, model)
+        if version is None:
+            version = publish_gallery(classroom_id, folder, backend)
+        if _is_current(gallery_cache.galleries.peek(classroom_id), model, version):
+            return False
+        gallery = embedding_store.load(classroom_id, model, version)
+        gallery_cache.galleries.put(classroom_id, gallery, evict=False)
+    if gallery.embeddings.size:
+        float(np.sum(gallery.embeddings))
+    return True
+
+
+def find_best_match(
+    classroom_id: int,
+    folder: str,
+    embedding: np.ndarray,
+    backend: Optional[inference_backends.InferenceBackend] = None,
+) -> Optional[Tuple[str, float]]:
+    backend = backend or active_backend()
+    gallery = get_gallery(classroom_id, folder, backend)
+    if not gallery.student_codes:
+        return None
+    distances = 1.0 - gallery.embeddings @ _normalize(embedding)
+    best = int(np.argmin(distances))
+    if distances[best] > backend.distance_threshold:
+        return None
+    return gallery.student_codes[best], float(distances[best])
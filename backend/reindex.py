@@ -0,0 +1,193 @@
+"""
+Tính lại embedding của mọi lớp khi đổi model nhận dạng, rồi chuyển sang model mới một lần.
+
+    python reindex.py --backend onnx:models/facenet.int8.onnx --workers 4
+    python reindex.py --backend deepface:ArcFace
+    python reindex.py --status
+
+Job chạy song song theo từng lô lớp và ghi tiến độ vào reindex.json sau mỗi lô; chạy lại
+cùng lệnh sau khi bị ngắt sẽ bỏ qua các lớp đã xong. Trong lúc chạy, nhận dạng vẫn dùng
+embedding của model cũ; chỉ khi mọi lớp đã có phiên bản cho model mới thì ACTIVE_BACKEND
+mới được ghi đè, và các worker chuyển sang model mới ở request kế tiếp.
+
+Ngưỡng khoảng cách đi theo model (InferenceBackend.distance_threshold) và chỉ áp dụng lúc so khớp.
+"""
+import argparse
+import fcntl
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import models
+import embedding_store
+import inference_backends
+import recognition
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "reindex.json"
+LOCK_FILE = ".reindex.lock"
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 8
+
+
+class ReindexRunning(RuntimeError):
+    pass
+
+
+def load_state() -> Optional[dict]:
+    try:
+        return json.loads((embedding_store.EMBEDDING_DB_PATH / STATE_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_state(state: dict):
+    payload = json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")
+    embedding_store._write_atomic(embedding_store.EMBEDDING_DB_PATH / STATE_FILE, payload)
+
+
+def pending_target() -> Optional[str]:
+    """Spec của model đang được tính lại, hoặc None nếu không có job nào dở dang."""
+    state = load_state()
+    if state and state["status"] != "completed" and state["spec"] != inference_backends.active_spec():
+        return state["spec"]
+    return None
+
+
+def publish_pending(classroom_id: int, folder: str):
+    # Ảnh đăng ký trong lúc job chạy cũng phải có trong phiên bản của model mới,
+    # kể cả khi lớp đó đã được job xử lý xong.
+    spec = pending_target()
+    if spec:
+        recognition.publish_gallery(classroom_id, folder, inference_backends.backend_for(spec))
+
+
+def _acquire_job_lock():
+    embedding_store.EMBEDDING_DB_PATH.mkdir(parents=True, exist_ok=True)
+    lock_file = open(embedding_store.EMBEDDING_DB_PATH / LOCK_FILE, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise ReindexRunning("Đang có job tính lại embedding khác chạy.")
+    return lock_file
+
+
+def _release_job_lock(lock_file):
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+
+
+def _classroom_ids() -> list:
+    db = SessionLocal()
+    try:
+        return [row[0] for row in db.query(models.Classroom.id).order_by(models.Classroom.id)]
+    finally:
+        db.close()
+
+
+def _run(spec: str, image_root: Path, workers: int, batch_size: int, resume: bool) -> dict:
+    backend = inference_backends.backend_for(spec)
+    backend.warm_up()
+
+    state = load_state()
+    if not (resume and state and state["spec"] == spec and state["status"] != "completed"):
+        state = {
+            "spec": spec,
+            "model_version": backend.model_version,
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "completed": [],
+        }
+    classroom_ids = _classroom_ids()
+    state.update(status="running", total=len(classroom_ids), failed={}, finished_at=None)
+    _save_state(state)
+
+    done = set(state["completed"])
+    pending = [cid for cid in classroom_ids if cid not in done]
+    logger.info(f"Tính lại embedding cho {len(pending)}/{len(classroom_ids)} lớp với {backend.model_version}.")
+
+    def reindex_classroom(classroom_id):
+        try:
+            recognition.publish_gallery(classroom_id, str(image_root / str(classroom_id)), backend)
+            return classroom_id, None
+        except Exception as e:
+            return classroom_id, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(pending), batch_size):
+            for classroom_id, error in pool.map(reindex_classroom, pending[start:start + batch_size]):
+                if error is None:
+                    state["completed"].append(classroom_id)
+                else:
+                    logger.error(f"Lỗi khi tính lại embedding lớp {classroom_id}: {error}")
+                    state["failed"][str(classroom_id)] = error
+            _save_state(state)
+
+    if state["failed"]:
+        # Giữ model cũ; chạy lại job sẽ chỉ xử lý các lớp lỗi.
+        state["status"] = "failed"
+    else:
+        embedding_store.set_active_backend(spec, backend.model_version)
+        state["status"] = "completed"
+        logger.info(f"Đã chuyển nhận dạng sang {backend.model_version}.")
+    state["finished_at"] = datetime.utcnow().isoformat() + "Z"
+    _save_state(state)
+    return state
+
+
+def run(
+    spec: str,
+    image_root: Path,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    resume: bool = True,
+) -> dict:
+    lock_file = _acquire_job_lock()
+    try:
+        return _run(spec, image_root, workers, batch_size, resume)
+    finally:
+        _release_job_lock(lock_file)
+
+
+def start_in_background(spec: str, image_root: Path, resume: bool = True) -> threading.Thread:
+    # Tạo backend và giữ khoá ngay tại đây, để spec sai hoặc job trùng báo lỗi cho người gọi.
+    inference_backends.backend_for(spec)
+    lock_file = _acquire_job_lock()
+
+    def target():
+        try:
+            _run(spec, image_root, DEFAULT_WORKERS, DEFAULT_BATCH_SIZE, resume)
+        except Exception as e:
+            logger.error(f"Job tính lại embedding thất bại: {e}")
+        finally:
+            _release_job_lock(lock_file)
+
+    thread = threading.Thread(target=target, name="recognition-reindex", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Tính lại embedding của mọi lớp cho model nhận dạng mới.")
+    parser.add_argument("--backend", help='"deepface", "deepface:<model_name>" hoặc "onnx:<model.onnx>".')
+    parser.add_argument("--image-root", type=Path, default=Path("database/images"))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Bỏ tiến độ cũ, tính lại từ đầu.")
+    parser.add_argument("--status", action="store_true", help="Chỉ in tiến độ của job gần nhất.")
+    args = parser.parse_args()
+
+    if args.status:
+        print(json.dumps({"active": embedding_store.active_backend(), "job": load_state()}, indent=2, ensure_ascii=False))
+    elif not args.backend:
+        parser.error("Cần --backend hoặc --status.")
+    else:
+        result = run(args.backend, args.image_root, args.workers, args.batch_size, resume=not args.restart)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
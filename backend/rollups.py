@@ -0,0 +1,234 @@
+"""
+Thống kê điểm danh toàn trường theo lớp theo tuần (bảng classroom_weekly_rollups).
+
+    python rollups.py rebuild [--classroom-id 3]
+    python rollups.py check [--fix]
+
+Mỗi dòng giữ số buổi học, số lượt đúng giờ và đi muộn (lượt đầu tiên trong ngày của sinh viên
+hiện có trong lớp) của một tuần. Số vắng = số buổi x số sinh viên - có mặt, giống
+generate_attendance_summary, nên thêm sinh viên không cần cập nhật lại bảng.
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+import attendance_partitions
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW_WEEKS = 8
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def is_on_time(timestamp: datetime) -> bool:
+    return timestamp <= timestamp.replace(hour=8, minute=5, second=0)
+
+
+def _upsert(db: Session, rows: List[dict], increment: bool = False):
+    if not rows:
+        return
+    table = models.ClassroomWeeklyRollup.__table__
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(table).values(rows)
+    counters = ("session_count", "on_time_count", "late_count")
+    if increment:
+        set_ = {c: table.c[c] + stmt.excluded[c] for c in counters}
+    else:
+        set_ = {c: stmt.excluded[c] for c in counters}
+    db.execute(stmt.on_conflict_do_update(index_elements=[table.c.classroom_id, table.c.week_start], set_=set_))
+
+
+def record_first_check_in(db: Session, classroom_id: int, timestamp: datetime):
+    """
+    Đường nhanh cho điểm danh trực tiếp: lượt đầu tiên trong ngày chỉ cộng thêm một vào tuần
+    của nó (nếu ngày đó có lịch học), không tính lại cả tuần.
+    """
+    scheduled = db.query(models.Schedule.id).filter(
+        models.Schedule.classroom_id == classroom_id,
+        models.Schedule.class_date == timestamp.date(),
+    ).first()
+    if scheduled is None:
+        return
+    on_time = is_on_time(timestamp)
+    _upsert(db, [{
+        "classroom_id": classroom_id,
+        "week_start": week_start(timestamp.date()),
+        "session_count": 0,
+        "on_time_count": 1 if on_time else 0,
+        "late_count": 0 if on_time else 1,
+    }], increment=True)
+
+
+def _compute(db: Session, classroom_id: int, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """{week_start: [session_count, on_time_count, late_count]} cho các buổi học trong [start, end]."""
+    query = db.query(models.Schedule.class_date).filter(models.Schedule.classroom_id == classroom_id)
+    if start:
+        query = query.filter(models.Schedule.class_date >= start)
+    if end:
+        query = query.filter(models.Schedule.class_date <= end)
+    class_dates = [d for (d,) in query]
+    if not class_dates:
+        return {}
+
+    student_ids = [sid for (sid,) in db.query(models.Student.id).filter(models.Student.classroom_id == classroom_id)]
+    first_checkins = attendance_partitions.load_first_checkins(db, student_ids, min(class_dates), max(class_dates))
+    scheduled = set(class_dates)
+
+    weeks = defaultdict(lambda: [0, 0, 0])
+    for class_date in class_dates:
+        weeks[week_start(class_date)][0] += 1
+    for (_, day), (timestamp, _) in first_checkins.items():
+        if day in scheduled:
+            weeks[week_start(day)][1 if is_on_time(timestamp) else 2] += 1
+    return weeks
+
+
+def _replace(db: Session, classroom_id: int, weeks: dict, week_starts: Optional[Iterable[date]] = None):
+    rollup = models.ClassroomWeeklyRollup
+    stmt = delete(rollup).where(rollup.classroom_id == classroom_id)
+    if week_starts is not None:
+        stmt = stmt.where(rollup.week_start.in_(list(week_starts)))
+    db.execute(stmt)
+    _upsert(db, [
+        {"classroom_id": classroom_id, "week_start": ws, "session_count": s, "on_time_count": o, "late_count": l}
+        for ws, (s, o, l) in weeks.items()
+    ])
+
+
+def refresh_weeks(db: Session, classroom_id: int, days: Iterable[date]):
+    """Tính lại các tuần chứa `days` (sau khi đổi lịch học, ghi log bù, sửa ghi chú...). Không commit."""
+    for ws in sorted({week_start(d) for d in days}):
+        _replace(db, classroom_id, _compute(db, classroom_id, ws, ws + timedelta(days=6)), [ws])
+
+
+def rebuild_classroom(db: Session, classroom_id: int):
+    """Tính lại mọi tuần của lớp (vd. sau khi xoá sinh viên cùng log của họ). Không commit."""
+    _replace(db, classroom_id, _compute(db, classroom_id))
+
+
+def rebuild(db: Session, classroom_ids: Optional[List[int]] = None) -> int:
+    if classroom_ids is None:
+        classroom_ids = [cid for (cid,) in db.query(models.Classroom.id)]
+    for classroom_id in classroom_ids:
+        rebuild_classroom(db, classroom_id)
+        db.commit()
+    return len(classroom_ids)
+
+
+def overview(db: Session, start_date: date, end_date: date) -> List[dict]:
+    """Một truy vấn cho mọi lớp: dòng tuần trong khoảng, kèm tên lớp và sĩ số hiện tại."""
+    rollup, classroom, student = models.ClassroomWeeklyRollup, models.Classroom, models.Student
+    student_counts = (
+        select(student.classroom_id, func.count(student.id).label("student_count"))
+        .group_by(student.classroom_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            classroom.id, classroom.name, rollup.week_start,
+            rollup.session_count, rollup.on_time_count, rollup.late_count,
+            func.coalesce(student_counts.c.student_count, 0),
+        )
+        .join(classroom, classroom.id == rollup.classroom_id)
+        .outerjoin(student_counts, student_counts.c.classroom_id == rollup.classroom_id)
+        .where(rollup.week_start >= week_start(start_date), rollup.week_start <= end_date)
+        .order_by(classroom.name, rollup.week_start)
+    )
+
+    result = []
+    for classroom_id, name, ws, sessions, on_time, late, students in rows:
+        expected = sessions * students
+        absent = max(expected - on_time - late, 0)
+
+        def rate(count):
+            return round(count / expected * 100, 2) if expected else 0.0
+
+        result.append({
+            "classroom_id": classroom_id,
+            "classroom_name": name,
+            "week_start": ws,
+            "session_count": sessions,
+            "student_count": students,
+            "on_time_count": on_time,
+            "late_count": late,
+            "absent_count": absent,
+            "present_rate": rate(on_time + late),
+            "on_time_rate": rate(on_time),
+            "late_rate": rate(late),
+            "absent_rate": rate(absent),
+        })
+    return result
+
+
+def check(db: Session, classroom_ids: Optional[List[int]] = None) -> List[dict]:
+    """So tổng của bảng tuần với generate_attendance_summary của từng lớp; trả về các lớp lệch."""
+    from main import generate_attendance_summary
+
+    if classroom_ids is None:
+        classroom_ids = [cid for (cid,) in db.query(models.Classroom.id)]
+
+    rollup = models.ClassroomWeeklyRollup
+    mismatches = []
+    for classroom_id in classroom_ids:
+        summary = generate_attendance_summary(classroom_id, db)
+        expected = {
+            "on_time": sum(s["on_time_count"] for s in summary),
+            "late": sum(s["late_count"] for s in summary),
+            "absent": sum(s["absent_count"] for s in summary),
+        }
+        sessions, on_time, late = db.query(
+            func.coalesce(func.sum(rollup.session_count), 0),
+            func.coalesce(func.sum(rollup.on_time_count), 0),
+            func.coalesce(func.sum(rollup.late_count), 0),
+        ).filter(rollup.classroom_id == classroom_id).one()
+        students = db.query(func.count(models.Student.id)).filter(models.Student.classroom_id == classroom_id).scalar()
+        actual = {"on_time": on_time, "late": late, "absent": sessions * students - on_time - late if summary else 0}
+        if actual != expected:
+            mismatches.append({"classroom_id": classroom_id, "expected": expected, "rollup": actual})
+    return mismatches
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Tính lại và kiểm tra bảng thống kê điểm danh theo tuần.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = commands.add_parser("rebuild", help="Tính lại từ log điểm danh.")
+    rebuild_parser.add_argument("--classroom-id", type=int, action="append")
+
+    check_parser = commands.add_parser("check", help="So với thống kê theo từng lớp.")
+    check_parser.add_argument("--classroom-id", type=int, action="append")
+    check_parser.add_argument("--fix", action="store_true", help="Tính lại các lớp bị lệch.")
+
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            count = rebuild(db, args.classroom_id)
+            logger.info(f"Đã tính lại thống kê tuần cho {count} lớp.")
+        elif args.command == "check":
+            mismatches = check(db, args.classroom_id)
+            for m in mismatches:
+                logger.warning(f"Lớp {m['classroom_id']} lệch: tổng hợp {m['rollup']}, theo lớp {m['expected']}")
+            if mismatches and args.fix:
+                rebuild(db, [m["classroom_id"] for m in mismatches])
+                logger.info(f"Đã tính lại {len(mismatches)} lớp.")
+            elif mismatches:
+                raise SystemExit(1)
+            else:
+                logger.info("Thống kê tuần khớp với thống kê theo lớp.")
+    finally:
+        db.close()
@@ -0,0 +1,153 @@
+import random
+import string
+import logging
+import argparse
+from datetime import datetime, timedelta, date
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import models
+import security
+import change_tracking
+import rollups
+import attendance_partitions
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def scheduled_wednesdays(today: date, num_sessions: int) -> List[date]:
+    scheduled_dates = []
+    for i in range(num_sessions * 7):
+        current_date = today - timedelta(days=i)
+        if current_date.weekday() == 2:
+            scheduled_dates.append(current_date)
+        if len(scheduled_dates) >= num_sessions:
+            break
+    return scheduled_dates
+
+
+def random_check_in(class_date: date, rng: random.Random) -> Optional[dict]:
+    """Tỷ lệ 60% đúng giờ, 20% muộn, 20% vắng."""
+    rand_num = rng.random()
+    base_time = datetime.combine(class_date, datetime.min.time())
+    if rand_num < 0.6:
+        return {"timestamp": base_time.replace(hour=7, minute=rng.randint(30, 59))}
+    elif rand_num < 0.8:
+        return {"timestamp": base_time.replace(hour=8, minute=rng.randint(6, 59)), "note": "Đi muộn"}
+    return None
+
+
+def seed_classroom_data(
+    db: Session,
+    classroom: models.Classroom,
+    student_names: Optional[List[str]] = None,
+    num_sessions: int = 15,
+    code_start: int = 1001,
+    rng: Optional[random.Random] = None,
+) -> List[models.Student]:
+    rng = rng or random.Random()
+    student_names = student_names or list(string.ascii_uppercase)
+
+    created_students = [
+        models.Student(
+            name=name,
+            student_code=f"ID{code_start + i}",
+            reference_image_path="placeholder.jpg",
+            classroom_id=classroom.id
+        )
+        for i, name in enumerate(student_names)
+    ]
+    db.add_all(created_students)
+    db.flush()
+    logger.info(f"Đã tạo {len(created_students)} sinh viên mẫu cho lớp {classroom.id}.")
+
+    today = (datetime.utcnow() + timedelta(hours=7)).date()
+    scheduled_dates = scheduled_wednesdays(today, num_sessions)
+
+    if scheduled_dates:
+        db.execute(insert(models.Schedule), [
+            {"class_date": class_date, "classroom_id": classroom.id} for class_date in scheduled_dates
+        ])
+    logger.info(f"Đã tạo lịch học cho {len(scheduled_dates)} buổi vào các ngày thứ Tư.")
+
+    log_rows = []
+    for class_date in scheduled_dates:
+        for student in created_students:
+            check_in = random_check_in(class_date, rng)
+            if check_in:
+                log_rows.append({
+                    "student_id": student.id,
+                    "timestamp": check_in["timestamp"],
+                    "status": "PRESENT",
+                    "note": check_in.get("note"),
+                })
+    if log_rows:
+        db.execute(insert(models.AttendanceLog), log_rows)
+    change_tracking.mark_changed(db, [change_tracking.classroom_scope(classroom.id)])
+    rollups.rebuild_classroom(db, classroom.id)
+
+    return created_students
+
+
+def seed_default_accounts(db: Session) -> models.Classroom:
+    admin_username = "admin"
+    if not db.query(models.Admin).filter(models.Admin.username == admin_username).first():
+        hashed_pass = security.hash_password("1")
+        db.add(models.Admin(username=admin_username, hashed_password=hashed_pass))
+        print(f"Tạo tài khoản System Admin '{admin_username}' thành công!")
+
+    classroom_id_to_check = 1
+    classroom_name = f"Trạm Điểm Danh #{classroom_id_to_check}"
+    classroom = db.query(models.Classroom).filter(models.Classroom.id == classroom_id_to_check).first()
+    if not classroom:
+        classroom = models.Classroom(id=classroom_id_to_check, name=classroom_name)
+        db.add(classroom)
+        db.flush()
+        print(f"Tạo lớp học/trạm mặc định '{classroom_name}' với ID={classroom.id} thành công!")
+
+    teacher_username = "teacher01"
+    if not db.query(models.Teacher).filter(models.Teacher.username == teacher_username).first():
+        hashed_pass = security.hash_password("1")
+        db.add(models.Teacher(
+            username=teacher_username,
+            hashed_password=hashed_pass,
+            classroom_id=classroom.id
+        ))
+        print(f"Tạo tài khoản Teacher '{teacher_username}' (pass: '1') và gán vào lớp '{classroom.name}' thành công!")
+
+    return classroom
+
+
+def init_db(with_demo_data: bool = True):
+    attendance_partitions.create_schema()
+    print("Database tables checked/created.")
+
+    db = SessionLocal()
+    try:
+        classroom = seed_default_accounts(db)
+
+        student_count = db.query(models.Student).filter(models.Student.classroom_id == classroom.id).count()
+        if with_demo_data and student_count == 0:
+            print("Lớp học trống, tạo dữ liệu mẫu thực tế...")
+            seed_classroom_data(db, classroom)
+            logger.info("Đã tạo dữ liệu điểm danh ngẫu nhiên theo tỷ lệ mới (60-20-20).")
+
+        db.commit()
+        logger.info("Initial data seeding complete.")
+    except Exception as e:
+        logger.error(f"Lỗi trong quá trình khởi tạo dữ liệu: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Tạo bảng và dữ liệu mặc định (admin, teacher01, lớp #1).")
+    parser.add_argument("--no-demo", action="store_true", help="Không tạo sinh viên và log điểm danh mẫu.")
+    args = parser.parse_args()
+    init_db(with_demo_data=not args.no_demo)
@@ -0,0 +1,96 @@
+"""
+Test chạy trên DB SQLite tạm (PRAGMA foreign_keys bật như khi chạy thật), không cần model nhận dạng.
+
+    cd backend && python -m pytest -q
+
+DATABASE_URL phải được đặt trước khi import database/main, nên phần cấu hình nằm ngay đầu file.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="attendance-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/test.db"
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ["EMBEDDING_DB_PATH"] = os.path.join(_TMP_DIR, "embeddings")
+os.environ["GALLERY_PRELOAD_INTERVAL"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import attendance_partitions  # noqa: E402
+import database  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import security  # noqa: E402
+
+PASSWORD = "1"
+
+
+@pytest.fixture
+def db():
+    # Mỗi test một schema mới.
+    database.Base.metadata.drop_all(database.engine)
+    attendance_partitions.create_schema(database.engine)
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db, tmp_path, monkeypatch):
+    # Background task xoá lớp/sinh viên dọn ảnh trong IMAGE_DB_PATH; không chạm ảnh thật của máy chạy test.
+    monkeypatch.setattr(main, "IMAGE_DB_PATH", tmp_path / "images")
+    # Không dùng `with TestClient(...)` để bỏ qua startup (nạp model, nạp trước gallery).
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def classroom(db):
+    """Lớp có giáo viên teacher01 và ba sinh viên SV01..SV03."""
+    classroom = models.Classroom(name="Lớp test")
+    db.add(classroom)
+    db.flush()
+    db.add(models.Teacher(username="teacher01", hashed_password=security.hash_password(PASSWORD), classroom_id=classroom.id))
+    for index in range(1, 4):
+        db.add(models.Student(student_code=f"SV{index:02d}", name=f"Sinh viên {index}", classroom_id=classroom.id))
+    db.commit()
+    return classroom
+
+
+@pytest.fixture
+def students(db, classroom):
+    return db.query(models.Student).filter_by(classroom_id=classroom.id).order_by(models.Student.student_code).all()
+
+
+@pytest.fixture
+def teacher_headers(client, classroom):
+    response = client.post("/api/teacher/login", json={"username": "teacher01", "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def admin_headers(client, db):
+    db.add(models.Admin(username="admin", hashed_password=security.hash_password(PASSWORD)))
+    db.commit()
+    response = client.post("/api/admin/login", json={"username": "admin", "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def add_schedules(db, classroom_id, *days):
+    db.add_all(models.Schedule(classroom_id=classroom_id, class_date=day) for day in days)
+    db.commit()
+
+
+def add_log(db, student_id, timestamp: datetime, note=None, status=models.ATTENDANCE_PRESENT):
+    log = models.AttendanceLog(student_id=student_id, timestamp=timestamp, note=note, status=status)
+    db.add(log)
+    db.commit()
+    return log
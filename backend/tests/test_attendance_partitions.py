@@ -0,0 +1,88 @@
+from datetime import date, datetime
+
+from sqlalchemy import inspect, text
+
+import attendance_partitions
+import database
+import models
+from conftest import add_log, add_schedules
+
+# attendance_daily_summaries trước user-044: chưa có cột status.
+_PRE_044_SUMMARIES_DDL = """
+CREATE TABLE attendance_daily_summaries (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    class_date DATE NOT NULL,
+    check_in_time DATETIME NOT NULL,
+    note VARCHAR,
+    CONSTRAINT _student_class_date_uc UNIQUE (student_id, class_date)
+)
+"""
+
+
+def summary_columns():
+    return {column["name"] for column in inspect(database.engine).get_columns("attendance_daily_summaries")}
+
+
+def test_migrate_summary_status_upgrades_pre_044_schema(db, students):
+    db.close()
+    with database.engine.begin() as conn:
+        conn.execute(text("DROP TABLE attendance_daily_summaries"))
+        conn.execute(text(_PRE_044_SUMMARIES_DDL))
+        conn.execute(
+            text("INSERT INTO attendance_daily_summaries (student_id, class_date, check_in_time, note) VALUES (:s, :d, :t, 'cũ')"),
+            {"s": students[0].id, "d": date(2024, 12, 4), "t": datetime(2024, 12, 4, 7, 50)},
+        )
+
+    # create_schema không tự sửa bảng đã có.
+    attendance_partitions.create_schema(database.engine)
+    assert "status" not in summary_columns()
+
+    assert attendance_partitions.migrate_summary_status(database.engine) is True
+    assert "status" in summary_columns()
+    assert attendance_partitions.migrate_summary_status(database.engine) is False
+
+    archived = db.query(models.AttendanceDailySummary).one()
+    assert (archived.status, archived.note) == (models.ATTENDANCE_PRESENT, "cũ")
+    add_log(db, students[1].id, datetime(2024, 12, 4, 7, 55))
+    attendance_partitions.archive_before(db, date(2025, 1, 1))
+    assert db.query(models.AttendanceDailySummary).count() == 2
+
+
+def test_archive_before_keeps_grid_and_history(db, client, classroom, students, teacher_headers):
+    feb_3, feb_4, mar_3 = date(2025, 2, 3), date(2025, 2, 4), date(2025, 3, 3)
+    add_schedules(db, classroom.id, feb_3, feb_4, mar_3)
+    add_log(db, students[0].id, datetime(2025, 2, 3, 7, 50))
+    add_log(db, students[0].id, datetime(2025, 2, 3, 9, 0))
+    add_log(db, students[1].id, datetime(2025, 2, 3, 8, 30), note="Kẹt xe")
+    add_log(db, students[0].id, datetime(2025, 2, 4), note="Xin phép", status=models.ATTENDANCE_NOTE)
+    add_log(db, students[2].id, datetime(2025, 2, 4, 7, 55))
+    add_log(db, students[2].id, datetime(2025, 2, 4), note="Điểm danh hộ", status=models.ATTENDANCE_ABSENT)
+    add_log(db, students[1].id, datetime(2025, 3, 3, 7, 58))
+
+    def snapshot():
+        grid = client.get("/api/teacher/attendance-grid", headers=teacher_headers).json()
+        history = {
+            s.id: client.get(f"/api/teacher/student-attendance-details/{s.id}", headers=teacher_headers).json()
+            for s in students
+        }
+        return grid, history
+
+    before = snapshot()
+
+    assert attendance_partitions.archive_before(db, date(2025, 3, 1)) == 4
+
+    assert db.query(models.AttendanceLog).count() == 1
+    summaries = {
+        (row.student_id, row.class_date): (row.status, row.check_in_time, row.note)
+        for row in db.query(models.AttendanceDailySummary)
+    }
+    assert summaries == {
+        (students[0].id, feb_3): (models.ATTENDANCE_PRESENT, datetime(2025, 2, 3, 7, 50), None),
+        (students[1].id, feb_3): (models.ATTENDANCE_PRESENT, datetime(2025, 2, 3, 8, 30), "Kẹt xe"),
+        (students[0].id, feb_4): (models.ATTENDANCE_NOTE, datetime(2025, 2, 4), "Xin phép"),
+        (students[2].id, feb_4): (models.ATTENDANCE_ABSENT, datetime(2025, 2, 4), "Điểm danh hộ"),
+    }
+    assert snapshot() == before
+    # Chạy lại không tạo thêm dòng tóm tắt.
+    assert attendance_partitions.archive_before(db, date(2025, 3, 1)) == 0
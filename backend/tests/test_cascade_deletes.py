@@ -0,0 +1,106 @@
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+import cascade_deletes
+import database
+import models
+import rollups
+import security
+from conftest import add_log, add_schedules
+
+DAY = date(2025, 3, 5)
+
+
+def seed_classroom_rows(db, classroom_id, student_ids):
+    add_schedules(db, classroom_id, DAY)
+    for student_id in student_ids:
+        add_log(db, student_id, datetime(2025, 3, 5, 7, 50))
+        db.add(models.AttendanceDailySummary(student_id=student_id, class_date=date(2024, 12, 4), check_in_time=datetime(2024, 12, 4, 7, 50)))
+    db.add(models.StationSyncEvent(
+        station_id="station-1", client_event_id=f"e{classroom_id}", classroom_id=classroom_id,
+        student_code="SV01", captured_at=datetime(2025, 3, 5, 7, 50), status="RECORDED",
+    ))
+    db.commit()
+    rollups.rebuild(db)
+
+
+def count_rows(db, model, **filters):
+    return db.query(model).filter_by(**filters).count()
+
+
+def test_sqlite_connections_enforce_foreign_keys():
+    with database.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+def test_delete_classroom_cascades_to_every_child_table(db, client, classroom, students, admin_headers):
+    other = models.Classroom(name="Lớp khác")
+    db.add(other)
+    db.flush()
+    other_student = models.Student(student_code="SV01", name="Sinh viên khác", classroom_id=other.id)
+    db.add(other_student)
+    db.add(models.Teacher(username="teacher02", hashed_password=security.hash_password("1"), classroom_id=other.id))
+    db.commit()
+    seed_classroom_rows(db, classroom.id, [s.id for s in students])
+    seed_classroom_rows(db, other.id, [other_student.id])
+    classroom_id, other_id, other_student_id = classroom.id, other.id, other_student.id
+    student_ids = [s.id for s in students]
+
+    assert client.delete(f"/api/admin/classrooms/{classroom_id}", headers=admin_headers).status_code == 204
+
+    db.expire_all()
+    assert count_rows(db, models.Classroom, id=classroom_id) == 0
+    assert count_rows(db, models.Teacher, classroom_id=classroom_id) == 0
+    assert count_rows(db, models.Student, classroom_id=classroom_id) == 0
+    assert count_rows(db, models.Schedule, classroom_id=classroom_id) == 0
+    assert count_rows(db, models.ClassroomWeeklyRollup, classroom_id=classroom_id) == 0
+    assert count_rows(db, models.StationSyncEvent, classroom_id=classroom_id) == 0
+    assert db.query(models.AttendanceLog).filter(models.AttendanceLog.student_id.in_(student_ids)).count() == 0
+    assert db.query(models.AttendanceDailySummary).filter(models.AttendanceDailySummary.student_id.in_(student_ids)).count() == 0
+
+    # Lớp khác không bị ảnh hưởng.
+    assert count_rows(db, models.Teacher, classroom_id=other_id) == 1
+    assert count_rows(db, models.AttendanceLog, student_id=other_student_id) == 1
+    assert count_rows(db, models.AttendanceDailySummary, student_id=other_student_id) == 1
+    assert count_rows(db, models.ClassroomWeeklyRollup, classroom_id=other_id) == 1
+
+
+def test_delete_missing_classroom_returns_404(db, client, admin_headers):
+    assert client.delete("/api/admin/classrooms/999", headers=admin_headers).status_code == 404
+
+
+def test_delete_students_removes_their_logs_only(db, classroom, students):
+    seed_classroom_rows(db, classroom.id, [s.id for s in students])
+    students[0].reference_image_path = "database/images/1/SV01_a.jpg"
+    db.commit()
+    deleted_id, kept_id = students[0].id, students[1].id
+
+    image_paths = cascade_deletes.delete_students(db, classroom.id, [deleted_id, 999])
+    db.commit()
+
+    assert image_paths == ["database/images/1/SV01_a.jpg"]
+    assert count_rows(db, models.AttendanceLog, student_id=deleted_id) == 0
+    assert count_rows(db, models.AttendanceDailySummary, student_id=deleted_id) == 0
+    assert count_rows(db, models.AttendanceLog, student_id=kept_id) == 1
+    assert rollups.check(db) == []
+
+
+def test_delete_students_ignores_other_classrooms(db, classroom, students):
+    assert cascade_deletes.delete_students(db, classroom.id + 1, [students[0].id]) == []
+    db.commit()
+    assert count_rows(db, models.Student, id=students[0].id) == 1
+
+
+def test_remove_files_stays_inside_image_root(tmp_path):
+    root = tmp_path / "images"
+    (root / "1").mkdir(parents=True)
+    inside = root / "1" / "SV01_a.jpg"
+    outside = tmp_path / "placeholder.jpg"
+    inside.write_bytes(b"x")
+    outside.write_bytes(b"x")
+
+    cascade_deletes.remove_files([str(inside), str(outside), None], root)
+
+    assert not inside.exists()
+    assert outside.exists()
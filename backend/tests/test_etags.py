@@ -0,0 +1,104 @@
+from datetime import date, datetime
+
+import change_tracking
+import models
+import security
+from conftest import add_log, add_schedules
+
+DAY = date(2025, 3, 5)
+
+
+def test_unchanged_grid_returns_304(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    first = client.get("/api/teacher/attendance-grid", headers=teacher_headers)
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/teacher/attendance-grid", headers={**teacher_headers, "If-None-Match": etag})
+
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+
+def test_check_in_changes_etag(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    etag = client.get("/api/teacher/attendance-summary", headers=teacher_headers).headers["ETag"]
+
+    add_log(db, students[0].id, datetime(2025, 3, 5, 7, 30))
+    response = client.get("/api/teacher/attendance-summary", headers={**teacher_headers, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert next(r for r in response.json() if r["student_id"] == students[0].id)["on_time_count"] == 1
+
+
+def test_bulk_grid_edit_changes_etag(db, client, classroom, students, teacher_headers):
+    # Sửa hàng loạt dùng SQL trực tiếp, không qua after_flush, nên phải tự tăng phiên bản.
+    add_schedules(db, classroom.id, DAY)
+    etag = client.get("/api/teacher/attendance-grid", headers=teacher_headers).headers["ETag"]
+
+    client.post(
+        "/api/attendance-grid/edits",
+        json={"edits": [{"student_id": students[0].id, "class_date": DAY.isoformat(), "status": "PRESENT"}]},
+        headers=teacher_headers,
+    )
+    response = client.get("/api/teacher/attendance-grid", headers={**teacher_headers, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_other_classroom_change_keeps_etag(db, client, classroom, students, admin_headers):
+    other = client.post("/api/admin/classrooms", json={"name": "Lớp khác"}, headers=admin_headers).json()
+    etag = client.get(f"/api/admin/attendance-grid/{classroom.id}", headers=admin_headers).headers["ETag"]
+
+    client.post(f"/api/admin/schedules?classroom_id={other['id']}", json={"class_date": DAY.isoformat()}, headers=admin_headers)
+    response = client.get(f"/api/admin/attendance-grid/{classroom.id}", headers={**admin_headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def counter(db, scope):
+    db.expire_all()
+    row = db.get(models.ChangeCounter, scope)
+    return row.version if row else 0
+
+
+def test_counter_bumped_once_per_commit(db, classroom, students):
+    scope = change_tracking.classroom_scope(classroom.id)
+    before = counter(db, scope)
+
+    # Mỗi flush đều đổi lớp, cộng thêm một lần đánh dấu thủ công, nhưng chỉ commit một lần.
+    for log in [models.AttendanceLog(student_id=s.id, timestamp=datetime(2025, 3, 5, 7, 30)) for s in students]:
+        db.add(log)
+        db.flush()
+    change_tracking.mark_changed(db, [scope])
+    db.commit()
+
+    assert counter(db, scope) == before + 1
+
+
+def test_rolled_back_changes_do_not_bump(db, classroom, students):
+    scope = change_tracking.classroom_scope(classroom.id)
+    before = counter(db, scope)
+
+    db.add(models.AttendanceLog(student_id=students[0].id, timestamp=datetime(2025, 3, 5, 7, 30)))
+    db.flush()
+    db.rollback()
+    db.commit()
+
+    assert counter(db, scope) == before
+
+
+def test_changes_outside_response_fields_keep_list_etags(db, classroom):
+    teachers_before = counter(db, change_tracking.TABLE_TEACHERS)
+    classrooms_before = counter(db, change_tracking.TABLE_CLASSROOMS)
+
+    teacher = db.query(models.Teacher).filter_by(classroom_id=classroom.id).one()
+    teacher.hashed_password = security.hash_password("2")
+    db.commit()
+    classroom.name = "Lớp đổi tên"
+    db.commit()
+
+    assert counter(db, change_tracking.TABLE_TEACHERS) == teachers_before
+    assert counter(db, change_tracking.TABLE_CLASSROOMS) == classrooms_before + 1
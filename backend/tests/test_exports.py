@@ -0,0 +1,107 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from xml.etree import ElementTree
+
+import pytest
+
+import attendance_partitions
+import exports
+import models
+from conftest import add_log, add_schedules
+
+ARCHIVED_DAY, DAY = date(2025, 2, 3), date(2025, 3, 5)
+_NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def read_csv(content: bytes):
+    return list(csv.reader(io.StringIO(content.decode("utf-8-sig"))))
+
+
+def read_xlsx(content: bytes):
+    """Đọc sheet đầu tiên thành list các dòng chuỗi ('' cho ô trống), không cần openpyxl."""
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        names = set(archive.namelist())
+        shared = []
+        if "xl/sharedStrings.xml" in names:
+            root = ElementTree.fromstring(archive.read("xl/sharedStrings.xml"))
+            shared = ["".join(t.text or "" for t in si.iter(f"{{{_NS['x']}}}t")) for si in root.findall("x:si", _NS)]
+        sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+
+    rows = []
+    for row in sheet.find("x:sheetData", _NS).findall("x:row", _NS):
+        values = {}
+        for cell in row.findall("x:c", _NS):
+            column = "".join(ch for ch in cell.get("r") if ch.isalpha())
+            kind = cell.get("t")
+            if kind == "s":
+                value = shared[int(cell.find("x:v", _NS).text)]
+            elif kind == "inlineStr":
+                value = "".join(t.text or "" for t in cell.iter(f"{{{_NS['x']}}}t"))
+            else:
+                raw = cell.find("x:v", _NS)
+                value = "" if raw is None else raw.text
+                if value.endswith(".0"):
+                    value = value[:-2]
+            values[ord(column) - ord("A")] = value
+        rows.append([values.get(i, "") for i in range(len(exports.COLUMNS))])
+    return rows
+
+
+@pytest.fixture
+def marked_cells(db, classroom, students):
+    add_schedules(db, classroom.id, ARCHIVED_DAY, DAY)
+    sv01, sv02, sv03 = students
+    # Ngày đã lưu trữ: SV01 bị đánh dấu vắng dù có điểm danh.
+    add_log(db, sv01.id, datetime(2025, 2, 3, 7, 50))
+    add_log(db, sv01.id, datetime(2025, 2, 3), note="Điểm danh hộ", status=models.ATTENDANCE_ABSENT)
+    add_log(db, sv02.id, datetime(2025, 2, 3, 7, 55))
+    attendance_partitions.archive_before(db, date(2025, 3, 1))
+
+    add_log(db, sv01.id, datetime(2025, 3, 5, 7, 45))
+    add_log(db, sv01.id, datetime(2025, 3, 5), note="Vắng, có lý do", status=models.ATTENDANCE_ABSENT)
+    add_log(db, sv02.id, datetime(2025, 3, 5, 8, 30))
+    add_log(db, sv02.id, datetime(2025, 3, 5), note="Báo đến muộn", status=models.ATTENDANCE_NOTE)
+    add_log(db, sv03.id, datetime(2025, 3, 5), note="Ốm", status=models.ATTENDANCE_NOTE)
+    return classroom
+
+
+def expected_rows(classroom):
+    rows = [
+        ("SV01", ARCHIVED_DAY, "ABSENT", "", "Điểm danh hộ"),
+        ("SV01", DAY, "ABSENT", "", "Vắng, có lý do"),
+        ("SV02", ARCHIVED_DAY, "PRESENT", "07:55:00", ""),
+        ("SV02", DAY, "LATE", "08:30:00", "Báo đến muộn"),
+        ("SV03", ARCHIVED_DAY, "ABSENT", "", ""),
+        ("SV03", DAY, "ABSENT", "", "Ốm"),
+    ]
+    return [
+        [str(classroom.id), classroom.name, code, f"Sinh viên {code[-1]}", day.isoformat(), status, check_in, note]
+        for code, day, status, check_in, note in rows
+    ]
+
+
+@pytest.mark.parametrize("format, read", [("csv", read_csv), ("xlsx", read_xlsx)])
+def test_export_columns_for_marked_cells(client, admin_headers, marked_cells, format, read):
+    response = client.get(
+        "/api/admin/export/attendance",
+        params={"format": format, "classroom_ids": marked_cells.id},
+        headers=admin_headers,
+    )
+
+    assert response.status_code == 200
+    header, *rows = read(response.content)
+    assert header == exports.COLUMNS
+    assert rows == expected_rows(marked_cells)
+
+
+def test_export_date_range_keeps_markers(client, admin_headers, marked_cells):
+    response = client.get(
+        "/api/admin/export/attendance",
+        params={"classroom_ids": marked_cells.id, "start_date": DAY.isoformat(), "end_date": DAY.isoformat()},
+        headers=admin_headers,
+    )
+
+    rows = read_csv(response.content)[1:]
+    assert rows == [row for row in expected_rows(marked_cells) if row[4] == DAY.isoformat()]
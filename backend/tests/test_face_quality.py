@@ -0,0 +1,77 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import face_quality
+
+# Toạ độ theo ảnh crop 128x128, hai mắt nằm ngang.
+FRONTAL = {"rightEye": (40, 50), "leftEye": (80, 50), "noseTip": (60, 70)}
+
+
+def textured(size=128, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(60, 200, (size, size, 3), dtype=np.uint8)
+
+
+def landmarks(**points):
+    items = [{"name": name, "x": x, "y": y} for name, (x, y) in dict(FRONTAL, **points).items()]
+    return face_quality.parse_landmarks(json.dumps(items))
+
+
+def test_sharp_frontal_face_passes():
+    result = face_quality.assess_face_quality(textured(), landmarks())
+
+    assert result.ok
+    assert set(result.metrics) >= {"brightness", "sharpness", "roll", "yaw_ratio"}
+
+
+@pytest.mark.parametrize("img, reason", [
+    (None, face_quality.REASON_UNREADABLE),
+    (textured(size=32), face_quality.REASON_TOO_SMALL),
+    (np.full((128, 128, 3), 20, dtype=np.uint8), face_quality.REASON_TOO_DARK),
+    (np.full((128, 128, 3), 240, dtype=np.uint8), face_quality.REASON_TOO_BRIGHT),
+    (cv2.GaussianBlur(textured(), (0, 0), 6), face_quality.REASON_TOO_BLURRY),
+])
+def test_rejects_bad_crops(img, reason):
+    result = face_quality.assess_face_quality(img)
+
+    assert not result.ok
+    assert result.reason == reason
+    assert result.to_detail()["retry"] == (reason != face_quality.REASON_UNREADABLE)
+
+
+def test_blur_is_measured_as_low_laplacian_variance():
+    sharp = face_quality.assess_face_quality(textured())
+    blurred = face_quality.assess_face_quality(cv2.GaussianBlur(textured(), (0, 0), 6))
+
+    assert blurred.metrics["sharpness"] < face_quality.MIN_SHARPNESS < sharp.metrics["sharpness"]
+
+
+@pytest.mark.parametrize("points", [
+    {"noseTip": (95, 70)},  # quay ngang: mũi lệch xa trung điểm hai mắt
+    {"leftEye": (80, 90), "noseTip": (60, 80)},  # nghiêng đầu ~45°
+])
+def test_rejects_large_head_pose(points):
+    result = face_quality.assess_face_quality(textured(), landmarks(**points))
+
+    assert result.reason == face_quality.REASON_BAD_POSE
+
+
+def test_recognize_rejects_low_quality_frame_with_reason(client, classroom, tmp_path):
+    gallery = tmp_path / "images" / str(classroom.id)
+    gallery.mkdir(parents=True)
+    (gallery / "SV01_a.jpg").write_bytes(b"x")
+    _, jpeg = cv2.imencode(".jpg", np.full((128, 128, 3), 20, dtype=np.uint8))
+
+    response = client.post(
+        "/api/recognize",
+        data={"classroom_id": classroom.id},
+        files={"file": ("frame.jpg", jpeg.tobytes(), "image/jpeg")},
+    )
+
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail == face_quality.assess_face_quality(face_quality.decode_image(jpeg.tobytes())).to_detail()
+    assert (detail["code"], detail["reason"], detail["retry"]) == ("FACE_QUALITY_REJECTED", face_quality.REASON_TOO_DARK, True)
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import gallery_cache
+
+
+def fake_gallery(rows, codes=("SV01",)):
+    return SimpleNamespace(
+        embeddings=np.zeros((rows, 128), dtype=np.float32),
+        student_codes=list(codes),
+        sources=[(f"images/{code}.jpg", 0.0) for code in codes],
+    )
+
+
+GALLERY = fake_gallery(4)
+SIZE = gallery_cache.gallery_size(GALLERY)
+
+
+def resident(cache, classroom_ids=range(1, 10)):
+    return [classroom_id for classroom_id in classroom_ids if classroom_id in cache]
+
+
+def test_gallery_size_counts_embeddings_and_metadata():
+    assert SIZE == 4 * 128 * 4 + (len("SV01") + 50) + (len("images/SV01.jpg") + 80)
+
+
+def test_evicts_least_recently_used_first():
+    cache = gallery_cache.GalleryCache(budget_bytes=3 * SIZE)
+    for classroom_id in (1, 2, 3):
+        cache.put(classroom_id, GALLERY)
+    cache.get(1)
+    cache.peek(2)  # peek không đổi thứ tự LRU
+
+    cache.put(4, GALLERY)
+    assert resident(cache) == [1, 3, 4]
+
+    cache.put(5, GALLERY)
+    assert resident(cache) == [1, 4, 5]
+
+
+def test_resident_bytes_after_eviction_and_reload():
+    cache = gallery_cache.GalleryCache(budget_bytes=3 * SIZE)
+    big = fake_gallery(12)
+    cache.put(1, GALLERY)
+    cache.put(2, GALLERY)
+    assert cache.resident_bytes == 2 * SIZE
+
+    # Lớp 1 được nạp lại với gallery lớn hơn: thay chỗ cũ rồi đẩy lớp 2 ra.
+    cache.put(1, big)
+    assert resident(cache) == [1]
+    assert cache.resident_bytes == gallery_cache.gallery_size(big)
+
+    cache.put(2, GALLERY)
+    cache.discard(1)
+    assert cache.resident_bytes == SIZE
+    cache.discard(1)
+    assert cache.resident_bytes == SIZE
+
+
+def test_gallery_larger_than_budget():
+    cache = gallery_cache.GalleryCache(budget_bytes=2 * SIZE)
+    huge = fake_gallery(64)
+    cache.put(1, GALLERY)
+
+    with pytest.raises(gallery_cache.BudgetExceeded):
+        cache.put(2, huge, evict=False)
+    assert resident(cache) == [1]
+    assert cache.resident_bytes == SIZE
+
+    # Khi nhận dạng thì vẫn giữ lớp vừa nạp, dù riêng nó đã vượt ngân sách.
+    cache.put(2, huge)
+    assert resident(cache) == [2]
+    assert cache.resident_bytes == gallery_cache.gallery_size(huge)
+
+
+def test_preload_stops_at_first_gallery_that_does_not_fit(monkeypatch):
+    cache = gallery_cache.GalleryCache(budget_bytes=2 * SIZE)
+    monkeypatch.setattr(gallery_cache, "scheduled_classroom_ids", lambda day: [1, 2, 3, 4])
+    warmed = []
+
+    def warm(classroom_id):
+        warmed.append(classroom_id)
+        cache.put(classroom_id, GALLERY, evict=False)
+        return True
+
+    assert gallery_cache.preload_scheduled(warm) == 2
+    assert warmed == [1, 2, 3]
+    assert resident(cache) == [1, 2]
@@ -0,0 +1,151 @@
+from datetime import date, datetime
+
+import attendance_partitions
+import main
+import models
+import rollups
+from conftest import add_log, add_schedules
+
+DAY = date(2025, 3, 5)
+
+
+def grid_cell(client, headers, student_id, day=DAY):
+    response = client.get("/api/teacher/attendance-grid", headers=headers)
+    assert response.status_code == 200
+    row = next(r for r in response.json()["attendance_data"] if r["student_id"] == student_id)
+    return row["logs_by_date"][day.isoformat()]
+
+
+def summary_row(client, headers, student_id):
+    response = client.get("/api/teacher/attendance-summary", headers=headers)
+    return next(r for r in response.json() if r["student_id"] == student_id)
+
+
+def edit(client, headers, *edits):
+    response = client.post("/api/attendance-grid/edits", json={"edits": list(edits)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["cells"]
+
+
+def test_note_on_absent_cell_keeps_cell_absent(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    student = students[0]
+
+    response = client.post(
+        "/api/attendance-note",
+        json={"student_id": student.id, "class_date": DAY.isoformat(), "note": "Xin phép nghỉ ốm"},
+        headers=teacher_headers,
+    )
+    assert response.status_code == 200
+
+    assert grid_cell(client, teacher_headers, student.id) == {"status": "ABSENT", "note": "Xin phép nghỉ ốm", "check_in_time": None}
+    assert summary_row(client, teacher_headers, student.id)["absent_count"] == 1
+    logs = db.query(models.AttendanceLog).filter_by(student_id=student.id).all()
+    assert [log.status for log in logs] == [models.ATTENDANCE_NOTE]
+
+    # Ghi chú qua API sửa hàng loạt cũng vậy, và sửa lại ghi chú không thêm dòng mới.
+    cells = edit(client, teacher_headers, {"student_id": student.id, "class_date": DAY.isoformat(), "note": "Nghỉ có phép"})
+    assert cells[0]["cell"] == {"status": "ABSENT", "note": "Nghỉ có phép", "check_in_time": None}
+    assert db.query(models.AttendanceLog).filter_by(student_id=student.id).count() == 1
+
+
+def test_check_in_after_note_counts_and_keeps_note(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    student = students[0]
+    edit(client, teacher_headers, {"student_id": student.id, "class_date": DAY.isoformat(), "note": "Báo đến muộn"})
+    add_log(db, student.id, datetime(2025, 3, 5, 9, 0))
+
+    assert grid_cell(client, teacher_headers, student.id) == {"status": "LATE", "note": "Báo đến muộn", "check_in_time": "09:00:00"}
+    assert summary_row(client, teacher_headers, student.id)["late_count"] == 1
+
+
+def test_absent_overrides_check_ins_without_deleting_them(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    student = students[0]
+    add_log(db, student.id, datetime(2025, 3, 5, 7, 50), note="Nhờ bạn điểm danh hộ")
+    add_log(db, student.id, datetime(2025, 3, 5, 10, 0))
+
+    cells = edit(client, teacher_headers, {"student_id": student.id, "class_date": DAY.isoformat(), "status": "ABSENT"})
+
+    assert cells[0]["cell"] == {"status": "ABSENT", "note": "Nhờ bạn điểm danh hộ", "check_in_time": None}
+    assert grid_cell(client, teacher_headers, student.id)["status"] == "ABSENT"
+    row = summary_row(client, teacher_headers, student.id)
+    assert (row["on_time_count"], row["absent_count"]) == (0, 1)
+    statuses = sorted(log.status for log in db.query(models.AttendanceLog).filter_by(student_id=student.id))
+    assert statuses == [models.ATTENDANCE_ABSENT, models.ATTENDANCE_PRESENT, models.ATTENDANCE_PRESENT]
+    assert rollups.check(db) == []
+
+    # Đánh dấu có mặt lại: ô đúng giờ, ghi chú vẫn còn.
+    cells = edit(client, teacher_headers, {"student_id": student.id, "class_date": DAY.isoformat(), "status": "PRESENT"})
+    assert cells[0]["cell"] == {"status": "PRESENT", "note": "Nhờ bạn điểm danh hộ", "check_in_time": "00:00:00"}
+    assert rollups.check(db) == []
+
+
+def test_absent_with_new_note_keeps_note(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    student = students[0]
+    add_log(db, student.id, datetime(2025, 3, 5, 8, 30))
+
+    cells = edit(client, teacher_headers, {
+        "student_id": student.id, "class_date": DAY.isoformat(), "status": "ABSENT", "note": "Bỏ về giữa giờ",
+    })
+    assert cells[0]["cell"] == {"status": "ABSENT", "note": "Bỏ về giữa giờ", "check_in_time": None}
+
+
+def test_absent_on_archived_day_updates_summary(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    student = students[0]
+    add_log(db, student.id, datetime(2025, 3, 5, 7, 45), note="Đúng giờ")
+    attendance_partitions.archive_before(db, date(2025, 4, 1))
+    assert db.query(models.AttendanceLog).count() == 0
+    assert grid_cell(client, teacher_headers, student.id)["status"] == "PRESENT"
+
+    cells = edit(client, teacher_headers, {"student_id": student.id, "class_date": DAY.isoformat(), "status": "ABSENT"})
+
+    assert cells[0]["cell"] == {"status": "ABSENT", "note": "Đúng giờ", "check_in_time": None}
+    archived = db.query(models.AttendanceDailySummary).filter_by(student_id=student.id).one()
+    db.refresh(archived)
+    assert (archived.status, archived.check_in_time) == (models.ATTENDANCE_ABSENT, datetime(2025, 3, 5, 7, 45))
+    assert summary_row(client, teacher_headers, student.id)["absent_count"] == 1
+    assert rollups.check(db) == []
+
+
+def test_archive_keeps_absent_override(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, DAY)
+    student = students[0]
+    add_log(db, student.id, datetime(2025, 3, 5, 7, 45))
+    edit(client, teacher_headers, {"student_id": student.id, "class_date": DAY.isoformat(), "status": "ABSENT", "note": "Vắng"})
+
+    attendance_partitions.archive_before(db, date(2025, 4, 1))
+
+    assert grid_cell(client, teacher_headers, student.id) == {"status": "ABSENT", "note": "Vắng", "check_in_time": None}
+
+
+def test_export_reports_overrides(db, client, classroom, students, teacher_headers, admin_headers):
+    add_schedules(db, classroom.id, DAY)
+    add_log(db, students[0].id, datetime(2025, 3, 5, 7, 45))
+    edit(
+        client, teacher_headers,
+        {"student_id": students[0].id, "class_date": DAY.isoformat(), "status": "ABSENT", "note": "Vắng"},
+        {"student_id": students[1].id, "class_date": DAY.isoformat(), "note": "Ốm"},
+    )
+
+    response = client.get("/api/admin/export/attendance", params={"classroom_ids": classroom.id}, headers=admin_headers)
+    lines = response.content.decode("utf-8-sig").splitlines()[1:]
+    by_code = {line.split(",")[2]: line.split(",")[5:] for line in lines}
+    assert by_code["SV01"] == ["ABSENT", "", "Vắng"]
+    assert by_code["SV02"] == ["ABSENT", "", "Ốm"]
+    assert by_code["SV03"] == ["ABSENT", "", ""]
+
+
+def test_live_check_in_on_absent_day_stays_absent(db, client, classroom, students, teacher_headers):
+    today = models.get_vietnam_time_naive().date()
+    add_schedules(db, classroom.id, today)
+    student = students[0]
+    edit(client, teacher_headers, {"student_id": student.id, "class_date": today.isoformat(), "status": "ABSENT"})
+
+    result = main._record_attendance_logic(student.student_code, classroom.id, db)
+
+    assert result["status"] == "RECORDED"
+    assert grid_cell(client, teacher_headers, student.id, today)["status"] == "ABSENT"
+    assert rollups.check(db) == []
@@ -0,0 +1,43 @@
+import numpy as np
+
+import inference_backends
+from benchmarks import backends as backend_benchmark
+
+
+class FakeBackend(inference_backends.InferenceBackend):
+    def __init__(self, noise=0.0):
+        self.noise = noise
+
+    def detect(self, img):
+        return img[:4, :4]
+
+    def embed(self, face_img):
+        vector = face_img.astype(np.float32).ravel()[:8] + 1.0
+        return vector + self.noise * np.arange(8, dtype=np.float32)
+
+
+def test_facenet_input_matches_deepface_base_preprocessing():
+    face = np.zeros((80, 40, 3), dtype=np.uint8)
+    face[:, :] = (255, 0, 0)  # BGR: xanh dương
+
+    tensor = inference_backends.facenet_input(face)
+
+    assert tensor.shape == (160, 160, 3) and tensor.dtype == np.float32
+    # Giữ tỉ lệ: 80x40 -> 160x80, đệm 0 hai bên; kênh đổi sang RGB và chia 255.
+    assert tensor[80, 80].tolist() == [0.0, 0.0, 1.0]
+    assert tensor[80, 10].tolist() == [0.0, 0.0, 0.0]
+    assert float(tensor.max()) == 1.0
+
+
+def test_parity_reports_distance_to_first_backend():
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (8, 8, 3), dtype=np.uint8) for _ in range(5)]
+    backends = {"deepface": FakeBackend(), "onnx:fp32": FakeBackend(), "onnx:int8": FakeBackend(noise=50.0)}
+
+    report = backend_benchmark.parity(backends, images, tolerance=0.05)
+
+    assert set(report) == {"onnx:fp32", "onnx:int8"}
+    assert report["onnx:fp32"]["max_distance"] == 0.0
+    assert report["onnx:fp32"]["within_tolerance"] is True
+    assert report["onnx:int8"]["max_distance"] > 0.05
+    assert report["onnx:int8"]["within_tolerance"] is False
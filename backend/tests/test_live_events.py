@@ -0,0 +1,91 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import live_events
+
+
+async def settle():
+    # publish chuyển việc đẩy vào hàng đợi sang event loop (call_soon_threadsafe).
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def drain(subscription):
+    items = []
+    while not subscription.queue.empty():
+        items.append(subscription.queue.get_nowait())
+    return items
+
+
+def test_every_subscriber_of_the_classroom_receives_the_event():
+    async def scenario():
+        broker = live_events.Broker()
+        first, second, other = broker.subscribe(1), broker.subscribe(1), broker.subscribe(2)
+
+        # Endpoint đồng bộ publish từ threadpool.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            await asyncio.get_running_loop().run_in_executor(pool, broker.publish, 1, "check_in", {"student_id": 7})
+        await settle()
+
+        payload = live_events.encode_event("check_in", {"student_id": 7})
+        assert drain(first) == [payload]
+        assert drain(second) == [payload]
+        assert drain(other) == []
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_marks_slow_subscriber_without_blocking(monkeypatch):
+    monkeypatch.setattr(live_events, "QUEUE_SIZE", 2)
+
+    async def scenario():
+        broker = live_events.Broker()
+        slow, fast = broker.subscribe(1), broker.subscribe(1)
+
+        received = []
+        for index in range(5):
+            broker.publish(1, "check_in", {"n": index})
+            await settle()
+            received.extend(drain(fast))
+
+        assert len(received) == 5 and not fast.overflowed
+        assert slow.overflowed and slow.queue.qsize() == 2
+
+        disconnected = iter([False, False, True])
+
+        async def is_disconnected():
+            return next(disconnected)
+
+        stream = broker.stream(slow, is_disconnected)
+        assert await stream.__anext__() == f"retry: {live_events.RETRY_MS}\n\n".encode()
+        # Sự kiện bị dồn được bỏ, client nhận "resync" để tải lại bảng.
+        assert await stream.__anext__() == live_events.RESYNC
+        assert slow.queue.empty() and not slow.overflowed
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_unsubscribe_cleans_up():
+    async def scenario():
+        broker = live_events.Broker()
+        kept, leaving = broker.subscribe(1), broker.subscribe(1)
+
+        broker.unsubscribe(leaving)
+        broker.unsubscribe(leaving)
+        assert broker.subscriber_count() == 1
+
+        async def is_disconnected():
+            return True
+
+        # Client ngắt kết nối: stream tự huỷ đăng ký.
+        chunks = [chunk async for chunk in broker.stream(kept, is_disconnected)]
+        assert chunks == [f"retry: {live_events.RETRY_MS}\n\n".encode()]
+        assert broker.subscriber_count() == 0
+        assert 1 not in broker._subscribers
+
+        broker.publish(1, "check_in", {})
+        await settle()
+        assert drain(kept) == [] and drain(leaving) == []
+
+    asyncio.run(scenario())
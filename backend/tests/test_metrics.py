@@ -0,0 +1,52 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import metrics
+
+
+def latency_count(method, route, status):
+    value = metrics.REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", {"method": method, "route": route, "status": status}
+    )
+    return value or 0
+
+
+def make_app():
+    app = FastAPI()
+    metrics.install(app)
+
+    @app.get("/t/items/{item_id}")
+    def read_item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    @app.get("/t/events")
+    def events():
+        return StreamingResponse(iter([b"event: ping\ndata: {}\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_records_latency_by_route_template_and_status():
+    client = make_app()
+    before_ok = latency_count("GET", "/t/items/{item_id}", "200")
+    before_missing = latency_count("GET", "/t/items/{item_id}", "404")
+
+    assert client.get("/t/items/1").status_code == 200
+    assert client.get("/t/items/2").status_code == 200
+    assert client.get("/t/items/0").status_code == 404
+
+    assert latency_count("GET", "/t/items/{item_id}", "200") == before_ok + 2
+    assert latency_count("GET", "/t/items/{item_id}", "404") == before_missing + 1
+
+
+def test_event_streams_are_not_recorded():
+    client = make_app()
+    before = latency_count("GET", "/t/events", "200")
+
+    response = client.get("/t/events")
+
+    assert response.status_code == 200
+    assert latency_count("GET", "/t/events", "200") == before
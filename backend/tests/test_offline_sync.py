@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import models
+import offline_sync
+import rollups
+from conftest import add_log, add_schedules
+
+NOW = datetime(2025, 3, 5, 9, 0)
+
+
+@pytest.fixture(autouse=True)
+def fixed_clock(monkeypatch):
+    monkeypatch.setattr(models, "get_vietnam_time_naive", lambda: NOW)
+
+
+def sync(client, headers, classroom_id, *events, station_id="station-1"):
+    return client.post("/api/stations/sync", json={
+        "station_id": station_id,
+        "classroom_id": classroom_id,
+        "events": [
+            {"client_event_id": event_id, "student_code": code, "captured_at": captured_at.isoformat()}
+            for event_id, code, captured_at in events
+        ],
+    }, headers=headers)
+
+
+def statuses(response):
+    assert response.status_code == 200, response.text
+    return {r["client_event_id"]: r["status"] for r in response.json()["results"]}
+
+
+def check_in_times(db, student_id):
+    logs = db.query(models.AttendanceLog).filter_by(student_id=student_id).order_by(models.AttendanceLog.timestamp)
+    return [log.timestamp for log in logs]
+
+
+def test_replayed_batch_is_idempotent(db, client, classroom, students, teacher_headers):
+    events = [("e1", "SV01", datetime(2025, 3, 5, 7, 50)), ("e2", "SV02", datetime(2025, 3, 5, 7, 55))]
+
+    first = statuses(sync(client, teacher_headers, classroom.id, *events))
+    replay = statuses(sync(client, teacher_headers, classroom.id, *events))
+
+    assert first == replay == {"e1": "RECORDED", "e2": "RECORDED"}
+    assert check_in_times(db, students[0].id) == [datetime(2025, 3, 5, 7, 50)]
+    assert check_in_times(db, students[1].id) == [datetime(2025, 3, 5, 7, 55)]
+
+
+def test_event_near_stored_check_in_is_skipped_on_both_sides(db, client, classroom, students, teacher_headers):
+    # Trạm nhận dạng trực tiếp được lại lúc 8:05 trước khi kịp gửi lượt chụp offline lúc 8:00.
+    add_log(db, students[0].id, datetime(2025, 3, 5, 8, 5))
+    add_log(db, students[1].id, datetime(2025, 3, 5, 7, 55))
+
+    result = statuses(sync(
+        client, teacher_headers, classroom.id,
+        ("before-live", "SV01", datetime(2025, 3, 5, 8, 0)),
+        ("after-live", "SV02", datetime(2025, 3, 5, 8, 0)),
+        ("far-from-live", "SV01", datetime(2025, 3, 5, 8, 20)),
+    ))
+
+    assert result == {"before-live": "SKIPPED", "after-live": "SKIPPED", "far-from-live": "RECORDED"}
+    assert check_in_times(db, students[0].id) == [datetime(2025, 3, 5, 8, 5), datetime(2025, 3, 5, 8, 20)]
+
+
+def test_batch_applies_ten_minute_rule_in_capture_order(db, client, classroom, students, teacher_headers):
+    result = statuses(sync(
+        client, teacher_headers, classroom.id,
+        ("late", "SV01", datetime(2025, 3, 5, 8, 15)),
+        ("first", "SV01", datetime(2025, 3, 5, 8, 0)),
+        ("repeat", "SV01", datetime(2025, 3, 5, 8, 5)),
+    ))
+
+    assert result == {"first": "RECORDED", "repeat": "SKIPPED", "late": "RECORDED"}
+
+
+def test_duplicate_event_id_in_batch_is_recorded_once(db, client, classroom, students, teacher_headers):
+    response = sync(
+        client, teacher_headers, classroom.id,
+        ("e1", "SV01", datetime(2025, 3, 5, 8, 0)),
+        ("e1", "SV01", datetime(2025, 3, 5, 8, 30)),
+    )
+
+    assert response.json()["results"] == [{"client_event_id": "e1", "status": "RECORDED"}]
+    assert check_in_times(db, students[0].id) == [datetime(2025, 3, 5, 8, 0)]
+
+
+def test_rejects_old_future_and_unknown_events(db, client, classroom, students, teacher_headers):
+    result = statuses(sync(
+        client, teacher_headers, classroom.id,
+        ("too-old", "SV01", NOW - offline_sync.MAX_OFFLINE_AGE - timedelta(minutes=1)),
+        ("future", "SV01", datetime(2025, 3, 5, 9, 30)),
+        ("unknown", "SV99", datetime(2025, 3, 5, 8, 0)),
+    ))
+
+    assert result == {"too-old": "INVALID_TIME", "future": "INVALID_TIME", "unknown": "UNKNOWN_STUDENT"}
+    assert db.query(models.AttendanceLog).count() == 0
+
+
+def test_accepts_events_from_previous_days_within_lookback(db, client, classroom, students, teacher_headers):
+    # Trạm mất mạng từ chiều hôm trước, sáng nay mới đồng bộ được.
+    add_schedules(db, classroom.id, date(2025, 3, 4))
+
+    result = statuses(sync(client, teacher_headers, classroom.id, ("yesterday", "SV01", datetime(2025, 3, 4, 7, 58))))
+
+    assert result == {"yesterday": "RECORDED"}
+    assert check_in_times(db, students[0].id) == [datetime(2025, 3, 4, 7, 58)]
+    assert rollups.check(db) == []
+
+
+def test_replay_for_another_classroom_is_rejected(db, client, classroom, students, admin_headers):
+    other = models.Classroom(name="Lớp khác")
+    db.add(other)
+    db.flush()
+    db.add(models.Student(student_code="SV01", name="Sinh viên khác", classroom_id=other.id))
+    db.commit()
+    event = ("e1", "SV01", datetime(2025, 3, 5, 8, 0))
+
+    assert statuses(sync(client, admin_headers, classroom.id, event)) == {"e1": "RECORDED"}
+    assert statuses(sync(client, admin_headers, other.id, event)) == {"e1": "CLASSROOM_MISMATCH"}
+    assert db.query(models.AttendanceLog).count() == 1
+    assert statuses(sync(client, admin_headers, classroom.id, event)) == {"e1": "RECORDED"}
+
+
+def test_requires_teacher_of_the_classroom(db, client, classroom, students, teacher_headers):
+    event = ("e1", "SV01", datetime(2025, 3, 5, 8, 0))
+
+    assert sync(client, {}, classroom.id, event).status_code == 401
+    assert sync(client, teacher_headers, classroom.id + 1, event).status_code == 403
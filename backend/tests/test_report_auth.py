@@ -0,0 +1,39 @@
+from datetime import date
+
+import pytest
+
+import main
+from conftest import add_schedules
+
+
+@pytest.fixture
+def primary_unavailable(client):
+    def get_db():
+        raise AssertionError("endpoint báo cáo không được mở session tới primary")
+        yield
+
+    main.app.dependency_overrides[main.get_db] = get_db
+    yield
+    main.app.dependency_overrides.clear()
+
+
+def test_admin_reports_authenticate_on_read_session(db, client, classroom, students, admin_headers, primary_unavailable):
+    add_schedules(db, classroom.id, date(2025, 3, 5))
+
+    for url in (
+        f"/api/admin/attendance-grid/{classroom.id}",
+        f"/api/admin/attendance-summary/{classroom.id}",
+        f"/api/admin/student-attendance-details/{students[0].id}",
+        "/api/admin/overview/weekly",
+        "/api/admin/export/attendance",
+    ):
+        assert client.get(url, headers=admin_headers).status_code == 200, url
+
+    assert client.get(f"/api/admin/attendance-grid/{classroom.id}").status_code == 401
+
+
+def test_teacher_token_is_checked_on_primary(db, client, classroom, teacher_headers):
+    # Đăng nhập lại đổi current_session_id trên primary; token cũ bị từ chối ngay.
+    client.post("/api/teacher/login", json={"username": "teacher01", "password": "1"})
+
+    assert client.get("/api/teacher/attendance-grid", headers=teacher_headers).status_code == 401
@@ -0,0 +1,82 @@
+from datetime import date, datetime
+
+import main
+import models
+import rollups
+from conftest import add_log, add_schedules
+
+MONDAY = date(2025, 3, 3)
+WEDNESDAY = date(2025, 3, 5)
+
+
+def overview_row(client, headers, classroom_id):
+    response = client.get(
+        "/api/admin/overview/weekly",
+        params={"start_date": MONDAY.isoformat(), "end_date": WEDNESDAY.isoformat()},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return next(r for r in response.json() if r["classroom_id"] == classroom_id)
+
+
+def test_overview_matches_attendance_summary(db, client, classroom, students, admin_headers):
+    add_schedules(db, classroom.id, MONDAY, WEDNESDAY)
+    add_log(db, students[0].id, datetime(2025, 3, 3, 7, 55))
+    add_log(db, students[0].id, datetime(2025, 3, 3, 9, 0))
+    add_log(db, students[1].id, datetime(2025, 3, 5, 8, 20))
+    rollups.rebuild(db)
+
+    row = overview_row(client, admin_headers, classroom.id)
+    summary = main.generate_attendance_summary(classroom.id, db)
+
+    assert (row["session_count"], row["student_count"]) == (2, 3)
+    assert row["on_time_count"] == sum(s["on_time_count"] for s in summary) == 1
+    assert row["late_count"] == sum(s["late_count"] for s in summary) == 1
+    assert row["absent_count"] == sum(s["absent_count"] for s in summary) == 4
+    assert rollups.check(db) == []
+
+
+def test_live_check_ins_count_first_of_day_once(db, classroom, students):
+    today = models.get_vietnam_time_naive().date()
+    add_schedules(db, classroom.id, today)
+    rollups.rebuild(db)
+
+    assert main._record_attendance_logic("SV01", classroom.id, db)["status"] == "RECORDED"
+    assert main._record_attendance_logic("SV01", classroom.id, db)["status"] == "SKIPPED"
+    assert main._record_attendance_logic("SV02", classroom.id, db)["status"] == "RECORDED"
+
+    rollup = db.query(models.ClassroomWeeklyRollup).filter_by(classroom_id=classroom.id).one()
+    assert rollup.on_time_count + rollup.late_count == 2
+    assert rollups.check(db) == []
+
+
+def test_schedule_and_student_changes_keep_rollups_consistent(db, client, classroom, students, admin_headers):
+    add_log(db, students[0].id, datetime(2025, 3, 5, 7, 50))
+    add_log(db, students[1].id, datetime(2025, 3, 5, 8, 40))
+
+    created = client.post(f"/api/admin/schedules?classroom_id={classroom.id}", json={"class_date": WEDNESDAY.isoformat()}, headers=admin_headers)
+    assert created.status_code == 201
+    assert rollups.check(db) == []
+
+    assert client.delete(f"/api/admin/students/{students[1].id}", headers=admin_headers).status_code == 204
+    assert rollups.check(db) == []
+    row = overview_row(client, admin_headers, classroom.id)
+    assert (row["on_time_count"], row["late_count"], row["absent_count"]) == (1, 0, 1)
+
+    assert client.delete(f"/api/admin/schedules/{created.json()['id']}", headers=admin_headers).status_code == 204
+    assert rollups.check(db) == []
+
+
+def test_check_reports_and_fix_repairs_drift(db, classroom, students):
+    add_schedules(db, classroom.id, WEDNESDAY)
+    add_log(db, students[0].id, datetime(2025, 3, 5, 7, 50))
+    rollups.rebuild(db)
+    db.query(models.ClassroomWeeklyRollup).update({"on_time_count": 5})
+    db.commit()
+
+    mismatches = rollups.check(db)
+    assert [m["classroom_id"] for m in mismatches] == [classroom.id]
+    assert mismatches[0]["expected"]["on_time"] == 1
+
+    rollups.rebuild(db, [classroom.id])
+    assert rollups.check(db) == []
@@ -0,0 +1,64 @@
+from datetime import date, datetime, time, timedelta
+
+from conftest import add_log, add_schedules
+
+DAYS = [date(2025, 3, 3) + timedelta(weeks=i) for i in range(5)]
+
+
+def fetch_pages(client, headers, student_id, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get(f"/api/teacher/student-attendance-details/{student_id}", params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append([log["date"] for log in body["daily_logs"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_pages_follow_cursor_newest_first(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, *DAYS)
+
+    pages = fetch_pages(client, teacher_headers, students[0].id, limit=2)
+
+    iso = [d.isoformat() for d in reversed(DAYS)]
+    assert pages == [iso[0:2], iso[2:4], iso[4:5]]
+
+
+def test_exact_multiple_of_limit_has_no_empty_last_page(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, *DAYS[:4])
+
+    pages = fetch_pages(client, teacher_headers, students[0].id, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2]
+
+
+def test_cursor_combines_with_date_range(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, *DAYS)
+
+    pages = fetch_pages(client, teacher_headers, students[0].id, limit=1, start_date=DAYS[1].isoformat(), end_date=DAYS[3].isoformat())
+
+    assert pages == [[DAYS[3].isoformat()], [DAYS[2].isoformat()], [DAYS[1].isoformat()]]
+
+
+def test_page_reports_status_of_each_session(db, client, classroom, students, teacher_headers):
+    add_schedules(db, classroom.id, *DAYS[:3])
+    add_log(db, students[0].id, datetime.combine(DAYS[0], time(7, 55)))
+    add_log(db, students[0].id, datetime.combine(DAYS[1], time(8, 30)))
+
+    response = client.get(f"/api/teacher/student-attendance-details/{students[0].id}", headers=teacher_headers)
+
+    logs = {log["date"]: (log["status"], log["check_in_time"]) for log in response.json()["daily_logs"]}
+    assert logs == {
+        DAYS[0].isoformat(): ("PRESENT", "07:55:00"),
+        DAYS[1].isoformat(): ("LATE", "08:30:00"),
+        DAYS[2].isoformat(): ("ABSENT", None),
+    }
+
+
+def test_limit_is_bounded(db, client, classroom, students, teacher_headers):
+    url = f"/api/teacher/student-attendance-details/{students[0].id}"
+    assert client.get(url, params={"limit": 0}, headers=teacher_headers).status_code == 422
+    assert client.get(url, params={"limit": 201}, headers=teacher_headers).status_code == 422
@@ -1,6 +1,11 @@
-import React, { useState, useEffect, useCallback } from "react";
+import React, { useState, useEffect, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import ReactMarkdown from "react-markdown";
+import {
+  applyAttendanceEvent,
+  applyCellUpdates,
+  useAttendanceStream,
+} from "./liveAttendance";
 import "./Dashboard.css";
 
 const getAuthHeaders = () => {
@@ -25,6 +30,7 @@ function AdminDashboard() {
   const navigate = useNavigate();
   const [currentUser, setCurrentUser] = useState(null);
   const [activeTab, setActiveTab] = useState("reporting");
+  const [weeklyOverview, setWeeklyOverview] = useState([]);
 
   const [classrooms, setClassrooms] = useState([]);
   const [teachers, setTeachers] = useState([]);
@@ -66,6 +72,7 @@ function AdminDashboard() {
   const [isNoteModalOpen, setIsNoteModalOpen] = useState(false);
   const [currentNoteCell, setCurrentNoteCell] = useState(null);
   const [noteText, setNoteText] = useState("");
+  const [noteStatus, setNoteStatus] = useState("");
 
   useEffect(() => {
     const user = JSON.parse(localStorage.getItem("user"));
@@ -119,6 +126,63 @@ function AdminDashboard() {
     fetchAllDataForClass();
   }, [selectedClassroom]);
 
+  const gridRef = useRef(null);
+  gridRef.current = gridData;
+
+  // readYourWrites: đọc từ primary ngay sau khi ghi, vì bản sao đọc có thể còn trễ.
+  const reloadGrid = async (readYourWrites = false) => {
+    const headers = readYourWrites
+      ? { ...getAuthHeaders(), "X-Read-Your-Writes": "1" }
+      : getAuthHeaders();
+    if (!selectedClassroom) return;
+    const gridRes = await fetch(
+      `/api/admin/attendance-grid/${selectedClassroom}`,
+      { headers }
+    );
+    if (gridRes.ok) {
+      setGridData(await gridRes.json());
+    }
+  };
+
+  const handleLiveEvent = (type, event) => {
+    const next = applyAttendanceEvent(gridRef.current, type, event);
+    if (next === null) {
+      reloadGrid(true);
+      return;
+    }
+    gridRef.current = next;
+    setGridData(next);
+  };
+
+  useAttendanceStream(
+    selectedClassroom && localStorage.getItem("admin_token")
+      ? `/api/admin/classrooms/${selectedClassroom}/attendance-stream?token=${encodeURIComponent(
+          localStorage.getItem("admin_token")
+        )}`
+      : null,
+    handleLiveEvent,
+    reloadGrid
+  );
+
+  useEffect(() => {
+    if (activeTab !== "overview") return;
+    const fetchWeeklyOverview = async () => {
+      setIsLoading(true);
+      try {
+        const res = await fetch("/api/admin/overview/weekly", {
+          headers: getAuthHeaders(),
+        });
+        if (!res.ok) throw new Error("Lỗi tải thống kê toàn trường");
+        setWeeklyOverview(await res.json());
+      } catch (err) {
+        setMessage(err.message);
+      } finally {
+        setIsLoading(false);
+      }
+    };
+    fetchWeeklyOverview();
+  }, [activeTab]);
+
   const fetchInitialData = async () => {
     setIsLoading(true);
     try {
@@ -169,15 +233,22 @@ function AdminDashboard() {
     }
   }, []);
 
-  const fetchStudentDetails = async (studentId) => {
+  // cursor: ngày cuối của trang trước; có cursor thì nối thêm vào danh sách đang hiển thị.
+  const fetchStudentDetails = async (studentId, cursor = null) => {
     setIsLoading(true);
     try {
+      const query = cursor ? `?cursor=${cursor}` : "";
       const res = await fetch(
-        `/api/admin/student-attendance-details/${studentId}`,
+        `/api/admin/student-attendance-details/${studentId}${query}`,
         { headers: getAuthHeaders() }
       );
       if (!res.ok) throw new Error("Failed to fetch student details");
-      setStudentDetails(await res.json());
+      const data = await res.json();
+      setStudentDetails((prev) =>
+        cursor && prev
+          ? { ...data, daily_logs: [...prev.daily_logs, ...data.daily_logs] }
+          : data
+      );
     } catch (err) {
       console.error("Fetch student details error:", err);
       setMessage("Lỗi: Không thể tải chi tiết sinh viên.");
@@ -319,6 +390,15 @@ function AdminDashboard() {
   const handleCellClick = (student, date, cellData) => {
     setCurrentNoteCell({ student, date, cellData });
     setNoteText(cellData?.note || "");
+    setNoteStatus("");
+    setIsNoteModalOpen(true);
+  };
+
+  // Bấm vào ngày ở đầu cột: sửa cả buổi (vd. đi thực tế, cả lớp có phép).
+  const handleDateHeaderClick = (date) => {
+    setCurrentNoteCell({ student: null, date, cellData: null });
+    setNoteText("");
+    setNoteStatus("");
     setIsNoteModalOpen(true);
   };
 
@@ -326,25 +406,37 @@ function AdminDashboard() {
     if (!currentNoteCell) return;
     setIsLoading(true);
     try {
-      const res = await fetch("/api/attendance-note", {
+      const students = currentNoteCell.student
+        ? [currentNoteCell.student]
+        : gridData.attendance_data;
+      // Sửa cả buổi mà để trống ghi chú thì giữ nguyên ghi chú từng ô; ô vắng không giữ ghi chú.
+      const note =
+        noteStatus === "ABSENT" || (!currentNoteCell.student && !noteText)
+          ? null
+          : noteText;
+      const res = await fetch("/api/attendance-grid/edits", {
         method: "POST",
         headers: getAuthHeaders(),
         body: JSON.stringify({
-          student_id: currentNoteCell.student.student_id,
-          class_date: currentNoteCell.date,
-          note: noteText,
+          classroom_id: Number(selectedClassroom),
+          edits: students.map((student) => ({
+            student_id: student.student_id,
+            class_date: currentNoteCell.date,
+            note,
+            status: noteStatus || null,
+          })),
         }),
       });
       if (!res.ok) throw new Error("Lỗi khi lưu ghi chú");
-      setMessage("Lưu ghi chú thành công!");
-
-      const gridRes = await fetch(
-        `/api/admin/attendance-grid/${selectedClassroom}`,
-        { headers: getAuthHeaders() }
-      );
-      if (gridRes.ok) {
-        setGridData(await gridRes.json());
+      const { cells } = await res.json();
+      const next = applyCellUpdates(gridRef.current, cells);
+      if (next === null) {
+        await reloadGrid(true);
+      } else {
+        gridRef.current = next;
+        setGridData(next);
       }
+      setMessage("Lưu ghi chú thành công!");
     } catch (err) {
       setMessage(`Lỗi: ${err.message}`);
     } finally {
@@ -458,6 +550,13 @@ function AdminDashboard() {
             <span className="tab-icon">📈</span>
             Báo cáo & Phân tích
           </button>
+          <button
+            onClick={() => setActiveTab("overview")}
+            className={`tab-btn ${activeTab === "overview" ? "active" : ""}`}
+          >
+            <span className="tab-icon">🏫</span>
+            Toàn Trường
+          </button>
           <button
             onClick={() => setActiveTab("management")}
             className={`tab-btn ${activeTab === "management" ? "active" : ""}`}
@@ -627,7 +726,14 @@ function AdminDashboard() {
                               <tr>
                                 <th className="sticky-col">Họ Tên Sinh Viên</th>
                                 {gridData.scheduled_dates.map((date) => (
-                                  <th key={date}>{formatDate(date)}</th>
+                                  <th
+                                    key={date}
+                                    className="grid-date-header"
+                                    title="Sửa cả buổi"
+                                    onClick={() => handleDateHeaderClick(date)}
+                                  >
+                                    {formatDate(date)}
+                                  </th>
                                 ))}
                               </tr>
                             </thead>
@@ -748,6 +854,49 @@ function AdminDashboard() {
             </div>
           )}
 
+          {activeTab === "overview" && (
+            <div className="reporting-section">
+              <div className="section-card">
+                <h3 className="section-title">Chuyên Cần Theo Tuần Của Các Lớp</h3>
+                {isLoading ? (
+                  <div className="loading-spinner">
+                    <div className="spinner"></div>
+                    <span>Đang tải dữ liệu...</span>
+                  </div>
+                ) : (
+                  <div className="table-container">
+                    <table className="modern-table">
+                      <thead>
+                        <tr>
+                          <th>Lớp</th>
+                          <th>Tuần</th>
+                          <th>Số Buổi</th>
+                          <th>Sĩ Số</th>
+                          <th>Có Mặt</th>
+                          <th>Đi Muộn</th>
+                          <th>Vắng</th>
+                        </tr>
+                      </thead>
+                      <tbody>
+                        {weeklyOverview.map((row) => (
+                          <tr key={`${row.classroom_id}-${row.week_start}`}>
+                            <td>{row.classroom_name}</td>
+                            <td>{formatDate(row.week_start)}</td>
+                            <td>{row.session_count}</td>
+                            <td>{row.student_count}</td>
+                            <td>{row.present_rate}%</td>
+                            <td>{row.late_rate}%</td>
+                            <td>{row.absent_rate}%</td>
+                          </tr>
+                        ))}
+                      </tbody>
+                    </table>
+                  </div>
+                )}
+              </div>
+            </div>
+          )}
+
           {activeTab === "management" && (
             <div className="management-section">
               <div className="section-card">
@@ -1103,7 +1252,7 @@ function AdminDashboard() {
                 <>
                   <div className="student-info"></div>
                   <div className="attendance-details">
-                    <h4>Lịch trình 10 ngày học gần nhất:</h4>
+                    <h4>Lịch trình các buổi học:</h4>
                     <div className="attendance-list">
                       {studentDetails.daily_logs?.map((log) => (
                         <div key={log.date} className="attendance-item">
@@ -1128,6 +1277,19 @@ function AdminDashboard() {
                         </div>
                       ))}
                     </div>
+                    {studentDetails.next_cursor && (
+                      <button
+                        className="btn-secondary"
+                        onClick={() =>
+                          fetchStudentDetails(
+                            studentDetails.student_info.id,
+                            studentDetails.next_cursor
+                          )
+                        }
+                      >
+                        Xem thêm
+                      </button>
+                    )}
                   </div>
                 </>
               )}
@@ -1242,7 +1404,9 @@ function AdminDashboard() {
           <div className="modal-content" onClick={(e) => e.stopPropagation()}>
             <div className="modal-header">
               <h3>
-                Ghi chú cho {currentNoteCell.student.student_name}
+                {currentNoteCell.student
+                  ? `Ghi chú cho ${currentNoteCell.student.student_name}`
+                  : "Sửa cả buổi"}
                 <br />
                 <small>
                   Ngày:{" "}
@@ -1257,12 +1421,23 @@ function AdminDashboard() {
               </button>
             </div>
             <div className="modal-body">
-              <div className="note-info">
-                <strong>Trạng thái: </strong>
-                {currentNoteCell.cellData?.status || "ABSENT"}
-                {currentNoteCell.cellData?.check_in_time &&
-                  ` (lúc ${currentNoteCell.cellData.check_in_time})`}
-              </div>
+              {currentNoteCell.student && (
+                <div className="note-info">
+                  <strong>Trạng thái: </strong>
+                  {currentNoteCell.cellData?.status || "ABSENT"}
+                  {currentNoteCell.cellData?.check_in_time &&
+                    ` (lúc ${currentNoteCell.cellData.check_in_time})`}
+                </div>
+              )}
+              <select
+                className="modern-select"
+                value={noteStatus}
+                onChange={(e) => setNoteStatus(e.target.value)}
+              >
+                <option value="">Giữ nguyên trạng thái</option>
+                <option value="PRESENT">Đánh dấu có mặt</option>
+                <option value="ABSENT">Đánh dấu vắng</option>
+              </select>
               <textarea
                 className="modern-textarea"
                 rows="5"
@@ -1272,7 +1447,10 @@ function AdminDashboard() {
               />
               <button
                 onClick={handleSaveNote}
-                disabled={isLoading}
+                disabled={
+                  isLoading ||
+                  (!currentNoteCell.student && !noteText && !noteStatus)
+                }
                 className="btn-primary"
               >
                 {isLoading ? "Đang lưu..." : "Lưu Ghi Chú"}
@@ -199,6 +199,7 @@ function AttendanceStation() {
               newFaces.push({
                 ...oldFaceData,
                 rawBox: newFace.box,
+                keypoints: newFace.keypoints,
                 lastSeen: Date.now(),
                 opacity: 1,
               });
@@ -236,6 +237,7 @@ function AttendanceStation() {
               newFaces.push({
                 id: Date.now() + Math.random(),
                 rawBox: newFace.box,
+                keypoints: newFace.keypoints,
                 displayBox: initialDisplayBox,
                 name: null,
                 student_code: null,
@@ -300,7 +302,7 @@ function AttendanceStation() {
     const recognizeFace = async (face) => {
       if (!videoRef.current || !face) return;
       recognitionStatusRef.current.add(face.id);
-      const { rawBox } = face;
+      const { rawBox, keypoints } = face;
       const video = videoRef.current;
       const canvas = document.createElement("canvas");
       canvas.width = rawBox.width;
@@ -325,11 +327,31 @@ function AttendanceStation() {
         const formData = new FormData();
         formData.append("file", blob, "face.jpg");
         formData.append("classroom_id", CLASSROOM_ID);
+        if (keypoints) {
+          formData.append(
+            "landmarks",
+            JSON.stringify(
+              keypoints.map((k) => ({
+                name: k.name,
+                x: k.x - rawBox.xMin,
+                y: k.y - rawBox.yMin,
+              }))
+            )
+          );
+        }
         try {
           const response = await fetch("/api/recognize", {
             method: "POST",
             body: formData,
           });
+          if (response.status === 422) {
+            const error = await response.json().catch(() => null);
+            // Ảnh bị loại do chất lượng: thử lại với khung hình tiếp theo.
+            if (error?.detail?.retry) {
+              recognitionStatusRef.current.delete(face.id);
+            }
+            return;
+          }
           if (!response.ok) return;
           const data = await response.json();
           const checkinTime = new Date(data.timestamp).toLocaleTimeString(
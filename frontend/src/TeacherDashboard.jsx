@@ -1,6 +1,11 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import ReactMarkdown from "react-markdown";
+import {
+  applyAttendanceEvent,
+  applyCellUpdates,
+  useAttendanceStream,
+} from "./liveAttendance";
 import "./Dashboard.css";
 
 const getToken = () => localStorage.getItem("teacher_token");
@@ -37,6 +42,7 @@ function TeacherDashboard() {
   const [isNoteModalOpen, setIsNoteModalOpen] = useState(false);
   const [currentNoteCell, setCurrentNoteCell] = useState(null);
   const [noteText, setNoteText] = useState("");
+  const [noteStatus, setNoteStatus] = useState("");
 
   const [geminiApiKey, setGeminiApiKey] = useState("");
   const [prompt, setPrompt] = useState(
@@ -78,15 +84,56 @@ function TeacherDashboard() {
     }
   };
 
-  const fetchStudentDetails = async (studentId) => {
+  const gridRef = useRef(null);
+  gridRef.current = gridData;
+
+  // readYourWrites: đọc từ primary ngay sau khi ghi, vì bản sao đọc có thể còn trễ.
+  const reloadGrid = async (readYourWrites = false) => {
+    const headers = readYourWrites
+      ? { ...getAuthHeaders(), "X-Read-Your-Writes": "1" }
+      : getAuthHeaders();
+    const gridRes = await fetch("/api/teacher/attendance-grid", {
+      headers,
+    });
+    if (gridRes.ok) {
+      setGridData(await gridRes.json());
+    }
+  };
+
+  const handleLiveEvent = (type, event) => {
+    const next = applyAttendanceEvent(gridRef.current, type, event);
+    if (next === null) {
+      reloadGrid(true);
+      return;
+    }
+    gridRef.current = next;
+    setGridData(next);
+  };
+
+  useAttendanceStream(
+    teacherClassroom
+      ? `/api/teacher/attendance-stream?token=${encodeURIComponent(getToken())}`
+      : null,
+    handleLiveEvent,
+    reloadGrid
+  );
+
+  // cursor: ngày cuối của trang trước; có cursor thì nối thêm vào danh sách đang hiển thị.
+  const fetchStudentDetails = async (studentId, cursor = null) => {
     setIsLoading(true);
     try {
+      const query = cursor ? `?cursor=${cursor}` : "";
       const res = await fetch(
-        `/api/teacher/student-attendance-details/${studentId}`,
+        `/api/teacher/student-attendance-details/${studentId}${query}`,
         { headers: getAuthHeaders() }
       );
       if (!res.ok) throw new Error("Không thể tải chi tiết sinh viên.");
-      setStudentDetails(await res.json());
+      const data = await res.json();
+      setStudentDetails((prev) =>
+        cursor && prev
+          ? { ...data, daily_logs: [...prev.daily_logs, ...data.daily_logs] }
+          : data
+      );
     } catch (err) {
       setMessage(`Lỗi: ${err.message}`);
     } finally {
@@ -97,6 +144,15 @@ function TeacherDashboard() {
   const handleCellClick = (student, date, cellData) => {
     setCurrentNoteCell({ student, date, cellData });
     setNoteText(cellData?.note || "");
+    setNoteStatus("");
+    setIsNoteModalOpen(true);
+  };
+
+  // Bấm vào ngày ở đầu cột: sửa cả buổi (vd. đi thực tế, cả lớp có phép).
+  const handleDateHeaderClick = (date) => {
+    setCurrentNoteCell({ student: null, date, cellData: null });
+    setNoteText("");
+    setNoteStatus("");
     setIsNoteModalOpen(true);
   };
 
@@ -104,23 +160,36 @@ function TeacherDashboard() {
     if (!currentNoteCell) return;
     setIsLoading(true);
     try {
-      const res = await fetch("/api/attendance-note", {
+      const students = currentNoteCell.student
+        ? [currentNoteCell.student]
+        : gridData.attendance_data;
+      // Sửa cả buổi mà để trống ghi chú thì giữ nguyên ghi chú từng ô; ô vắng không giữ ghi chú.
+      const note =
+        noteStatus === "ABSENT" || (!currentNoteCell.student && !noteText)
+          ? null
+          : noteText;
+      const res = await fetch("/api/attendance-grid/edits", {
         method: "POST",
         headers: getAuthHeaders(),
         body: JSON.stringify({
-          student_id: currentNoteCell.student.student_id,
-          class_date: currentNoteCell.date,
-          note: noteText,
+          edits: students.map((student) => ({
+            student_id: student.student_id,
+            class_date: currentNoteCell.date,
+            note,
+            status: noteStatus || null,
+          })),
         }),
       });
       if (!res.ok) throw new Error("Lỗi khi lưu ghi chú");
-      setMessage("Lưu ghi chú thành công!");
-      const gridRes = await fetch("/api/teacher/attendance-grid", {
-        headers: getAuthHeaders(),
-      });
-      if (gridRes.ok) {
-        setGridData(await gridRes.json());
+      const { cells } = await res.json();
+      const next = applyCellUpdates(gridRef.current, cells);
+      if (next === null) {
+        await reloadGrid(true);
+      } else {
+        gridRef.current = next;
+        setGridData(next);
       }
+      setMessage("Lưu ghi chú thành công!");
     } catch (err) {
       setMessage(`Lỗi: ${err.message}`);
     } finally {
@@ -370,7 +439,14 @@ function TeacherDashboard() {
                         <tr>
                           <th className="sticky-col">Họ Tên Sinh Viên</th>
                           {gridData.scheduled_dates.map((date) => (
-                            <th key={date}>{formatDate(date)}</th>
+                            <th
+                              key={date}
+                              className="grid-date-header"
+                              title="Sửa cả buổi"
+                              onClick={() => handleDateHeaderClick(date)}
+                            >
+                              {formatDate(date)}
+                            </th>
                           ))}
                         </tr>
                       </thead>
@@ -470,6 +546,19 @@ function TeacherDashboard() {
                         </div>
                       ))}
                     </div>
+                    {studentDetails.next_cursor && (
+                      <button
+                        className="btn-secondary"
+                        onClick={() =>
+                          fetchStudentDetails(
+                            studentDetails.student_info.id,
+                            studentDetails.next_cursor
+                          )
+                        }
+                      >
+                        Xem thêm
+                      </button>
+                    )}
                   </div>
                 )
               )}
@@ -486,7 +575,9 @@ function TeacherDashboard() {
           <div className="modal-content" onClick={(e) => e.stopPropagation()}>
             <div className="modal-header">
               <h3>
-                Ghi chú cho {currentNoteCell.student.student_name}
+                {currentNoteCell.student
+                  ? `Ghi chú cho ${currentNoteCell.student.student_name}`
+                  : "Sửa cả buổi"}
                 <br />
                 <small>Ngày: {formatDate(currentNoteCell.date)}</small>
               </h3>
@@ -498,12 +589,23 @@ function TeacherDashboard() {
               </button>
             </div>
             <div className="modal-body">
-              <div className="note-info">
-                <strong>Trạng thái: </strong>
-                {currentNoteCell.cellData?.status || "ABSENT"}
-                {currentNoteCell.cellData?.check_in_time &&
-                  ` (lúc ${currentNoteCell.cellData.check_in_time})`}
-              </div>
+              {currentNoteCell.student && (
+                <div className="note-info">
+                  <strong>Trạng thái: </strong>
+                  {currentNoteCell.cellData?.status || "ABSENT"}
+                  {currentNoteCell.cellData?.check_in_time &&
+                    ` (lúc ${currentNoteCell.cellData.check_in_time})`}
+                </div>
+              )}
+              <select
+                className="modern-select"
+                value={noteStatus}
+                onChange={(e) => setNoteStatus(e.target.value)}
+              >
+                <option value="">Giữ nguyên trạng thái</option>
+                <option value="PRESENT">Đánh dấu có mặt</option>
+                <option value="ABSENT">Đánh dấu vắng</option>
+              </select>
               <textarea
                 className="modern-textarea"
                 rows="5"
@@ -513,7 +615,10 @@ function TeacherDashboard() {
               />
               <button
                 onClick={handleSaveNote}
-                disabled={isLoading}
+                disabled={
+                  isLoading ||
+                  (!currentNoteCell.student && !noteText && !noteStatus)
+                }
                 className="btn-primary"
               >
                 {isLoading ? "Đang lưu..." : "Lưu Ghi Chú"}
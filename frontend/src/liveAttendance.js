@@ -0,0 +1,66 @@
+import { useEffect, useRef } from "react";
+
+// Áp một sự kiện SSE vào dữ liệu bảng điểm danh. Trả về null nếu bảng hiện tại
+// không chứa được sự kiện (sinh viên hoặc buổi học mới) và cần tải lại cả bảng.
+export const applyAttendanceEvent = (grid, type, event) => {
+  if (!grid) return grid;
+  const date = event.class_date;
+  if (!grid.scheduled_dates.includes(date)) return grid;
+
+  let found = false;
+  const attendance_data = grid.attendance_data.map((row) => {
+    if (row.student_id !== event.student_id) return row;
+    found = true;
+    const current = row.logs_by_date[date];
+    let cell = current;
+    if (type === "check_in") {
+      // Bảng hiển thị lượt điểm danh đầu tiên trong ngày.
+      const isEarlier =
+        !current?.check_in_time ||
+        event.cell.check_in_time < current.check_in_time;
+      if (!isEarlier) return row;
+      cell = { ...event.cell, note: current?.note ?? event.cell.note };
+    } else if (type === "cell") {
+      // Ô vừa được sửa (ghi chú, đánh dấu có mặt/vắng): thay hẳn ô cũ.
+      cell = event.cell;
+    }
+    return { ...row, logs_by_date: { ...row.logs_by_date, [date]: cell } };
+  });
+  return found ? { ...grid, attendance_data } : null;
+};
+
+// Áp danh sách ô trả về từ /api/attendance-grid/edits; null nếu cần tải lại cả bảng.
+export const applyCellUpdates = (grid, cells) =>
+  cells.reduce(
+    (current, update) =>
+      current === null ? null : applyAttendanceEvent(current, "cell", update),
+    grid
+  );
+
+// Mở EventSource tới `url` và gọi onEvent(type, data) cho mỗi sự kiện điểm danh;
+// onResync() khi server báo đã bỏ sự kiện hoặc kết nối bị nối lại.
+export const useAttendanceStream = (url, onEvent, onResync) => {
+  const handlers = useRef({ onEvent, onResync });
+  handlers.current = { onEvent, onResync };
+
+  useEffect(() => {
+    if (!url) return undefined;
+    const source = new EventSource(url);
+    let opened = false;
+
+    const listen = (type) =>
+      source.addEventListener(type, (e) =>
+        handlers.current.onEvent(type, JSON.parse(e.data))
+      );
+    listen("check_in");
+    listen("cell");
+    source.addEventListener("resync", () => handlers.current.onResync());
+    source.onopen = () => {
+      // Trong lúc mất kết nối có thể đã lỡ sự kiện.
+      if (opened) handlers.current.onResync();
+      opened = true;
+    };
+
+    return () => source.close();
+  }, [url]);
+};